@@ -0,0 +1,31 @@
+"""Add partial index on coupons.locked_until for the lock sweeper
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Only LOCKED coupons are ever swept, so keep the index small
+    op.create_index(
+        'ix_coupons_locked_until',
+        'coupons',
+        ['locked_until'],
+        unique=False,
+        postgresql_where=sa.text("state = 'LOCKED'")
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_coupons_locked_until', table_name='coupons')
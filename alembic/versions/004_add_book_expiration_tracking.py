@@ -0,0 +1,32 @@
+"""Track books whose coupons have been expired by the expiration job
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('books', sa.Column('coupons_expired_at', sa.DateTime(timezone=True), nullable=True))
+    op.create_index(
+        'ix_books_expiration_pending',
+        'books',
+        ['expiration_date'],
+        unique=False,
+        postgresql_where=sa.text('coupons_expired_at IS NULL')
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_books_expiration_pending', table_name='books')
+    op.drop_column('books', 'coupons_expired_at')
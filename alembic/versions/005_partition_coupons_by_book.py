@@ -0,0 +1,268 @@
+"""Partition coupons by book_id with a global coupon_codes lookup table
+
+Runs online in three phases:
+
+1. Create coupon_codes and an empty coupons_partitioned table (one LIST
+   partition per existing book plus a default partition), and install a
+   trigger on the live coupons table that mirrors every write into both.
+2. Backfill in batches outside a transaction; the live table stays
+   writable and rows changed meanwhile are kept current by the trigger.
+3. Swap the tables in one short transaction, then validate the new
+   redemption_history foreign key without blocking writes.
+
+Deploy the application code for this revision only after the migration
+finished. The old table is kept as coupons_unpartitioned for rollback
+checks; drop it once the new layout is verified.
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH_SIZE = 10000
+
+# (legacy name, name while building, final name)
+INDEXES = [
+    ('ix_coupons_book_id', 'ix_coupons_p_book_id', 'book_id'),
+    ('ix_coupons_assigned_user_id', 'ix_coupons_p_assigned_user_id', 'assigned_user_id'),
+    ('ix_coupons_state', 'ix_coupons_p_state', 'state'),
+]
+
+PARTITION_FUNCTIONS = [
+    """
+    CREATE OR REPLACE FUNCTION coupon_partition_name(p_book_id text) RETURNS text
+    LANGUAGE sql IMMUTABLE AS $$ SELECT 'coupons_' || md5(p_book_id) $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION create_coupon_partition(p_book_id text) RETURNS text
+    LANGUAGE plpgsql AS $$
+    DECLARE
+        partition text := coupon_partition_name(p_book_id);
+    BEGIN
+        IF to_regclass(partition) IS NOT NULL THEN
+            RETURN partition;
+        END IF;
+        EXECUTE 'CREATE TABLE ' || quote_ident(partition)
+             || ' (LIKE coupons INCLUDING DEFAULTS INCLUDING CONSTRAINTS)';
+        -- Rows that landed in the default partition before the book had its own
+        EXECUTE 'WITH moved AS (DELETE FROM coupons_default WHERE book_id = $1 RETURNING *) '
+             || 'INSERT INTO ' || quote_ident(partition) || ' SELECT * FROM moved'
+        USING p_book_id;
+        EXECUTE 'ALTER TABLE coupons ATTACH PARTITION ' || quote_ident(partition)
+             || ' FOR VALUES IN (' || quote_literal(p_book_id) || ')';
+        RETURN partition;
+    END $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION detach_coupon_partition(p_book_id text) RETURNS text
+    LANGUAGE plpgsql AS $$
+    DECLARE
+        partition text := coupon_partition_name(p_book_id);
+    BEGIN
+        IF to_regclass(partition) IS NULL THEN
+            RETURN NULL;
+        END IF;
+        EXECUTE 'ALTER TABLE coupons DETACH PARTITION ' || quote_ident(partition);
+        RETURN partition;
+    END $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION register_coupon_codes() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        INSERT INTO coupon_codes (code, book_id) SELECT code, book_id FROM new_coupons;
+        RETURN NULL;
+    END $$
+    """,
+]
+
+
+def upgrade() -> None:
+    # Phase 1: new structures and write mirroring
+    op.create_table(
+        'coupon_codes',
+        sa.Column('code', sa.String(length=50), nullable=False),
+        sa.Column('book_id', sa.String(), nullable=False),
+        sa.ForeignKeyConstraint(['book_id'], ['books.book_id'], ),
+        sa.PrimaryKeyConstraint('code')
+    )
+    op.execute("""
+        CREATE TABLE coupons_partitioned (LIKE coupons INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+        PARTITION BY LIST (book_id)
+    """)
+    op.execute("ALTER TABLE coupons_partitioned ADD CONSTRAINT coupons_partitioned_pkey PRIMARY KEY (code, book_id)")
+    op.execute("""
+        ALTER TABLE coupons_partitioned
+        ADD CONSTRAINT coupons_partitioned_book_id_fkey
+        FOREIGN KEY (book_id) REFERENCES books (book_id) ON DELETE CASCADE
+    """)
+    op.execute("""
+        ALTER TABLE coupons_partitioned
+        ADD CONSTRAINT coupons_partitioned_assigned_user_id_fkey
+        FOREIGN KEY (assigned_user_id) REFERENCES users (user_id)
+    """)
+    op.execute("CREATE TABLE coupons_partitioned_default PARTITION OF coupons_partitioned DEFAULT")
+    op.execute("""
+        DO $$
+        DECLARE
+            b text;
+        BEGIN
+            FOR b IN SELECT book_id FROM books LOOP
+                EXECUTE 'CREATE TABLE ' || quote_ident('coupons_' || md5(b))
+                     || ' PARTITION OF coupons_partitioned FOR VALUES IN (' || quote_literal(b) || ')';
+            END LOOP;
+        END $$
+    """)
+    for _, building_name, column in INDEXES:
+        op.execute(f"CREATE INDEX {building_name} ON coupons_partitioned ({column})")
+    op.execute(
+        "CREATE INDEX ix_coupons_p_locked_until ON coupons_partitioned (locked_until) "
+        "WHERE state = 'LOCKED'"
+    )
+
+    op.execute("""
+        CREATE FUNCTION coupons_mirror_write() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                DELETE FROM coupons_partitioned WHERE code = OLD.code AND book_id = OLD.book_id;
+                RETURN OLD;
+            END IF;
+            INSERT INTO coupon_codes (code, book_id) VALUES (NEW.code, NEW.book_id)
+            ON CONFLICT (code) DO NOTHING;
+            INSERT INTO coupons_partitioned SELECT NEW.*
+            ON CONFLICT (code, book_id) DO UPDATE SET
+                assigned_user_id = EXCLUDED.assigned_user_id,
+                state = EXCLUDED.state,
+                redemption_count = EXCLUDED.redemption_count,
+                max_redemptions = EXCLUDED.max_redemptions,
+                is_locked = EXCLUDED.is_locked,
+                locked_until = EXCLUDED.locked_until,
+                created_at = EXCLUDED.created_at,
+                updated_at = EXCLUDED.updated_at;
+            RETURN NEW;
+        END $$
+    """)
+    op.execute("""
+        CREATE TRIGGER coupons_mirror_write
+        AFTER INSERT OR UPDATE OR DELETE ON coupons
+        FOR EACH ROW EXECUTE FUNCTION coupons_mirror_write()
+    """)
+
+    # Phase 2: batched backfill, one short transaction per batch
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        last_code = ''
+        while True:
+            row = bind.execute(
+                sa.text("""
+                    WITH batch AS (
+                        SELECT * FROM coupons WHERE code > :last_code ORDER BY code LIMIT :batch_size
+                    ), codes AS (
+                        INSERT INTO coupon_codes (code, book_id)
+                        SELECT code, book_id FROM batch
+                        ON CONFLICT (code) DO NOTHING
+                    ), copied AS (
+                        INSERT INTO coupons_partitioned SELECT * FROM batch
+                        ON CONFLICT (code, book_id) DO NOTHING
+                    )
+                    SELECT max(code) AS last_code, count(*) AS copied FROM batch
+                """),
+                {"last_code": last_code, "batch_size": BACKFILL_BATCH_SIZE}
+            ).one()
+            if not row.copied:
+                break
+            last_code = row.last_code
+
+    # Phase 3: swap under a short exclusive lock
+    op.execute("LOCK TABLE coupons IN ACCESS EXCLUSIVE MODE")
+    op.execute("DROP TRIGGER coupons_mirror_write ON coupons")
+    op.execute("DROP FUNCTION coupons_mirror_write()")
+    op.execute("ALTER TABLE redemption_history DROP CONSTRAINT IF EXISTS redemption_history_code_fkey")
+
+    op.execute("ALTER TABLE coupons RENAME TO coupons_unpartitioned")
+    op.execute("ALTER TABLE coupons_unpartitioned RENAME CONSTRAINT coupons_pkey TO coupons_unpartitioned_pkey")
+    for legacy_name, _, _ in INDEXES:
+        op.execute(f"ALTER INDEX IF EXISTS {legacy_name} RENAME TO {legacy_name}_unpartitioned")
+    op.execute("ALTER INDEX IF EXISTS ix_coupons_locked_until RENAME TO ix_coupons_locked_until_unpartitioned")
+
+    op.execute("ALTER TABLE coupons_partitioned RENAME TO coupons")
+    op.execute("ALTER TABLE coupons_partitioned_default RENAME TO coupons_default")
+    op.execute("ALTER TABLE coupons RENAME CONSTRAINT coupons_partitioned_pkey TO coupons_pkey")
+    op.execute("ALTER TABLE coupons RENAME CONSTRAINT coupons_partitioned_book_id_fkey TO coupons_book_id_fkey")
+    op.execute(
+        "ALTER TABLE coupons RENAME CONSTRAINT coupons_partitioned_assigned_user_id_fkey "
+        "TO coupons_assigned_user_id_fkey"
+    )
+    for legacy_name, building_name, _ in INDEXES:
+        op.execute(f"ALTER INDEX {building_name} RENAME TO {legacy_name}")
+    op.execute("ALTER INDEX ix_coupons_p_locked_until RENAME TO ix_coupons_locked_until")
+
+    for statement in PARTITION_FUNCTIONS:
+        op.execute(statement)
+    op.execute("""
+        CREATE TRIGGER coupons_register_codes
+        AFTER INSERT ON coupons
+        REFERENCING NEW TABLE AS new_coupons
+        FOR EACH STATEMENT EXECUTE FUNCTION register_coupon_codes()
+    """)
+    # Books created while the backfill ran
+    op.execute("""
+        SELECT create_coupon_partition(book_id) FROM books
+        WHERE to_regclass(coupon_partition_name(book_id)) IS NULL
+    """)
+
+    op.execute("""
+        ALTER TABLE redemption_history
+        ADD CONSTRAINT redemption_history_code_fkey
+        FOREIGN KEY (code) REFERENCES coupon_codes (code) NOT VALID
+    """)
+
+    # Commits the swap; validation only takes a SHARE UPDATE EXCLUSIVE lock
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TABLE redemption_history VALIDATE CONSTRAINT redemption_history_code_fkey")
+
+
+def downgrade() -> None:
+    # Offline: rebuilds a plain coupons table from the partitions
+    op.execute("LOCK TABLE coupons IN ACCESS EXCLUSIVE MODE")
+    op.execute("CREATE TABLE coupons_plain (LIKE coupons INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+    op.execute("INSERT INTO coupons_plain SELECT * FROM coupons")
+
+    op.execute("ALTER TABLE redemption_history DROP CONSTRAINT IF EXISTS redemption_history_code_fkey")
+    op.execute("DROP TABLE coupons CASCADE")
+    op.execute("DROP TABLE IF EXISTS coupons_unpartitioned CASCADE")
+    op.execute("ALTER TABLE coupons_plain RENAME TO coupons")
+
+    op.create_primary_key('coupons_pkey', 'coupons', ['code'])
+    op.create_foreign_key(None, 'coupons', 'books', ['book_id'], ['book_id'], ondelete='CASCADE')
+    op.create_foreign_key(None, 'coupons', 'users', ['assigned_user_id'], ['user_id'])
+    for legacy_name, _, column in INDEXES:
+        op.create_index(legacy_name, 'coupons', [column], unique=False)
+    op.create_index(
+        'ix_coupons_locked_until',
+        'coupons',
+        ['locked_until'],
+        unique=False,
+        postgresql_where=sa.text("state = 'LOCKED'")
+    )
+    op.create_foreign_key(
+        'redemption_history_code_fkey', 'redemption_history', 'coupons',
+        ['code'], ['code'], ondelete='CASCADE'
+    )
+
+    op.drop_table('coupon_codes')
+    op.execute("DROP FUNCTION IF EXISTS register_coupon_codes()")
+    op.execute("DROP FUNCTION IF EXISTS detach_coupon_partition(text)")
+    op.execute("DROP FUNCTION IF EXISTS create_coupon_partition(text)")
+    op.execute("DROP FUNCTION IF EXISTS coupon_partition_name(text)")
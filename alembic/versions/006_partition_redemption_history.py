@@ -0,0 +1,226 @@
+"""Partition redemption_history by month and add daily rollups
+
+Runs online in three phases, like 005:
+
+1. Create redemption_history_partitioned with one RANGE partition per
+   month from the oldest redemption to two months ahead, plus a default
+   partition, and install a trigger on the live table that mirrors new
+   rows into it. History is append-only, so only inserts are mirrored.
+2. Backfill in batches outside a transaction.
+3. Swap the tables in one short transaction.
+
+The old table is kept as redemption_history_unpartitioned for rollback
+checks; drop it once the new layout is verified.
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH_SIZE = 10000
+
+# (legacy name, name while building, columns)
+INDEXES = [
+    ('ix_redemption_history_code', 'ix_redemption_history_p_code', 'code'),
+    ('ix_redemption_history_user_id', 'ix_redemption_history_p_user_id', 'user_id'),
+    ('ix_redemption_history_redeemed_at', 'ix_redemption_history_p_redeemed_at', 'redeemed_at'),
+    ('ix_redemption_history_book_id_redeemed_at', 'ix_redemption_history_p_book_id_redeemed_at', 'book_id, redeemed_at'),
+]
+
+FOREIGN_KEYS = [
+    ('code', 'coupon_codes (code)'),
+    ('user_id', 'users (user_id)'),
+    ('book_id', 'books (book_id)'),
+]
+
+PARTITION_FUNCTION = """
+    CREATE OR REPLACE FUNCTION create_redemption_history_partition(p_month timestamptz) RETURNS text
+    LANGUAGE plpgsql AS $$
+    DECLARE
+        month_start timestamptz := date_trunc('month', p_month AT TIME ZONE 'UTC') AT TIME ZONE 'UTC';
+        month_end timestamptz := month_start + interval '1 month';
+        partition text := 'redemption_history_p' || to_char(month_start AT TIME ZONE 'UTC', 'YYYY_MM');
+    BEGIN
+        IF to_regclass(partition) IS NOT NULL THEN
+            RETURN partition;
+        END IF;
+        EXECUTE 'CREATE TABLE ' || quote_ident(partition)
+             || ' (LIKE redemption_history INCLUDING DEFAULTS INCLUDING CONSTRAINTS)';
+        -- Rows that landed in the default partition because the month had none yet
+        EXECUTE 'WITH moved AS (DELETE FROM redemption_history_default '
+             || 'WHERE redeemed_at >= $1 AND redeemed_at < $2 RETURNING *) '
+             || 'INSERT INTO ' || quote_ident(partition) || ' SELECT * FROM moved'
+        USING month_start, month_end;
+        EXECUTE 'ALTER TABLE redemption_history ATTACH PARTITION ' || quote_ident(partition)
+             || ' FOR VALUES FROM (' || quote_literal(month_start) || ') TO (' || quote_literal(month_end) || ')';
+        RETURN partition;
+    END $$
+"""
+
+
+def upgrade() -> None:
+    # Phase 1: new structures and write mirroring
+    op.create_table(
+        'redemption_daily_rollups',
+        sa.Column('book_id', sa.String(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('redemptions', sa.Integer(), nullable=False),
+        sa.Column('unique_users', sa.Integer(), nullable=False),
+        sa.Column('unique_codes', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['book_id'], ['books.book_id'], ),
+        sa.PrimaryKeyConstraint('book_id', 'day')
+    )
+
+    op.execute("""
+        CREATE TABLE redemption_history_partitioned
+        (LIKE redemption_history INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+        PARTITION BY RANGE (redeemed_at)
+    """)
+    op.execute(
+        "ALTER TABLE redemption_history_partitioned "
+        "ADD CONSTRAINT redemption_history_partitioned_pkey PRIMARY KEY (history_id, redeemed_at)"
+    )
+    for column, target in FOREIGN_KEYS:
+        op.execute(f"""
+            ALTER TABLE redemption_history_partitioned
+            ADD CONSTRAINT redemption_history_partitioned_{column}_fkey
+            FOREIGN KEY ({column}) REFERENCES {target}
+        """)
+    op.execute(
+        "CREATE TABLE redemption_history_partitioned_default "
+        "PARTITION OF redemption_history_partitioned DEFAULT"
+    )
+    op.execute("""
+        DO $$
+        DECLARE
+            m timestamptz;
+        BEGIN
+            FOR m IN
+                SELECT generate_series(
+                    date_trunc('month', coalesce(min(redeemed_at), now()) AT TIME ZONE 'UTC') AT TIME ZONE 'UTC',
+                    now() + interval '2 months',
+                    interval '1 month'
+                )
+                FROM redemption_history
+            LOOP
+                EXECUTE 'CREATE TABLE '
+                     || quote_ident('redemption_history_p' || to_char(m AT TIME ZONE 'UTC', 'YYYY_MM'))
+                     || ' PARTITION OF redemption_history_partitioned FOR VALUES FROM ('
+                     || quote_literal(m) || ') TO (' || quote_literal(m + interval '1 month') || ')';
+            END LOOP;
+        END $$
+    """)
+    for _, building_name, columns in INDEXES:
+        op.execute(f"CREATE INDEX {building_name} ON redemption_history_partitioned ({columns})")
+
+    op.execute("""
+        CREATE FUNCTION redemption_history_mirror_insert() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            INSERT INTO redemption_history_partitioned SELECT NEW.*
+            ON CONFLICT (history_id, redeemed_at) DO NOTHING;
+            RETURN NEW;
+        END $$
+    """)
+    op.execute("""
+        CREATE TRIGGER redemption_history_mirror_insert
+        AFTER INSERT ON redemption_history
+        FOR EACH ROW EXECUTE FUNCTION redemption_history_mirror_insert()
+    """)
+
+    # Phase 2: batched backfill, one short transaction per batch
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        last_id = ''
+        while True:
+            row = bind.execute(
+                sa.text("""
+                    WITH batch AS (
+                        SELECT * FROM redemption_history
+                        WHERE history_id > :last_id ORDER BY history_id LIMIT :batch_size
+                    ), copied AS (
+                        INSERT INTO redemption_history_partitioned SELECT * FROM batch
+                        ON CONFLICT (history_id, redeemed_at) DO NOTHING
+                    )
+                    SELECT max(history_id) AS last_id, count(*) AS copied FROM batch
+                """),
+                {"last_id": last_id, "batch_size": BACKFILL_BATCH_SIZE}
+            ).one()
+            if not row.copied:
+                break
+            last_id = row.last_id
+
+    # Phase 3: swap under a short exclusive lock
+    op.execute("LOCK TABLE redemption_history IN ACCESS EXCLUSIVE MODE")
+    op.execute("DROP TRIGGER redemption_history_mirror_insert ON redemption_history")
+    op.execute("DROP FUNCTION redemption_history_mirror_insert()")
+
+    op.execute("ALTER TABLE redemption_history RENAME TO redemption_history_unpartitioned")
+    op.execute(
+        "ALTER TABLE redemption_history_unpartitioned "
+        "RENAME CONSTRAINT redemption_history_pkey TO redemption_history_unpartitioned_pkey"
+    )
+    for column, _ in FOREIGN_KEYS:
+        op.execute(
+            f"ALTER TABLE redemption_history_unpartitioned RENAME CONSTRAINT "
+            f"redemption_history_{column}_fkey TO redemption_history_unpartitioned_{column}_fkey"
+        )
+    for legacy_name, _, _ in INDEXES:
+        op.execute(f"ALTER INDEX IF EXISTS {legacy_name} RENAME TO {legacy_name}_unpartitioned")
+    op.execute(
+        "ALTER INDEX IF EXISTS ix_redemption_history_book_id "
+        "RENAME TO ix_redemption_history_book_id_unpartitioned"
+    )
+
+    op.execute("ALTER TABLE redemption_history_partitioned RENAME TO redemption_history")
+    op.execute("ALTER TABLE redemption_history_partitioned_default RENAME TO redemption_history_default")
+    op.execute(
+        "ALTER TABLE redemption_history "
+        "RENAME CONSTRAINT redemption_history_partitioned_pkey TO redemption_history_pkey"
+    )
+    for column, _ in FOREIGN_KEYS:
+        op.execute(
+            f"ALTER TABLE redemption_history RENAME CONSTRAINT "
+            f"redemption_history_partitioned_{column}_fkey TO redemption_history_{column}_fkey"
+        )
+    for legacy_name, building_name, _ in INDEXES:
+        op.execute(f"ALTER INDEX {building_name} RENAME TO {legacy_name}")
+
+    op.execute(PARTITION_FUNCTION)
+
+
+def downgrade() -> None:
+    # Offline: rebuilds a plain redemption_history table from the partitions
+    op.execute("LOCK TABLE redemption_history IN ACCESS EXCLUSIVE MODE")
+    op.execute(
+        "CREATE TABLE redemption_history_plain "
+        "(LIKE redemption_history INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+    )
+    op.execute("INSERT INTO redemption_history_plain SELECT * FROM redemption_history")
+
+    op.execute("DROP TABLE redemption_history CASCADE")
+    op.execute("DROP TABLE IF EXISTS redemption_history_unpartitioned CASCADE")
+    op.execute("ALTER TABLE redemption_history_plain RENAME TO redemption_history")
+
+    op.create_primary_key('redemption_history_pkey', 'redemption_history', ['history_id'])
+    for column, target in FOREIGN_KEYS:
+        op.execute(
+            f"ALTER TABLE redemption_history ADD CONSTRAINT redemption_history_{column}_fkey "
+            f"FOREIGN KEY ({column}) REFERENCES {target}"
+        )
+    op.create_index('ix_redemption_history_code', 'redemption_history', ['code'], unique=False)
+    op.create_index('ix_redemption_history_user_id', 'redemption_history', ['user_id'], unique=False)
+    op.create_index('ix_redemption_history_redeemed_at', 'redemption_history', ['redeemed_at'], unique=False)
+
+    op.drop_table('redemption_daily_rollups')
+    op.execute("DROP FUNCTION IF EXISTS create_redemption_history_partition(timestamptz)")
@@ -0,0 +1,345 @@
+"""Store user, book, pool and history ids as native UUID columns
+
+The id columns held str(uuid.uuid4()) in VARCHAR columns: 37 bytes per
+value against 16 for uuid, repeated in every referencing row and index.
+Converting them in place (ALTER COLUMN TYPE) rewrites every table under an
+ACCESS EXCLUSIVE lock, and the partition key of coupons cannot change type
+at all, so each table is rebuilt as a copy instead:
+
+1. Create an empty <table>_new copy of every table (columns, defaults,
+   keys, indexes, partitions) with uuid id columns, and foreign keys
+   between the copies.
+2. Table by table, in foreign key order: install a trigger that mirrors
+   every write into the copy, then backfill the copy in batches outside a
+   transaction. A table is only mirrored once everything it references
+   has been copied, so mirrored rows never violate the copies' foreign
+   keys.
+3. Swap all tables in one short transaction.
+
+Requires every id to be a valid UUID string. The old tables are kept with
+an _old suffix for rollback checks; drop them once the new layout is
+verified.
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH_SIZE = 10000
+
+BUILD_SUFFIX = '_new'
+RETIRED_SUFFIX = '_old'
+
+# Tables in foreign key order, with the id columns converted in each
+ID_COLUMNS = {
+    'users': ['user_id'],
+    'books': ['book_id', 'owner_id'],
+    'user_pools': ['pool_id', 'created_by'],
+    'pool_users': ['pool_id', 'user_id'],
+    'coupon_codes': ['book_id'],
+    'coupons': ['book_id', 'assigned_user_id'],
+    'redemption_history': ['history_id', 'user_id', 'book_id'],
+    'redemption_daily_rollups': ['book_id'],
+}
+
+PARTITION_FUNCTIONS = [
+    """
+    CREATE FUNCTION coupon_partition_name(p_book_id {id_type}) RETURNS text
+    LANGUAGE sql IMMUTABLE AS $$ SELECT 'coupons_' || md5(p_book_id::text) $$
+    """,
+    """
+    CREATE FUNCTION create_coupon_partition(p_book_id {id_type}) RETURNS text
+    LANGUAGE plpgsql AS $$
+    DECLARE
+        partition text := coupon_partition_name(p_book_id);
+    BEGIN
+        IF to_regclass(partition) IS NOT NULL THEN
+            RETURN partition;
+        END IF;
+        EXECUTE 'CREATE TABLE ' || quote_ident(partition)
+             || ' (LIKE coupons INCLUDING DEFAULTS INCLUDING CONSTRAINTS)';
+        -- Rows that landed in the default partition before the book had its own
+        EXECUTE 'WITH moved AS (DELETE FROM coupons_default WHERE book_id = $1 RETURNING *) '
+             || 'INSERT INTO ' || quote_ident(partition) || ' SELECT * FROM moved'
+        USING p_book_id;
+        EXECUTE 'ALTER TABLE coupons ATTACH PARTITION ' || quote_ident(partition)
+             || ' FOR VALUES IN (' || quote_literal(p_book_id) || ')';
+        RETURN partition;
+    END $$
+    """,
+    """
+    CREATE FUNCTION detach_coupon_partition(p_book_id {id_type}) RETURNS text
+    LANGUAGE plpgsql AS $$
+    DECLARE
+        partition text := coupon_partition_name(p_book_id);
+    BEGIN
+        IF to_regclass(partition) IS NULL THEN
+            RETURN NULL;
+        END IF;
+        EXECUTE 'ALTER TABLE coupons DETACH PARTITION ' || quote_ident(partition);
+        RETURN partition;
+    END $$
+    """,
+]
+
+
+def _columns(bind, table):
+    return bind.execute(sa.text("""
+        SELECT a.attname AS name,
+               format_type(a.atttypid, a.atttypmod) AS type,
+               a.attnotnull AS not_null,
+               pg_get_expr(d.adbin, d.adrelid) AS column_default
+        FROM pg_attribute a
+        LEFT JOIN pg_attrdef d ON d.adrelid = a.attrelid AND d.adnum = a.attnum
+        WHERE a.attrelid = CAST(:table AS regclass) AND a.attnum > 0 AND NOT a.attisdropped
+        ORDER BY a.attnum
+    """), {"table": table}).all()
+
+
+def _primary_key(bind, table):
+    return bind.execute(sa.text("""
+        SELECT a.attname
+        FROM pg_index i
+        JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY (i.indkey)
+        WHERE i.indrelid = CAST(:table AS regclass) AND i.indisprimary
+        ORDER BY array_position(CAST(i.indkey AS int2[]), a.attnum)
+    """), {"table": table}).scalars().all()
+
+
+def _constraints(bind, table, contypes):
+    rows = bind.execute(sa.text("""
+        SELECT conname, CAST(contype AS text) AS contype, pg_get_constraintdef(oid) AS definition
+        FROM pg_constraint
+        WHERE conrelid = CAST(:table AS regclass)
+    """), {"table": table}).all()
+    return [row for row in rows if row.contype in contypes]
+
+
+def _indexes(bind, table):
+    """Indexes that do not back a constraint"""
+    return bind.execute(sa.text("""
+        SELECT c.relname AS name, pg_get_indexdef(i.indexrelid) AS definition
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE i.indrelid = CAST(:table AS regclass)
+          AND NOT EXISTS (
+              SELECT 1 FROM pg_constraint k
+              WHERE k.conrelid = i.indrelid AND k.conindid = i.indexrelid
+          )
+    """), {"table": table}).all()
+
+
+def _partitions(bind, table):
+    return bind.execute(sa.text("""
+        SELECT c.relname AS name, pg_get_expr(c.relpartbound, c.oid) AS bound
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = CAST(:table AS regclass)
+    """), {"table": table}).all()
+
+
+def _triggers(bind, table):
+    """User-defined triggers, excluding the temporary mirror triggers"""
+    return bind.execute(sa.text("""
+        SELECT tgname AS name, pg_get_triggerdef(oid) AS definition
+        FROM pg_trigger
+        WHERE tgrelid = CAST(:table AS regclass) AND NOT tgisinternal
+          AND tgname NOT LIKE '%\\_mirror'
+    """), {"table": table}).all()
+
+
+def _cast(expression, column, table, id_type):
+    if column in ID_COLUMNS[table]:
+        return f"CAST({expression} AS {id_type})"
+    return expression
+
+
+def _build(bind, table, id_type):
+    """Create an empty copy of a table with the id columns retyped"""
+    new = table + BUILD_SUFFIX
+    definitions = []
+    for column in _columns(bind, table):
+        definition = f"{column.name} {id_type if column.name in ID_COLUMNS[table] else column.type}"
+        if column.not_null:
+            definition += " NOT NULL"
+        if column.column_default is not None and column.name not in ID_COLUMNS[table]:
+            definition += f" DEFAULT {column.column_default}"
+        definitions.append(definition)
+
+    partition_key = bind.execute(
+        sa.text("SELECT pg_get_partkeydef(CAST(:table AS regclass))"), {"table": table}
+    ).scalar()
+    statement = f"CREATE TABLE {new} ({', '.join(definitions)})"
+    if partition_key:
+        statement += f" PARTITION BY {partition_key}"
+    op.execute(statement)
+
+    for constraint in _constraints(bind, table, ('p', 'u', 'c')):
+        op.execute(f"ALTER TABLE {new} ADD CONSTRAINT {constraint.conname}{BUILD_SUFFIX} {constraint.definition}")
+    for constraint in _constraints(bind, table, ('f',)):
+        # Reference the copies; the swap renames them back together
+        definition = re.sub(
+            r"REFERENCES (\w+)\(",
+            lambda m: f"REFERENCES {m.group(1)}{BUILD_SUFFIX}(" if m.group(1) in ID_COLUMNS else m.group(0),
+            constraint.definition
+        )
+        op.execute(f"ALTER TABLE {new} ADD CONSTRAINT {constraint.conname} {definition}")
+    for index in _indexes(bind, table):
+        op.execute(re.sub(
+            r"^CREATE (UNIQUE )?INDEX (\S+) ON (ONLY )?\S+ ",
+            lambda m: f"CREATE {m.group(1) or ''}INDEX {m.group(2)}{BUILD_SUFFIX} ON {new} ",
+            index.definition
+        ))
+    for partition in _partitions(bind, table):
+        op.execute(f'CREATE TABLE "{partition.name}{BUILD_SUFFIX}" PARTITION OF {new} {partition.bound}')
+
+
+def _mirror(bind, table, id_type):
+    """Keep the copy current with every write to the live table"""
+    new = table + BUILD_SUFFIX
+    columns = [column.name for column in _columns(bind, table)]
+    primary_key = _primary_key(bind, table)
+    values = ", ".join(_cast(f"NEW.{column}", column, table, id_type) for column in columns)
+    key = " AND ".join(
+        f"{column} = {_cast(f'OLD.{column}', column, table, id_type)}"
+        for column in primary_key
+    )
+    updates = ", ".join(f"{column} = EXCLUDED.{column}" for column in columns if column not in primary_key)
+    # An UPDATE is an upsert, never DELETE + INSERT: deleting the copied row
+    # would cascade to (or, for NO ACTION keys, fail on) the copies that
+    # already reference it. Primary keys are never updated.
+    op.execute(f"""
+        CREATE FUNCTION {new}_mirror() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                DELETE FROM {new} WHERE {key};
+            ELSE
+                INSERT INTO {new} ({', '.join(columns)}) VALUES ({values})
+                ON CONFLICT ({', '.join(primary_key)}) DO {f'UPDATE SET {updates}' if updates else 'NOTHING'};
+            END IF;
+            RETURN NULL;
+        END $$
+    """)
+    op.execute(f"""
+        CREATE TRIGGER {new}_mirror
+        AFTER INSERT OR UPDATE OR DELETE ON {table}
+        FOR EACH ROW EXECUTE FUNCTION {new}_mirror()
+    """)
+
+
+def _backfill(bind, table, id_type):
+    """Copy existing rows in primary key order, one short transaction per batch"""
+    new = table + BUILD_SUFFIX
+    columns = [column.name for column in _columns(bind, table)]
+    values = ", ".join(_cast(column, column, table, id_type) for column in columns)
+    key = _primary_key(bind, table)
+    last = None
+    while True:
+        params = {"batch_size": BACKFILL_BATCH_SIZE}
+        after = ""
+        if last is not None:
+            after = f"WHERE ({', '.join(key)}) > ({', '.join(f':k{i}' for i in range(len(key)))})"
+            params.update({f"k{i}": value for i, value in enumerate(last)})
+        # FOR SHARE holds off concurrent updates/deletes of the batch until it
+        # is copied, so their mirrored writes always land after it
+        row = bind.execute(sa.text(f"""
+            WITH batch AS (
+                SELECT {', '.join(columns)} FROM {table} {after}
+                ORDER BY {', '.join(key)} LIMIT :batch_size
+                FOR SHARE
+            ), copied AS (
+                INSERT INTO {new} ({', '.join(columns)}) SELECT {values} FROM batch
+                ON CONFLICT DO NOTHING
+            )
+            SELECT {', '.join(key)} FROM batch
+            ORDER BY {', '.join(f'{column} DESC' for column in key)} LIMIT 1
+        """), params).first()
+        if row is None:
+            break
+        last = tuple(row)
+    op.execute(f"ANALYZE {new}")
+
+
+def _rename(bind, table, old_suffix, new_suffix):
+    """Rename a table with its keys, check constraints, indexes and partitions"""
+    def renamed(name):
+        return name[:len(name) - len(old_suffix)] + new_suffix
+
+    for constraint in _constraints(bind, table, ('p', 'u', 'c')):
+        op.execute(f'ALTER TABLE {table} RENAME CONSTRAINT "{constraint.conname}" TO "{renamed(constraint.conname)}"')
+    for index in _indexes(bind, table):
+        op.execute(f'ALTER INDEX "{index.name}" RENAME TO "{renamed(index.name)}"')
+    for partition in _partitions(bind, table):
+        op.execute(f'ALTER TABLE "{partition.name}" RENAME TO "{renamed(partition.name)}"')
+    op.execute(f'ALTER TABLE {table} RENAME TO "{renamed(table)}"')
+
+
+def _convert(id_type):
+    bind = op.get_bind()
+
+    # Phase 1: empty copies
+    for table in ID_COLUMNS:
+        _build(bind, table, id_type)
+
+    # Phase 2: mirror and backfill, referenced tables first
+    with op.get_context().autocommit_block():
+        for table in ID_COLUMNS:
+            _mirror(bind, table, id_type)
+            _backfill(bind, table, id_type)
+
+    # Phase 3: swap under a short exclusive lock
+    op.execute(f"LOCK TABLE {', '.join(ID_COLUMNS)} IN ACCESS EXCLUSIVE MODE")
+    triggers = {}
+    for table in ID_COLUMNS:
+        op.execute(f"DROP TRIGGER {table}{BUILD_SUFFIX}_mirror ON {table}")
+        op.execute(f"DROP FUNCTION {table}{BUILD_SUFFIX}_mirror()")
+        triggers[table] = _triggers(bind, table)
+        for trigger in triggers[table]:
+            op.execute(f"DROP TRIGGER {trigger.name} ON {table}")
+        for constraint in _constraints(bind, table, ('f',)):
+            op.execute(f'ALTER TABLE {table} DROP CONSTRAINT "{constraint.conname}"')
+
+    for table in ID_COLUMNS:
+        _rename(bind, table, '', RETIRED_SUFFIX)
+    for table in ID_COLUMNS:
+        _rename(bind, table + BUILD_SUFFIX, BUILD_SUFFIX, '')
+        for trigger in triggers[table]:
+            op.execute(trigger.definition)
+
+    op.execute("DROP FUNCTION IF EXISTS detach_coupon_partition")
+    op.execute("DROP FUNCTION IF EXISTS create_coupon_partition")
+    op.execute("DROP FUNCTION IF EXISTS coupon_partition_name")
+    for statement in PARTITION_FUNCTIONS:
+        op.execute(statement.format(id_type=id_type))
+
+    # Partitions created on the old tables while the backfill ran
+    op.execute("""
+        SELECT create_coupon_partition(book_id) FROM books
+        WHERE to_regclass(coupon_partition_name(book_id)) IS NULL
+    """)
+    op.execute("SELECT create_redemption_history_partition(now())")
+    op.execute("SELECT create_redemption_history_partition(now() + interval '1 month')")
+
+
+def upgrade() -> None:
+    _convert('uuid')
+
+
+def downgrade() -> None:
+    # Same rebuild in reverse; tables left over from the upgrade go first
+    for table in reversed(list(ID_COLUMNS)):
+        op.execute(f"DROP TABLE IF EXISTS {table}{RETIRED_SUFFIX} CASCADE")
+    _convert('character varying')
@@ -0,0 +1,33 @@
+"""Add coupons.locked_by, the owner of a coupon lock lease
+
+Coupon locks become leases (conditional UPDATEs on locked_until and
+locked_by) instead of session-level advisory locks, which leak on pooled
+connections and do not work behind PgBouncer transaction pooling.
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Nullable without a default: catalog-only change, no table rewrite
+    op.add_column('coupons', sa.Column('locked_by', postgresql.UUID(as_uuid=False), nullable=True))
+    # Locks taken before this revision recorded no owner; attribute them to
+    # the assigned user (the only one the UI lets lock a coupon)
+    op.execute("UPDATE coupons SET locked_by = assigned_user_id WHERE state = 'LOCKED'")
+
+
+def downgrade() -> None:
+    op.drop_column('coupons', 'locked_by')
@@ -0,0 +1,35 @@
+"""Add lock_leases for the lease-table redemption lock backend
+
+Only used when LOCK_BACKEND=lease. Rows live for the duration of one
+redemption; expired rows are taken over in place, so the table stays
+as small as the number of codes being redeemed at once.
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '009'
+down_revision = '008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'lock_leases',
+        sa.Column('lock_key', sa.String(), nullable=False),
+        sa.Column('owner', postgresql.UUID(as_uuid=False), nullable=False),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('lock_key')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('lock_leases')
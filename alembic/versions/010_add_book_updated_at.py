@@ -0,0 +1,30 @@
+"""Add books.updated_at, the validator behind GET /books ETags
+
+now() is stable, so PostgreSQL stores the default in the catalog
+instead of rewriting the table; existing books get the migration time.
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '010'
+down_revision = '009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'books',
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False)
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('books', 'updated_at')
@@ -0,0 +1,45 @@
+"""Notify the API workers' code filters when a book gets new coupon codes
+
+register_coupon_codes() also runs pg_notify(INVALIDATION_CHANNEL,
+'codes:<book_id>') once per book in the inserting statement. Any writer
+(API, COPY seeding) keeps every worker's Bloom filter of codes current.
+
+Revision ID: 012
+Revises: 011
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+from app.config import get_settings
+
+
+# revision identifiers, used by Alembic.
+revision = '012'
+down_revision = '011'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    channel = get_settings().INVALIDATION_CHANNEL.replace("'", "''")
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION register_coupon_codes() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            INSERT INTO coupon_codes (code, book_id) SELECT code, book_id FROM new_coupons;
+            PERFORM pg_notify('{channel}', 'codes:' || book_id)
+            FROM (SELECT DISTINCT book_id FROM new_coupons) AS books;
+            RETURN NULL;
+        END $$
+    """)
+
+
+def downgrade() -> None:
+    op.execute("""
+        CREATE OR REPLACE FUNCTION register_coupon_codes() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            INSERT INTO coupon_codes (code, book_id) SELECT code, book_id FROM new_coupons;
+            RETURN NULL;
+        END $$
+    """)
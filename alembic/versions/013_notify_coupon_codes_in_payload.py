@@ -0,0 +1,56 @@
+"""Send new coupon codes themselves to the API workers' code filters
+
+register_coupon_codes() now runs pg_notify(INVALIDATION_CHANNEL,
+'codes:<code>,<code>,...') with the inserted codes ('%', ',' and '*'
+percent-encoded), chunked under the 8000-byte NOTIFY limit. Workers add
+them to their Bloom filter without re-reading the book's codes.
+
+Revision ID: 013
+Revises: 012
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+from app.config import get_settings
+
+
+# revision identifiers, used by Alembic.
+revision = '013'
+down_revision = '012'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    channel = get_settings().INVALIDATION_CHANNEL.replace("'", "''")
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION register_coupon_codes() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            INSERT INTO coupon_codes (code, book_id) SELECT code, book_id FROM new_coupons;
+            PERFORM pg_notify('{channel}', 'codes:' || string_agg(code, ','))
+            FROM (
+                SELECT code, sum(octet_length(code) + 1) OVER (ORDER BY code) / 7500 AS chunk
+                FROM (
+                    SELECT replace(replace(replace(code, '%', '%25'), ',', '%2C'), '*', '%2A') AS code
+                    FROM new_coupons
+                ) AS escaped
+            ) AS sized
+            GROUP BY chunk;
+            RETURN NULL;
+        END $$
+    """)
+
+
+def downgrade() -> None:
+    channel = get_settings().INVALIDATION_CHANNEL.replace("'", "''")
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION register_coupon_codes() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            INSERT INTO coupon_codes (code, book_id) SELECT code, book_id FROM new_coupons;
+            PERFORM pg_notify('{channel}', 'codes:' || book_id)
+            FROM (SELECT DISTINCT book_id FROM new_coupons) AS books;
+            RETURN NULL;
+        END $$
+    """)
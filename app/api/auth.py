@@ -7,7 +7,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from sqlalchemy.exc import IntegrityError
 
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.models.user import User, UserRole
 from app.schemas import (
     UserRegisterRequest,
@@ -23,7 +23,9 @@ from app.utils.auth import (
     verify_password,
     create_access_token,
     get_current_user,
-    require_admin
+    get_current_user_read,
+    require_admin,
+    require_admin_read
 )
 from app.config import get_settings
 
@@ -62,7 +64,6 @@ async def register(
     
     db.add(new_user)
     await db.commit()
-    await db.refresh(new_user)
     
     # Create access token
     access_token = create_access_token(
@@ -127,7 +128,7 @@ async def login(
 
 @router.get("/me", response_model=UserResponse)
 async def get_current_user_info(
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user_read)
 ):
     """
     Get current authenticated user information
@@ -197,7 +198,6 @@ async def create_user_admin(
     
     db.add(new_user)
     await db.commit()
-    await db.refresh(new_user)
     
     return UserResponse.model_validate(new_user)
 
@@ -206,8 +206,8 @@ async def create_user_admin(
 async def list_users(
     skip: int = 0,
     limit: int = 100,
-    db: AsyncSession = Depends(get_db),
-    admin: User = Depends(require_admin)
+    db: AsyncSession = Depends(get_read_db),
+    admin: User = Depends(require_admin_read)
 ):
     """
     List all users (Admin only)
@@ -225,8 +225,8 @@ async def list_users(
 @router.get("/admin/users/{user_id}", response_model=UserResponse)
 async def get_user(
     user_id: str,
-    db: AsyncSession = Depends(get_db),
-    admin: User = Depends(require_admin)
+    db: AsyncSession = Depends(get_read_db),
+    admin: User = Depends(require_admin_read)
 ):
     """
     Get user by ID (Admin only)
@@ -299,7 +299,6 @@ async def update_user(
         user.is_active = request.is_active
     
     await db.commit()
-    await db.refresh(user)
     
     return UserResponse.model_validate(user)
 
@@ -1,27 +1,43 @@
 """
 Book management API routes
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from typing import List
-from app.database import get_db
-from app.models import Book, Coupon, RedemptionHistory
+from sqlalchemy import select, func, union_all, any_, bindparam, String
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import noload
+from datetime import date, datetime, time, timedelta, timezone
+from typing import List, Optional
+from app.database import get_db, get_read_db, read_session_factory
+from app.models import Book, Coupon, CouponCode, RedemptionHistory, RedemptionDailyRollup
 from app.schemas import (
     CreateBookRequest,
     BookResponse,
+    BookInventoryResponse,
     GenerateCodesRequest,
     UploadCodesRequest,
     CodeGenerationResponse,
     CouponResponse,
-    RedemptionHistoryResponse
+    RedemptionHistoryResponse,
+    DailyRedemptionsResponse
 )
+from app.services.book_policy import book_policies
 from app.services.code_generator import CodeGenerator
+from app.services.export_service import ENCODERS, ExportService
+from app.services.partition_service import CouponPartitionService
+from app.utils.enums import CouponState, ExportDataset, ExportFormat
+from app.utils.etag import not_modified
 from app.utils.exceptions import DuplicateCodeException
+from app.utils.serialization import JSONSerializer
 
 
 router = APIRouter(prefix="/api/v1/books", tags=["Books"])
 
+coupon_list = JSONSerializer(List[CouponResponse])
+history_list = JSONSerializer(List[RedemptionHistoryResponse])
+
 
 @router.post("/", response_model=BookResponse, status_code=status.HTTP_201_CREATED)
 async def create_book(
@@ -53,8 +69,9 @@ async def create_book(
     )
     
     db.add(book)
+    await db.flush()
+    await CouponPartitionService().create_book_partition(db, book.book_id)
     await db.commit()
-    await db.refresh(book)
     
     return book
 
@@ -62,11 +79,13 @@ async def create_book(
 @router.get("/{book_id}", response_model=BookResponse)
 async def get_book(
     book_id: str,
-    db: AsyncSession = Depends(get_db)
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """Get a coupon book by ID"""
+    """Get a coupon book by ID (ETag from updated_at)"""
     result = await db.execute(
-        select(Book).where(Book.book_id == book_id)
+        select(Book).where(Book.book_id == book_id).options(noload(Book.coupons))
     )
     book = result.scalar_one_or_none()
     
@@ -76,19 +95,25 @@ async def get_book(
             detail=f"Book {book_id} not found"
         )
     
+    cached = not_modified(request, response, book.book_id, book.updated_at)
+    if cached is not None:
+        return cached
+    
     return book
 
 
 @router.get("/", response_model=List[BookResponse])
 async def list_books(
+    request: Request,
+    response: Response,
     owner_id: str = None,
     is_active: bool = None,
     skip: int = 0,
     limit: int = 100,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """List coupon books with optional filters"""
-    query = select(Book)
+    """List coupon books with optional filters (ETag from the page's updated_at)"""
+    query = select(Book).options(noload(Book.coupons))
     
     if owner_id:
         query = query.where(Book.owner_id == owner_id)
@@ -100,6 +125,10 @@ async def list_books(
     result = await db.execute(query)
     books = result.scalars().all()
     
+    cached = not_modified(request, response, [(book.book_id, book.updated_at) for book in books])
+    if cached is not None:
+        return cached
+    
     return books
 
 
@@ -130,29 +159,43 @@ async def generate_codes(
             detail=f"Book {book_id} not found"
         )
     
-    # Get existing codes for this book to avoid collisions
-    result = await db.execute(
-        select(Coupon.code).where(Coupon.book_id == book_id)
-    )
-    existing_codes = set(result.scalars().all())
-    
-    # Generate codes
+    # Generate codes. They are unique across all books (coupon_codes), so
+    # candidates taken by any book are dropped and generated again.
     generator = CodeGenerator()
     pattern = request.pattern or book.code_pattern
+    codes: list[str] = []
+    taken: set[str] = set()
     
     try:
-        codes = generator.generate_codes(
-            count=request.count,
-            pattern=pattern,
-            length=request.length,
-            existing_codes=existing_codes
-        )
+        for _ in range(generator.settings.MAX_COLLISION_RETRIES + 1):
+            candidates = generator.generate_codes(
+                count=request.count - len(codes),
+                pattern=pattern,
+                length=request.length,
+                existing_codes=taken.union(codes)
+            )
+            result = await db.execute(
+                select(CouponCode.code)
+                .where(CouponCode.code == any_(bindparam("codes", candidates, type_=ARRAY(String))))
+            )
+            hits = set(result.scalars().all())
+            taken.update(hits)
+            codes.extend(code for code in candidates if code not in hits)
+            if len(codes) == request.count:
+                break
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         )
     
+    if len(codes) < request.count:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Could not generate {request.count} codes not used by another book. "
+                   f"Consider increasing code length or changing pattern."
+        )
+    
     # Create coupon records
     coupons = [
         Coupon(
@@ -168,7 +211,15 @@ async def generate_codes(
     # Update book total count
     book.total_code_count += len(codes)
     
-    await db.commit()
+    try:
+        await db.commit()
+    except IntegrityError:
+        # Another request registered one of these codes after the check
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A generated code was taken by a concurrent request; retry"
+        )
     
     return CodeGenerationResponse(
         book_id=book_id,
@@ -202,9 +253,9 @@ async def upload_codes(
             detail=f"Book {book_id} not found"
         )
     
-    # Check for duplicate codes in database
+    # Check for duplicate codes in database (across all books)
     result = await db.execute(
-        select(Coupon.code).where(Coupon.code.in_(request.codes))
+        select(CouponCode.code).where(CouponCode.code.in_(request.codes))
     )
     existing = result.scalars().all()
     
@@ -241,13 +292,19 @@ async def upload_codes(
 @router.get("/{book_id}/coupons", response_model=List[CouponResponse])
 async def get_book_coupons(
     book_id: str,
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Get all coupons for a specific book
     
+    The ETag covers the page's codes, updated_at and lock expiry, so an
+    unchanged page is answered with a 304 before anything is serialized.
+    Expired locks read as released, as in GET /coupons/{code}.
+    
     Args:
         book_id: Book ID
         skip: Pagination offset
@@ -255,7 +312,7 @@ async def get_book_coupons(
     """
     # Check if book exists
     result = await db.execute(
-        select(Book).where(Book.book_id == book_id)
+        select(Book.book_id).where(Book.book_id == book_id)
     )
     book = result.scalar_one_or_none()
     
@@ -265,32 +322,122 @@ async def get_book_coupons(
             detail=f"Book {book_id} not found"
         )
     
-    # Get coupons
-    query = select(Coupon).where(Coupon.book_id == book_id).offset(skip).limit(limit)
+    # Plain rows: no ORM objects, no redemption_history loads
+    query = select(*Coupon.response_columns()).where(Coupon.book_id == book_id).offset(skip).limit(limit)
     result = await db.execute(query)
-    coupons = result.scalars().all()
+    coupons = result.all()
     
-    return [CouponResponse.model_validate(c) for c in coupons]
+    cached = not_modified(request, response, [(c.code, c.updated_at, c.lock_expired) for c in coupons])
+    if cached is not None:
+        return cached
+    
+    return coupon_list.render(coupons, len(coupons), headers=response.headers)
+
+
+@router.get("/{book_id}/inventory", response_model=BookInventoryResponse)
+async def get_book_inventory(
+    book_id: str,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Get coupon counts per state for a book
+    
+    Expired books are swept by the expiration job, so counts are accurate
+    without every coupon having been touched by redemption traffic.
+    """
+    result = await db.execute(
+        select(Book.book_id, Book.expiration_date, Book.coupons_expired_at)
+        .where(Book.book_id == book_id)
+    )
+    book = result.one_or_none()
+    
+    if not book:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Book {book_id} not found"
+        )
+    
+    result = await db.execute(
+        select(Coupon.state, func.count())
+        .where(Coupon.book_id == book_id)
+        .group_by(Coupon.state)
+    )
+    counts = {state.value: 0 for state in CouponState}
+    counts.update(dict(result.all()))
+    
+    return BookInventoryResponse(
+        book_id=book_id,
+        total=sum(counts.values()),
+        counts=counts,
+        expiration_date=book.expiration_date,
+        coupons_expired_at=book.coupons_expired_at
+    )
+
+
+@router.delete("/{book_id}/coupons", status_code=status.HTTP_204_NO_CONTENT)
+async def retire_book_coupons(
+    book_id: str,
+    archive: bool = False,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Retire a book's whole coupon inventory at once
+    
+    Detaches the book's coupons partition instead of deleting row by row.
+    With archive=true the detached table is kept for export, otherwise it
+    is dropped. Codes stay reserved and redemption history is kept.
+    """
+    result = await db.execute(
+        select(Book).where(Book.book_id == book_id)
+    )
+    book = result.scalar_one_or_none()
+    
+    if not book:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Book {book_id} not found"
+        )
+    
+    partitions = CouponPartitionService()
+    if archive:
+        await partitions.detach_book_partition(db, book_id)
+    else:
+        await partitions.drop_book_inventory(db, book_id)
+    
+    book.is_active = False
+    await book_policies.publish_change(db, book_id)
+    await db.commit()
 
 
 @router.get("/{book_id}/redemption-history", response_model=List[RedemptionHistoryResponse])
 async def get_book_redemption_history(
     book_id: str,
+    request: Request,
+    response: Response,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
     skip: int = 0,
     limit: int = 100,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Get redemption history for a specific book
     
+    History is partitioned by month of redeemed_at; a since/until window
+    restricts the scan to the matching partitions. Rows older than the
+    retention period only survive as daily rollups (see /redemptions/daily).
+    History rows never change, so the page's ids are its ETag.
+    
     Args:
         book_id: Book ID
+        since: Only redemptions at or after this time
+        until: Only redemptions before this time
         skip: Pagination offset
         limit: Pagination limit
     """
     # Check if book exists
     result = await db.execute(
-        select(Book).where(Book.book_id == book_id)
+        select(Book.book_id).where(Book.book_id == book_id)
     )
     book = result.scalar_one_or_none()
     
@@ -302,13 +449,132 @@ async def get_book_redemption_history(
     
     # Get redemption history
     query = (
-        select(RedemptionHistory)
+        select(*RedemptionHistory.__table__.columns)
         .where(RedemptionHistory.book_id == book_id)
         .order_by(RedemptionHistory.redeemed_at.desc())
         .offset(skip)
         .limit(limit)
     )
+    if since is not None:
+        query = query.where(RedemptionHistory.redeemed_at >= since)
+    if until is not None:
+        query = query.where(RedemptionHistory.redeemed_at < until)
     result = await db.execute(query)
-    history = result.scalars().all()
+    history = result.all()
+    
+    cached = not_modified(request, response, [h.history_id for h in history])
+    if cached is not None:
+        return cached
+    
+    return history_list.render(history, len(history), headers=response.headers)
+
+
+@router.get("/{book_id}/redemptions/daily", response_model=List[DailyRedemptionsResponse])
+async def get_book_daily_redemptions(
+    book_id: str,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Get per-day (UTC) redemption counts for a book
+    
+    Days still covered by history partitions are aggregated live; older
+    days come from redemption_daily_rollups.
+    
+    Args:
+        book_id: Book ID
+        start: First day to include
+        end: Last day to include
+    """
+    result = await db.execute(
+        select(Book.book_id).where(Book.book_id == book_id)
+    )
+    if result.scalar_one_or_none() is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Book {book_id} not found"
+        )
+    
+    day = func.date(func.timezone("UTC", RedemptionHistory.redeemed_at))
+    live = (
+        select(
+            day.label("day"),
+            func.count().label("redemptions"),
+            func.count(RedemptionHistory.user_id.distinct()).label("unique_users"),
+            func.count(RedemptionHistory.code.distinct()).label("unique_codes")
+        )
+        .where(RedemptionHistory.book_id == book_id)
+        .group_by(day)
+    )
+    rolled_up = select(
+        RedemptionDailyRollup.day,
+        RedemptionDailyRollup.redemptions,
+        RedemptionDailyRollup.unique_users,
+        RedemptionDailyRollup.unique_codes
+    ).where(RedemptionDailyRollup.book_id == book_id)
+    
+    if start is not None:
+        live = live.where(RedemptionHistory.redeemed_at >= datetime.combine(start, time.min, timezone.utc))
+        rolled_up = rolled_up.where(RedemptionDailyRollup.day >= start)
+    if end is not None:
+        live = live.where(
+            RedemptionHistory.redeemed_at < datetime.combine(end + timedelta(days=1), time.min, timezone.utc)
+        )
+        rolled_up = rolled_up.where(RedemptionDailyRollup.day <= end)
+    
+    # A day is either still live or already rolled up, never both
+    days = union_all(live, rolled_up).subquery()
+    result = await db.execute(select(days).order_by(days.c.day))
+    
+    return [DailyRedemptionsResponse.model_validate(row, from_attributes=True) for row in result]
+
+
+@router.get(
+    "/{book_id}/export/{dataset}",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"text/csv": {}, "application/x-ndjson": {}, "application/gzip": {}}}}
+)
+async def export_book_dataset(
+    request: Request,
+    book_id: str,
+    dataset: ExportDataset,
+    format: ExportFormat = ExportFormat.CSV,
+    gzip: bool = False,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Stream a book's coupons, assignments or redemption history as a file
+    
+    Rows come from a server-side cursor in one REPEATABLE READ snapshot, so
+    the whole book is exported without OFFSET paging and with constant
+    memory. Assignments are the assigned coupons with the user's email
+    and name; history is ordered by redeemed_at.
+    
+    Args:
+        book_id: Book ID
+        dataset: coupons, assignments or history
+        format: csv (with a header row) or ndjson
+        gzip: Send a .gz file instead of plain text
+    """
+    result = await db.execute(
+        select(Book.book_id).where(Book.book_id == book_id)
+    )
+    if result.scalar_one_or_none() is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Book {book_id} not found"
+        )
     
-    return [RedemptionHistoryResponse.model_validate(h) for h in history]
+    filename = f"{book_id}-{dataset.value}.{format.value}"
+    media_type = ENCODERS[format].media_type
+    if gzip:
+        filename += ".gz"
+        media_type = "application/gzip"
+    
+    service = ExportService(read_session_factory(request))
+    return StreamingResponse(
+        service.stream(book_id, dataset, format, compress=gzip),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
@@ -1,30 +1,46 @@
 """
 Coupon assignment and management API routes
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import datetime, timezone
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from app.database import get_db
-from app.models import Coupon
+from sqlalchemy import select, and_, any_, bindparam, String
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import noload
+from app.database import get_db, get_read_db
+from app.models import Coupon, CouponCode, Book, User
 from app.schemas import (
     AssignCouponRandomRequest,
     AssignCouponSpecificRequest,
     LockCouponRequest,
+    UnlockCouponRequest,
     RedeemCouponRequest,
+    BatchRedeemRequest,
+    BatchRedeemItemResult,
+    BatchRedeemResponse,
+    CouponLookupRequest,
+    CouponLookupResult,
+    CouponLookupResponse,
     AssignmentResponse,
     CouponResponse,
     RedemptionResponse
 )
 from app.services.assignment_service import AssignmentService
 from app.services.redemption_service import RedemptionService
+from app.utils.auth import require_admin
+from app.utils.enums import CouponState
+from app.utils.etag import not_modified
 from app.utils.exceptions import (
     CouponNotFoundException,
     CouponLockedException,
+    LockNotHeldException,
     NoCodesAvailableException,
     MaxAssignmentsReachedException,
     InvalidStateTransitionException,
     NoRedemptionsRemainingException,
-    CouponExpiredException
+    CouponExpiredException,
+    coupon_not_found_detail
 )
 
 
@@ -70,7 +86,7 @@ async def assign_random_coupons(
     except CouponNotFoundException as e:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail=str(e)
+            detail=e.detail
         )
 
 
@@ -97,7 +113,7 @@ async def assign_specific_coupon(
     except CouponNotFoundException as e:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail=str(e)
+            detail=e.detail
         )
     except MaxAssignmentsReachedException as e:
         raise HTTPException(
@@ -113,9 +129,10 @@ async def lock_coupon(
     db: AsyncSession = Depends(get_db)
 ):
     """
-    Lock a coupon for redemption using PostgreSQL advisory lock
+    Lock a coupon by taking a lease on it
     
-    Lock prevents concurrent redemption and expires after specified duration
+    The lease is owned by user_id and expires after lock_duration_seconds
+    unless renewed; only the owner can renew or unlock it before then.
     """
     redemption_service = RedemptionService()
     
@@ -132,7 +149,7 @@ async def lock_coupon(
     except CouponNotFoundException as e:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail=str(e)
+            detail=e.detail
         )
     except CouponLockedException as e:
         raise HTTPException(
@@ -146,23 +163,80 @@ async def lock_coupon(
         )
 
 
+@router.post("/lock/{code}/renew", response_model=CouponResponse)
+async def renew_coupon_lock(
+    code: str,
+    request: LockCouponRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Extend a lease held by user_id to lock_duration_seconds from now
+    
+    Fails with 409 if the lease already lapsed or belongs to another user.
+    """
+    redemption_service = RedemptionService()
+    
+    try:
+        coupon = await redemption_service.renew_lock(
+            db=db,
+            code=code,
+            user_id=request.user_id,
+            lock_duration_seconds=request.lock_duration_seconds
+        )
+        return CouponResponse.model_validate(coupon)
+        
+    except CouponNotFoundException as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=e.detail
+        )
+    except LockNotHeldException as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+
+
 @router.post("/unlock/{code}", response_model=CouponResponse)
 async def unlock_coupon(
     code: str,
+    request: UnlockCouponRequest,
     db: AsyncSession = Depends(get_db)
 ):
     """
-    Unlock a coupon and release advisory lock
+    Release a coupon's lease held by user_id
+    
+    Fails with 409 if another user holds an active lease; a lapsed lease
+    can be released by anyone.
     """
+    return await _unlock(db, code, request.user_id)
+
+
+@router.post("/unlock/{code}/force", response_model=CouponResponse)
+async def force_unlock_coupon(
+    code: str,
+    db: AsyncSession = Depends(get_db),
+    admin: User = Depends(require_admin)
+):
+    """Release a coupon's lease whoever holds it (admin only)"""
+    return await _unlock(db, code, None)
+
+
+async def _unlock(db: AsyncSession, code: str, user_id: Optional[str]) -> CouponResponse:
     redemption_service = RedemptionService()
     
     try:
-        coupon = await redemption_service.unlock_coupon(db=db, code=code)
+        coupon = await redemption_service.unlock_coupon(db=db, code=code, user_id=user_id)
         return CouponResponse.model_validate(coupon)
         
     except CouponNotFoundException as e:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
+            detail=e.detail
+        )
+    except LockNotHeldException as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
             detail=str(e)
         )
 
@@ -177,7 +251,8 @@ async def redeem_coupon(
     Redeem a coupon with advisory lock protection
     
     Handles both single and multi-redemption coupons.
-    Creates audit trail in RedemptionHistory.
+    Creates audit trail in RedemptionHistory. Set wait_seconds to queue
+    behind concurrent redemptions of a hot code instead of getting a 409.
     """
     redemption_service = RedemptionService()
     
@@ -186,7 +261,8 @@ async def redeem_coupon(
             db=db,
             code=code,
             user_id=request.user_id,
-            metadata=request.metadata
+            metadata=request.metadata,
+            wait_seconds=request.wait_seconds
         )
         
         return RedemptionResponse(
@@ -202,7 +278,7 @@ async def redeem_coupon(
     except CouponNotFoundException as e:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail=str(e)
+            detail=e.detail
         )
     except CouponLockedException as e:
         raise HTTPException(
@@ -221,21 +297,161 @@ async def redeem_coupon(
         )
 
 
+@router.post("/redeem:batch", response_model=BatchRedeemResponse)
+async def redeem_coupons_batch(
+    request: BatchRedeemRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Redeem several coupons in one transaction
+    
+    With atomic=true (default) either every code is redeemed or none is;
+    with atomic=false each code succeeds or fails on its own.
+    Per-item failures are reported with the status code the single-code
+    endpoint would have returned.
+    """
+    redemption_service = RedemptionService()
+    
+    outcomes = await redemption_service.redeem_coupons_batch(
+        db=db,
+        user_id=request.user_id,
+        items=[
+            (item.code, item.metadata if item.metadata is not None else request.metadata)
+            for item in request.items
+        ],
+        atomic=request.atomic
+    )
+    
+    results = []
+    for code, coupon, history, error in outcomes:
+        if error is not None:
+            results.append(BatchRedeemItemResult(
+                code=code,
+                success=False,
+                status_code=error.status_code,
+                detail=error.detail
+            ))
+        else:
+            results.append(BatchRedeemItemResult(
+                code=code,
+                success=True,
+                status_code=status.HTTP_200_OK,
+                redeemed_at=history.redeemed_at,
+                redemption_count=coupon.redemption_count,
+                remaining_redemptions=coupon.remaining_redemptions
+            ))
+    
+    redeemed_count = sum(1 for r in results if r.success)
+    
+    return BatchRedeemResponse(
+        success=redeemed_count == len(results),
+        atomic=request.atomic,
+        redeemed_count=redeemed_count,
+        failed_count=len(results) - redeemed_count,
+        results=results
+    )
+
+
+@router.post(":lookup", response_model=CouponLookupResponse)
+async def lookup_coupons(
+    request: CouponLookupRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Look up state, remaining redemptions and book expiry for many codes
+    
+    Runs a single `WHERE code = ANY(:codes)` query on coupon_codes joined to
+    the owning partitions and books, without loading redemption history.
+    Unknown codes come back with found=false.
+    """
+    codes = list(dict.fromkeys(request.codes))
+    
+    result = await db.execute(
+        select(
+            Coupon.code,
+            Coupon.book_id,
+            Coupon.assigned_user_id,
+            Coupon.state,
+            Coupon.redemption_count,
+            Coupon.max_redemptions,
+            Coupon.is_locked,
+            Coupon.locked_until,
+            Book.expiration_date
+        )
+        .select_from(CouponCode)
+        .join(Coupon, and_(Coupon.code == CouponCode.code, Coupon.book_id == CouponCode.book_id))
+        .join(Book, Book.book_id == Coupon.book_id)
+        .where(CouponCode.code == any_(bindparam("codes", codes, type_=ARRAY(String))))
+    )
+    rows = {row.code: row for row in result}
+    
+    now = datetime.now(timezone.utc)
+    results = []
+    for code in codes:
+        row = rows.get(code)
+        if row is None:
+            results.append(CouponLookupResult(code=code, found=False))
+            continue
+        lock_expired = RedemptionService.is_lock_expired(row, now)
+        results.append(CouponLookupResult(
+            code=code,
+            found=True,
+            book_id=row.book_id,
+            state=_unlocked_state(row) if lock_expired else row.state,
+            redemption_count=row.redemption_count,
+            max_redemptions=row.max_redemptions,
+            remaining_redemptions=max(0, row.max_redemptions - row.redemption_count),
+            is_locked=False if lock_expired else row.is_locked,
+            locked_until=None if lock_expired else row.locked_until,
+            expiration_date=row.expiration_date
+        ))
+    
+    return CouponLookupResponse(
+        found_count=len(rows),
+        not_found_count=len(codes) - len(rows),
+        results=results
+    )
+
+
 @router.get("/{code}", response_model=CouponResponse)
 async def get_coupon(
     code: str,
-    db: AsyncSession = Depends(get_db)
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """Get coupon details by code"""
+    """Get coupon details by code (ETag from updated_at)"""
     result = await db.execute(
-        select(Coupon).where(Coupon.code == code)
+        select(Coupon).where(Coupon.matches_code(code)).options(noload(Coupon.redemption_history))
     )
     coupon = result.scalar_one_or_none()
     
     if not coupon:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Coupon {code} not found"
+            detail=coupon_not_found_detail(code)
         )
     
-    return CouponResponse.model_validate(coupon)
+    # An expired lock reads as released before the sweeper bumps updated_at
+    lock_expired = RedemptionService.is_lock_expired(coupon)
+    cached = not_modified(request, response, coupon.code, coupon.updated_at, lock_expired)
+    if cached is not None:
+        return cached
+    
+    coupon_response = CouponResponse.model_validate(coupon)
+    
+    # Present an expired lock as released; the lock sweeper persists it
+    if lock_expired:
+        coupon_response = coupon_response.model_copy(update={
+            "state": _unlocked_state(coupon),
+            "is_locked": False,
+            "locked_until": None,
+            "locked_by": None
+        })
+    
+    return coupon_response
+
+
+def _unlocked_state(coupon) -> str:
+    """State a coupon returns to once its lock is released"""
+    return (CouponState.ASSIGNED if coupon.assigned_user_id else CouponState.UNASSIGNED).value
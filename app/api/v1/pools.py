@@ -9,7 +9,7 @@ from typing import List
 import random
 from datetime import datetime
 
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.models import UserPool, User, Coupon, Book
 from app.schemas import (
     UserPoolCreate,
@@ -21,7 +21,7 @@ from app.schemas import (
     BulkAssignCouponsRequest,
     BulkAssignmentResponse
 )
-from app.utils.auth import get_current_user
+from app.utils.auth import get_current_user, get_current_user_read
 from app.utils.enums import CouponState
 
 
@@ -42,17 +42,16 @@ async def create_pool(
         created_by=current_user.user_id
     )
     
-    # Add initial users if provided
+    # Add initial users if provided (always set, so len() below never lazy loads)
+    pool.users = []
     if request.user_ids:
         result = await db.execute(
             select(User).where(User.user_id.in_(request.user_ids))
         )
-        users = result.scalars().all()
-        pool.users = list(users)
+        pool.users = list(result.scalars().all())
     
     db.add(pool)
     await db.commit()
-    await db.refresh(pool, ['users'])
     
     return UserPoolResponse(
         pool_id=pool.pool_id,
@@ -68,8 +67,8 @@ async def create_pool(
 
 @router.get("/", response_model=List[UserPoolResponse])
 async def list_pools(
-    current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    current_user: User = Depends(get_current_user_read),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """List all user pools"""
     result = await db.execute(
@@ -97,8 +96,8 @@ async def list_pools(
 @router.get("/{pool_id}", response_model=UserPoolDetailResponse)
 async def get_pool(
     pool_id: str,
-    current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    current_user: User = Depends(get_current_user_read),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get pool details with user list"""
     from sqlalchemy import select, text
@@ -132,7 +131,7 @@ async def get_pool(
     
     users_info = [
         PoolUserInfo(
-            user_id=row.user_id,
+            user_id=str(row.user_id),
             name=row.name,
             email=row.email,
             added_at=row.added_at
@@ -183,7 +182,6 @@ async def update_pool(
         pool.is_active = request.is_active
     
     await db.commit()
-    await db.refresh(pool)
     
     return UserPoolResponse(
         pool_id=pool.pool_id,
@@ -253,7 +251,6 @@ async def add_users_to_pool(
             pool.users.append(user)
     
     await db.commit()
-    await db.refresh(pool, ['users'])
     
     return UserPoolDetailResponse(
         pool_id=pool.pool_id,
@@ -293,7 +290,6 @@ async def remove_users_from_pool(
     pool.users = [user for user in pool.users if user.user_id not in request.user_ids]
     
     await db.commit()
-    await db.refresh(pool, ['users'])
     
     return UserPoolDetailResponse(
         pool_id=pool.pool_id,
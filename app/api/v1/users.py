@@ -1,16 +1,20 @@
 """
 User-related API routes
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from app.database import get_db
+from sqlalchemy import select, func
+from app.database import get_db, get_read_db
 from app.models import User, Coupon
-from app.schemas import UserCreate, UserResponse, UserCouponsResponse, CouponResponse
+from app.schemas import UserCreate, UserResponse, UserCouponsResponse
+from app.utils.etag import not_modified
+from app.utils.serialization import JSONSerializer
 
 
 router = APIRouter(prefix="/api/v1/users", tags=["Users"])
 
+user_coupons = JSONSerializer(UserCouponsResponse)
+
 
 @router.post("", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
 async def create_user(
@@ -51,7 +55,6 @@ async def create_user(
     
     db.add(new_user)
     await db.commit()
-    await db.refresh(new_user)
     
     return new_user
 
@@ -59,7 +62,7 @@ async def create_user(
 @router.get("/search/by-email", response_model=UserResponse)
 async def search_user_by_email(
     email: str,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Search for a user by email address"""
     result = await db.execute(
@@ -79,7 +82,7 @@ async def search_user_by_email(
 @router.get("/{user_id}", response_model=UserResponse)
 async def get_user(
     user_id: str,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get user details by ID"""
     result = await db.execute(
@@ -99,40 +102,44 @@ async def get_user(
 @router.get("/{user_id}/coupons", response_model=UserCouponsResponse)
 async def get_user_coupons(
     user_id: str,
+    request: Request,
+    response: Response,
     book_id: str = None,
     skip: int = 0,
     limit: int = 100,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Get all coupons assigned to a user
     
+    Expired locks read as released, as in GET /coupons/{code}; the ETag
+    covers lock expiry as well as updated_at.
+    
     Args:
         user_id: User ID
         book_id: Optional filter by book ID
         skip: Pagination offset
         limit: Pagination limit
     """
-    query = select(Coupon).where(Coupon.assigned_user_id == user_id)
-    
+    filters = [Coupon.assigned_user_id == user_id]
     if book_id:
-        query = query.where(Coupon.book_id == book_id)
+        filters.append(Coupon.book_id == book_id)
     
     # Get total count
-    count_query = select(Coupon).where(Coupon.assigned_user_id == user_id)
-    if book_id:
-        count_query = count_query.where(Coupon.book_id == book_id)
+    result = await db.execute(select(func.count()).select_from(Coupon).where(*filters))
+    total_count = result.scalar_one()
     
-    result = await db.execute(count_query)
-    total_count = len(result.scalars().all())
-    
-    # Get paginated results
-    query = query.offset(skip).limit(limit)
+    # Get paginated results as plain rows
+    query = select(*Coupon.response_columns()).where(*filters).offset(skip).limit(limit)
     result = await db.execute(query)
-    coupons = result.scalars().all()
+    coupons = result.all()
+    
+    cached = not_modified(request, response, total_count, [(c.code, c.updated_at, c.lock_expired) for c in coupons])
+    if cached is not None:
+        return cached
     
-    return UserCouponsResponse(
-        user_id=user_id,
-        total_count=total_count,
-        coupons=[CouponResponse.model_validate(c) for c in coupons]
+    return user_coupons.render(
+        {"user_id": user_id, "total_count": total_count, "coupons": coupons},
+        len(coupons),
+        headers=response.headers
     )
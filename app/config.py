@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Optional
 
 
 class Settings(BaseSettings):
@@ -13,25 +14,92 @@ class Settings(BaseSettings):
     
     # Database
     DATABASE_URL: str
+    DB_POOL_SIZE: int = 20
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0  # Seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = 1800  # Replace connections older than this (-1 disables)
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_CACHE_SIZE: int = 100  # Prepared statements cached per connection (0 for PgBouncer)
+    DB_PGBOUNCER_TRANSACTION_POOLING: bool = False  # Connecting through PgBouncer in transaction mode
+    DB_ECHO: bool = False  # Log every SQL statement
+    WEB_CONCURRENCY: int = 1  # Worker processes, each with its own pool
+    READ_REPLICA_URL: Optional[str] = None  # Read-only endpoints use this when set
+    READ_YOUR_WRITES_SECONDS: float = 5.0  # Pin a client's reads to the primary after it writes
+    READ_YOUR_WRITES_MAX_USERS: int = 100000  # Authenticated writers pinned per worker (least recent dropped)
+    DB_READ_ISOLATION_LEVEL: str = "READ COMMITTED"  # GET endpoints: REPEATABLE READ for one snapshot, AUTOCOMMIT for no BEGIN/ROLLBACK
     
     # JWT Security
     SECRET_KEY: str = "dev-secret-key-change-in-production-use-openssl-rand-hex-32"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    TRUSTED_PROXY_HOPS: int = 0  # Reverse proxies in front of the API that append X-Forwarded-For (0: use the peer address)
     
     # Concurrency
     LOCK_TIMEOUT_SECONDS: int = 300
     MAX_LOCK_RETRIES: int = 3
+    LOCK_SWEEPER_ENABLED: bool = True
+    LOCK_SWEEP_INTERVAL_SECONDS: int = 30
+    LOCK_SWEEP_BATCH_SIZE: int = 1000
+    REDEEM_MAX_WAIT_SECONDS: float = 5.0  # Cap on the caller's wait_seconds budget
+    REDEEM_WAIT_QUEUE_LIMIT: int = 100  # Max queued redemptions per code and process
+    LOCK_BACKEND: str = "advisory"  # Redemption locks: advisory, lease or in_process (single worker only)
+    LOCK_LEASE_TTL_SECONDS: int = 30  # Lease backend: a crashed holder's lease expires after this
+    
+    # Book expiration job
+    EXPIRATION_JOB_ENABLED: bool = True
+    EXPIRATION_JOB_INTERVAL_SECONDS: int = 300
+    EXPIRATION_CHUNK_SIZE: int = 5000
+    
+    # Redemption history partitions
+    HISTORY_MAINTENANCE_ENABLED: bool = True
+    HISTORY_MAINTENANCE_INTERVAL_SECONDS: int = 3600
+    HISTORY_PARTITIONS_AHEAD: int = 2  # Months created in advance
+    HISTORY_RETENTION_MONTHS: int = 13  # Older months are rolled up and dropped
     
     # Code Generation
     CODE_GENERATION_CHARSET: str = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
     MAX_COLLISION_RETRIES: int = 3
     
+    # Idempotency-Key support on redeem/assign
+    IDEMPOTENCY_ENABLED: bool = True
+    IDEMPOTENCY_TTL_SECONDS: int = 86400  # How long a completed response is replayed
+    IDEMPOTENCY_LOCK_SECONDS: int = 60  # A reservation whose request never finished lapses after this
+    IDEMPOTENCY_CACHE_SIZE: int = 10000  # Completed responses kept in memory per worker
+    IDEMPOTENCY_PURGE_INTERVAL_SECONDS: int = 3600
+    
+    # Cross-worker cache invalidation (LISTEN/NOTIFY)
+    INVALIDATION_BUS_ENABLED: bool = True  # Off: the caches below are bypassed
+    INVALIDATION_CHANNEL: str = "cache_invalidation"
+    INVALIDATION_LISTEN_URL: Optional[str] = None  # Direct Postgres URL when DATABASE_URL goes through PgBouncer
+    INVALIDATION_BATCH_MS: int = 5  # Notifications arriving this close together are evicted in one pass
+    INVALIDATION_HEALTHCHECK_SECONDS: int = 10  # Listener connection ping / connect timeout
+    BOOK_POLICY_CACHE_SIZE: int = 10000  # Books whose rules each worker keeps in memory
+    BOOK_POLICY_CACHE_TTL_SECONDS: int = 300  # Upper bound for writes made without a NOTIFY
+    
+    # Unknown-code shield on the single-code coupon endpoints
+    CODE_GUARD_ENABLED: bool = True
+    CODE_FILTER_ERROR_RATE: float = 0.01  # Bloom filter false positives (those go to the database)
+    CODE_MISS_LIMIT: int = 20  # 404s per client and window before 429s
+    CODE_MISS_WINDOW_SECONDS: int = 60
+    CODE_MISS_MAX_CLIENTS: int = 100000  # Clients tracked per worker (least recently seen dropped)
+    
+    # SQL instrumentation
+    QUERY_STATS_ENABLED: bool = True
+    SLOW_REQUEST_DB_MS: int = 200  # Log requests whose total DB time exceeds this
+    
     # Pagination
     DEFAULT_PAGE_SIZE: int = 50
     MAX_PAGE_SIZE: int = 100
     
+    # Responses
+    FAST_JSON_MIN_ROWS: int = 1  # List endpoints at least this long skip FastAPI's response_model pass (faster from 1 row)
+    EXPORT_BATCH_SIZE: int = 2000  # Rows fetched from the export cursor per chunk
+    COMPRESSION_ENABLED: bool = True  # br (if the brotli package is installed) or gzip
+    COMPRESSION_MIN_BYTES: int = 1024  # Smaller bodies are sent uncompressed
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
+    
     class Config:
         env_file = ".env"
         case_sensitive = False
@@ -1,17 +1,169 @@
+import logging
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+from fastapi import Request
+from sqlalchemy import event, text
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 from app.config import get_settings
+from app.utils.read_your_writes import reads_pinned_to_primary
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+def _create_engine(url: str):
+    """Create an async engine with the configured pool settings"""
+    connect_args = {
+        # asyncpg's own statement cache and SQLAlchemy's adapter cache;
+        # both must be 0 behind a transaction-mode connection pooler
+        "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+    }
+    if settings.DB_PGBOUNCER_TRANSACTION_POOLING:
+        # Consecutive transactions may run on different server connections:
+        # nothing may be cached per connection, and asyncpg's per-connection
+        # prepared statement names would collide on the shared backends
+        connect_args.update(
+            statement_cache_size=0,
+            prepared_statement_cache_size=0,
+            prepared_statement_name_func=lambda: f"__asyncpg_{uuid.uuid4()}__",
+        )
+    return create_async_engine(
+        url,
+        echo=settings.DB_ECHO,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args=connect_args,
+    )
+
 
 # Create async engine
-engine = create_async_engine(
-    settings.DATABASE_URL,
-    echo=settings.DEBUG,
-    pool_size=20,
-    max_overflow=10,
-    pool_pre_ping=True,
-)
+engine = _create_engine(settings.DATABASE_URL)
+
+# Read-only endpoints use the replica when one is configured
+read_engine = _create_engine(settings.READ_REPLICA_URL) if settings.READ_REPLICA_URL else engine
+
+
+def _read_only(async_engine):
+    """
+    View of an engine (same pool) whose transactions are READ ONLY
+    
+    asyncpg opens them as BEGIN ISOLATION LEVEL ... READ ONLY, so this
+    costs no extra round trip. With DB_READ_ISOLATION_LEVEL=AUTOCOMMIT no
+    transaction is opened at all and READ ONLY is not enforced.
+    """
+    return async_engine.execution_options(
+        isolation_level=settings.DB_READ_ISOLATION_LEVEL,
+        postgresql_readonly=True,
+    )
+
+
+
+class QueryStats:
+    """SQL statistics collected for one request (or one tracked block)"""
+    
+    def __init__(self, parent: Optional["QueryStats"] = None):
+        self.parent = parent
+        self.count = 0
+        self.total_seconds = 0.0
+        self.slowest_seconds = 0.0
+        self.slowest_statement: Optional[str] = None
+    
+    def record(self, statement: str, elapsed: float):
+        self.count += 1
+        self.total_seconds += elapsed
+        if elapsed > self.slowest_seconds:
+            self.slowest_seconds = elapsed
+            self.slowest_statement = statement
+        if self.parent is not None:
+            self.parent.record(statement, elapsed)
+
+
+# Stats of the request currently executing (contextvars follow SQLAlchemy's greenlets)
+_current_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+@contextmanager
+def track_queries():
+    """Collect SQL statistics for every statement executed inside the block"""
+    stats = QueryStats(parent=_current_query_stats.get())
+    token = _current_query_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_query_stats.reset(token)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+    stats = _current_query_stats.get()
+    if stats is not None:
+        stats.record(statement, elapsed)
+
+
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_start_time"):
+        conn.info["query_start_time"].pop()
+
+
+for _engine in {engine, read_engine}:
+    event.listen(_engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(_engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(_engine.sync_engine, "handle_error", _handle_error)
+
+
+def pool_status() -> dict:
+    """Current connection pool usage of this worker"""
+    pool = engine.sync_engine.pool
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+        "max_connections": settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW,
+    }
+
+
+async def check_pool_capacity() -> bool:
+    """
+    Warn if all workers together can open more connections than Postgres allows
+    
+    Every worker process has its own pool, so the worst case is
+    (DB_POOL_SIZE + DB_MAX_OVERFLOW) * WEB_CONCURRENCY connections.
+    
+    Returns:
+        True if the configured pools fit into max_connections
+    """
+    async with engine.connect() as conn:
+        max_connections = int((await conn.execute(text("SHOW max_connections"))).scalar())
+        reserved = int((await conn.execute(text("SHOW superuser_reserved_connections"))).scalar())
+    
+    available = max_connections - reserved
+    required = (settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW) * settings.WEB_CONCURRENCY
+    if required > available:
+        logger.warning(
+            "Connection pools may exceed Postgres max_connections: "
+            "(%d pool_size + %d max_overflow) x %d workers = %d > %d available",
+            settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW, settings.WEB_CONCURRENCY,
+            required, available
+        )
+        return False
+    
+    logger.info("Connection pools need up to %d of %d available connections", required, available)
+    return True
+
 
 # Create session factory
 AsyncSessionLocal = async_sessionmaker(
@@ -22,6 +174,23 @@ AsyncSessionLocal = async_sessionmaker(
     autocommit=False,
 )
 
+# Read-only sessions on the replica (or the primary without one) and on the primary
+ReadSessionLocal = async_sessionmaker(
+    _read_only(read_engine),
+    class_=AsyncSession,
+    expire_on_commit=False,
+    autoflush=False,
+    autocommit=False,
+)
+
+PrimaryReadSessionLocal = async_sessionmaker(
+    _read_only(engine),
+    class_=AsyncSession,
+    expire_on_commit=False,
+    autoflush=False,
+    autocommit=False,
+)
+
 # Base class for models
 Base = declarative_base()
 
@@ -39,6 +208,34 @@ async def get_db() -> AsyncSession:
             await session.close()
 
 
+def read_session_factory(request: Request) -> async_sessionmaker:
+    """
+    Read-only session factory for a request
+    
+    The read replica (if configured), or the primary when the client wrote
+    within the last READ_YOUR_WRITES_SECONDS so it sees its own changes.
+    """
+    return PrimaryReadSessionLocal if reads_pinned_to_primary(request) else ReadSessionLocal
+
+
+async def get_read_db(request: Request) -> AsyncSession:
+    """
+    Dependency for read-only (GET) endpoints
+    
+    Opens READ ONLY transactions at DB_READ_ISOLATION_LEVEL and never
+    commits: closing the session ends the transaction. Writing through
+    this session fails in PostgreSQL.
+    
+    Sessions come from read_session_factory(), so a client that just wrote
+    reads from the primary.
+    """
+    async with read_session_factory(request)() as session:
+        try:
+            yield session
+        finally:
+            await session.close()
+
+
 async def get_db_direct():
     """Direct database session for scripts (not a generator)"""
     async with AsyncSessionLocal() as session:
@@ -1,15 +1,81 @@
 """
 Main FastAPI application
 """
-from fastapi import FastAPI
+import logging
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import JSONResponse, Response
+from sqlalchemy.exc import DataError
 from app.config import get_settings
+from app.database import engine, read_engine, pool_status, check_pool_capacity
 from app.api.v1 import books, coupons, users, pools
 from app.api import auth
+from app.services.background import PeriodicTask
+from app.services.lock_sweeper import LockSweeper
+from app.services.expiration_service import ExpirationService
+from app.services.history_retention import HistoryRetentionService
+from app.services.idempotency_service import IdempotencyService
+from app.services.invalidation_bus import invalidation_bus
+from app.utils import metrics
+from app.utils.code_guard import CodeGuardMiddleware
+from app.utils.compression import CompressionMiddleware
+from app.utils.idempotency import IdempotencyMiddleware
+from app.utils.query_stats import QueryStatsMiddleware
+from app.utils.read_your_writes import PRIMARY_UNTIL_HEADER, ReadYourWritesMiddleware
 
 # Get settings
 settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Check pool sizing, start and stop background jobs"""
+    try:
+        await check_pool_capacity()
+    except Exception as e:
+        logger.warning("Connection pool self-check failed: %s", e)
+    
+    tasks = []
+    if settings.LOCK_SWEEPER_ENABLED:
+        tasks.append(PeriodicTask(
+            "lock-sweeper",
+            LockSweeper().release_expired_locks,
+            settings.LOCK_SWEEP_INTERVAL_SECONDS
+        ))
+    if settings.EXPIRATION_JOB_ENABLED:
+        tasks.append(PeriodicTask(
+            "book-expiration",
+            ExpirationService().expire_due_books,
+            settings.EXPIRATION_JOB_INTERVAL_SECONDS
+        ))
+    if settings.HISTORY_MAINTENANCE_ENABLED:
+        tasks.append(PeriodicTask(
+            "history-retention",
+            HistoryRetentionService().maintain,
+            settings.HISTORY_MAINTENANCE_INTERVAL_SECONDS
+        ))
+    
+    if settings.IDEMPOTENCY_ENABLED:
+        tasks.append(PeriodicTask(
+            "idempotency-purge",
+            IdempotencyService().purge_expired,
+            settings.IDEMPOTENCY_PURGE_INTERVAL_SECONDS
+        ))
+    
+    for task in tasks:
+        task.start()
+    if settings.INVALIDATION_BUS_ENABLED:
+        invalidation_bus.start()
+    try:
+        yield
+    finally:
+        await invalidation_bus.stop()
+        for task in tasks:
+            await task.stop()
+
 
 # Create FastAPI app
 app = FastAPI(
@@ -17,9 +83,55 @@ app = FastAPI(
     description="Digital coupon book management system with JWT authentication and role-based access",
     version=settings.APP_VERSION,
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
+
+@app.exception_handler(DataError)
+async def malformed_id_handler(request: Request, exc: DataError):
+    """Ids are native UUID columns: a malformed id cannot match any row"""
+    if "uuid" not in str(exc.orig).lower():
+        raise exc
+    return JSONResponse(
+        status_code=status.HTTP_404_NOT_FOUND,
+        content={"detail": "Not found: malformed identifier"}
+    )
+
+
+metrics.register_pool_gauges(engine)
+if read_engine is not engine:
+    metrics.register_pool_gauges(read_engine, prefix="db_replica_pool")
+
+# Pin a client's reads to the primary for a short window after it writes
+if settings.READ_REPLICA_URL:
+    app.add_middleware(ReadYourWritesMiddleware)
+
+# Replay retried redeem/assign requests that carry an Idempotency-Key
+if settings.IDEMPOTENCY_ENABLED:
+    app.add_middleware(IdempotencyMiddleware)
+
+# Answer guessed coupon codes without the database; throttle clients that keep missing
+if settings.CODE_GUARD_ENABLED:
+    app.add_middleware(CodeGuardMiddleware)
+
+# Per-request SQL query count / DB time (Server-Timing header, slow request log)
+if settings.QUERY_STATS_ENABLED:
+    app.add_middleware(QueryStatsMiddleware)
+
+# Compress large responses (br or gzip)
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MIN_BYTES,
+        gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+        brotli_quality=settings.COMPRESSION_BROTLI_QUALITY
+    )
+
+# Per-route latency histograms. Added last but CORS, so it is the outermost of
+# ours: guard rejections, idempotent replays and compression are all timed.
+app.add_middleware(metrics.MetricsMiddleware)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -27,6 +139,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[PRIMARY_UNTIL_HEADER],  # Read-your-writes token for clients without cookies
 )
 
 # Include routers
@@ -52,10 +165,17 @@ async def health():
     """Health check endpoint"""
     return {
         "status": "healthy",
-        "version": settings.APP_VERSION
+        "version": settings.APP_VERSION,
+        "db_pool": pool_status()
     }
 
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus metrics in text exposition format"""
+    return Response(content=metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -1,7 +1,11 @@
 from app.models.user import User
 from app.models.book import Book
+from app.models.coupon_code import CouponCode
 from app.models.coupon import Coupon
 from app.models.redemption_history import RedemptionHistory
+from app.models.redemption_rollup import RedemptionDailyRollup
 from app.models.user_pool import UserPool
+from app.models.lock_lease import LockLease
+from app.models.idempotency_key import IdempotencyKey
 
-__all__ = ["User", "Book", "Coupon", "RedemptionHistory", "UserPool"]
+__all__ = ["User", "Book", "Coupon", "CouponCode", "RedemptionHistory", "RedemptionDailyRollup", "UserPool", "LockLease", "IdempotencyKey"]
@@ -1,19 +1,28 @@
-from sqlalchemy import Column, String, DateTime, Boolean, Integer, ForeignKey, func
+from sqlalchemy import Column, String, DateTime, Boolean, Integer, ForeignKey, Index, func, text
 from sqlalchemy.orm import relationship
 from app.database import Base
+from app.models.types import UUIDString
 import uuid
 
 
 class Book(Base):
     """Coupon Book model"""
     __tablename__ = "books"
+    __table_args__ = (
+        # Books the expiration job still has to process
+        Index("ix_books_expiration_pending", "expiration_date", postgresql_where=text("coupons_expired_at IS NULL")),
+    )
+    # Server-generated columns come back in the INSERT's RETURNING, not a refresh
+    __mapper_args__ = {"eager_defaults": True}
     
-    book_id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    book_id = Column(UUIDString(), primary_key=True, default=lambda: str(uuid.uuid4()))
     name = Column(String, nullable=False)
     description = Column(String)
-    owner_id = Column(String, ForeignKey("users.user_id"), nullable=False, index=True)
+    owner_id = Column(UUIDString(), ForeignKey("users.user_id"), nullable=False, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)  # ETag validator
     expiration_date = Column(DateTime(timezone=True))
+    coupons_expired_at = Column(DateTime(timezone=True), nullable=True)  # Set once the expiration job finished this book
     
     # Configuration
     allow_multi_redemption = Column(Boolean, default=False, nullable=False)
@@ -1,25 +1,45 @@
-from sqlalchemy import Column, String, DateTime, Boolean, Integer, ForeignKey, Enum as SQLEnum, func
+from sqlalchemy import Column, String, DateTime, Boolean, Integer, ForeignKey, Index, DDL, Enum as SQLEnum, and_, case, event, func, select, text, type_coerce
 from sqlalchemy.orm import relationship
+from app.config import get_settings
 from app.database import Base
+from app.models.types import UUIDString
+from app.models.coupon_code import CouponCode
 from app.utils.enums import CouponState
 
 
 class Coupon(Base):
-    """Coupon model - code is the primary key"""
+    """
+    Coupon model - LIST partitioned by book_id
+    
+    Each book gets its own partition (see create_coupon_partition()), so
+    book-scoped queries only touch that book's rows and a retired book's
+    inventory can be detached or dropped without a DELETE. Codes are unique
+    globally through the coupon_codes lookup table.
+    """
     __tablename__ = "coupons"
+    __table_args__ = (
+        # Partial index used by the expired-lock sweeper
+        Index("ix_coupons_locked_until", "locked_until", postgresql_where=text("state = 'LOCKED'")),
+        {"postgresql_partition_by": "LIST (book_id)"},
+    )
+    # created_at/updated_at come back in the INSERT/UPDATE's RETURNING, not a refresh
+    __mapper_args__ = {"eager_defaults": True}
     
+    # The partition key has to be part of the primary key
     code = Column(String(50), primary_key=True)
-    book_id = Column(String, ForeignKey("books.book_id"), nullable=False, index=True)
-    assigned_user_id = Column(String, ForeignKey("users.user_id"), nullable=True, index=True)
+    book_id = Column(UUIDString(), ForeignKey("books.book_id"), primary_key=True, index=True)
+    assigned_user_id = Column(UUIDString(), ForeignKey("users.user_id"), nullable=True, index=True)
     state = Column(String(20), default='UNASSIGNED', nullable=False, index=True)
     
     # Multi-redemption support
     redemption_count = Column(Integer, default=0, nullable=False)
     max_redemptions = Column(Integer, default=1, nullable=False)
     
-    # Locking (tracked for visibility, actual lock is PostgreSQL advisory)
+    # Locking: a lease held by locked_by until locked_until, taken and
+    # released with conditional UPDATEs (no connection-bound state)
     is_locked = Column(Boolean, default=False, nullable=False)
     locked_until = Column(DateTime(timezone=True), nullable=True)
+    locked_by = Column(UUIDString(), nullable=True)  # user_id of the lease owner
     
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -28,7 +48,13 @@ class Coupon(Base):
     # Relationships
     book = relationship("Book", back_populates="coupons")
     assigned_user = relationship("User", back_populates="coupons")
-    redemption_history = relationship("RedemptionHistory", back_populates="coupon", cascade="all, delete-orphan", lazy="selectin")
+    redemption_history = relationship(
+        "RedemptionHistory",
+        primaryjoin="Coupon.code == foreign(RedemptionHistory.code)",
+        back_populates="coupon",
+        cascade="all, delete-orphan",
+        lazy="selectin"
+    )
     
     def __repr__(self):
         return f"<Coupon(code={self.code}, state={self.state})>"
@@ -42,3 +68,122 @@ class Coupon(Base):
     def remaining_redemptions(self) -> int:
         """Get number of remaining redemptions"""
         return max(0, self.max_redemptions - self.redemption_count)
+    
+    @classmethod
+    def lock_expired(cls):
+        """SQL form of RedemptionService.is_lock_expired, against the statement's now()"""
+        return and_(cls.state == CouponState.LOCKED.value, cls.locked_until <= func.now())
+
+    @classmethod
+    def response_columns(cls) -> tuple:
+        """
+        Columns of CouponResponse for Core selects
+
+        The computed properties are evaluated in SQL, so the rows validate
+        into CouponResponse without loading ORM objects or their history.
+        An expired lock is presented as released, as GET /coupons/{code}
+        does, before the sweeper persists it; lock_expired says so, for
+        ETags.
+        """
+        expired = cls.lock_expired()
+        released = case((cls.assigned_user_id.is_not(None), CouponState.ASSIGNED.value), else_=CouponState.UNASSIGNED.value)
+        presented = {"state", "is_locked", "locked_until", "locked_by"}
+        return (
+            *(column for column in cls.__table__.columns if column.name not in presented),
+            case((expired, released), else_=cls.state).label("state"),
+            case((expired, False), else_=cls.is_locked).label("is_locked"),
+            type_coerce(case((expired, None), else_=cls.locked_until), cls.locked_until.type).label("locked_until"),
+            type_coerce(case((expired, None), else_=cls.locked_by), cls.locked_by.type).label("locked_by"),
+            func.coalesce(expired, False).label("lock_expired"),
+            (cls.redemption_count < cls.max_redemptions).label("has_redemptions_remaining"),
+            func.greatest(cls.max_redemptions - cls.redemption_count, 0).label("remaining_redemptions"),
+        )
+
+    @classmethod
+    def matches_code(cls, code: str):
+        """
+        Filter on a single code that Postgres can prune to one partition
+        
+        The book_id comes from coupon_codes, so only the owning book's
+        partition is scanned instead of every partition's primary key.
+        """
+        book_id = select(CouponCode.book_id).where(CouponCode.code == code).scalar_subquery()
+        return and_(cls.code == code, cls.book_id == book_id)
+
+
+# Registers new codes globally and sends them to every API worker's code
+# filter (see CodeFilter) as "codes:<code>,<code>,...". '%', ',' and '*' are
+# percent-encoded so any code survives the bus's key list, and the codes are
+# split into payloads under its 8000-byte NOTIFY limit by running byte count.
+# NOTIFY is delivered on commit. Percent signs are doubled twice: once for
+# the channel below, once for DDL()'s own formatting.
+REGISTER_COUPON_CODES_FUNCTION = """
+    CREATE OR REPLACE FUNCTION register_coupon_codes() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        INSERT INTO coupon_codes (code, book_id) SELECT code, book_id FROM new_coupons;
+        PERFORM pg_notify('%s', 'codes:' || string_agg(code, ','))
+        FROM (
+            SELECT code, sum(octet_length(code) + 1) OVER (ORDER BY code) / 7500 AS chunk
+            FROM (
+                SELECT replace(replace(replace(code, '%%%%', '%%%%25'), ',', '%%%%2C'), '*', '%%%%2A') AS code
+                FROM new_coupons
+            ) AS escaped
+        ) AS sized
+        GROUP BY chunk;
+        RETURN NULL;
+    END $$
+""" % get_settings().INVALIDATION_CHANNEL.replace("'", "''")
+
+# Partition maintenance lives in the database so the API, migrations and
+# bulk loaders (COPY) all share it
+COUPON_PARTITION_DDL = [
+    """
+    CREATE OR REPLACE FUNCTION coupon_partition_name(p_book_id uuid) RETURNS text
+    LANGUAGE sql IMMUTABLE AS $$ SELECT 'coupons_' || md5(p_book_id::text) $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION create_coupon_partition(p_book_id uuid) RETURNS text
+    LANGUAGE plpgsql AS $$
+    DECLARE
+        partition text := coupon_partition_name(p_book_id);
+    BEGIN
+        IF to_regclass(partition) IS NOT NULL THEN
+            RETURN partition;
+        END IF;
+        EXECUTE 'CREATE TABLE ' || quote_ident(partition)
+             || ' (LIKE coupons INCLUDING DEFAULTS INCLUDING CONSTRAINTS)';
+        -- Rows that landed in the default partition before the book had its own
+        EXECUTE 'WITH moved AS (DELETE FROM coupons_default WHERE book_id = $1 RETURNING *) '
+             || 'INSERT INTO ' || quote_ident(partition) || ' SELECT * FROM moved'
+        USING p_book_id;
+        EXECUTE 'ALTER TABLE coupons ATTACH PARTITION ' || quote_ident(partition)
+             || ' FOR VALUES IN (' || quote_literal(p_book_id) || ')';
+        RETURN partition;
+    END $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION detach_coupon_partition(p_book_id uuid) RETURNS text
+    LANGUAGE plpgsql AS $$
+    DECLARE
+        partition text := coupon_partition_name(p_book_id);
+    BEGIN
+        IF to_regclass(partition) IS NULL THEN
+            RETURN NULL;
+        END IF;
+        EXECUTE 'ALTER TABLE coupons DETACH PARTITION ' || quote_ident(partition);
+        RETURN partition;
+    END $$
+    """,
+    REGISTER_COUPON_CODES_FUNCTION,
+    """
+    CREATE TRIGGER coupons_register_codes
+    AFTER INSERT ON coupons
+    REFERENCING NEW TABLE AS new_coupons
+    FOR EACH STATEMENT EXECUTE FUNCTION register_coupon_codes()
+    """,
+    "CREATE TABLE coupons_default PARTITION OF coupons DEFAULT",
+]
+
+for _statement in COUPON_PARTITION_DDL:
+    event.listen(Coupon.__table__, "after_create", DDL(_statement))
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, String, ForeignKey
+from app.database import Base
+from app.models.types import UUIDString
+
+
+class CouponCode(Base):
+    """
+    Global code -> book lookup
+    
+    coupons is partitioned by book_id, so its primary key can only enforce
+    uniqueness per book. Every inserted coupon registers its code here (via
+    a trigger on coupons), which keeps codes unique across all books and lets
+    single-code lookups find the partition to read.
+    """
+    __tablename__ = "coupon_codes"
+    
+    code = Column(String(50), primary_key=True)
+    book_id = Column(UUIDString(), ForeignKey("books.book_id"), nullable=False)
+    
+    def __repr__(self):
+        return f"<CouponCode(code={self.code}, book_id={self.book_id})>"
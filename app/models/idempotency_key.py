@@ -0,0 +1,25 @@
+from sqlalchemy import Column, String, DateTime, SmallInteger, LargeBinary, Index
+from app.database import Base
+
+
+class IdempotencyKey(Base):
+    """
+    Stored outcome of a request sent with an Idempotency-Key header
+
+    A row is reserved (status_code NULL) while the first request runs and
+    completed with its response; retries within the TTL replay it.
+    """
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        # Used by the purge job
+        Index("ix_idempotency_keys_expires_at", "expires_at"),
+    )
+    
+    key = Column(String(255), primary_key=True)
+    fingerprint = Column(LargeBinary, nullable=False)  # sha256 of method, path, credentials and body
+    status_code = Column(SmallInteger, nullable=True)  # NULL while the first request is in flight
+    response_body = Column(LargeBinary, nullable=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    
+    def __repr__(self):
+        return f"<IdempotencyKey(key={self.key}, status_code={self.status_code}, expires_at={self.expires_at})>"
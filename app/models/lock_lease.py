@@ -0,0 +1,15 @@
+from sqlalchemy import Column, String, DateTime
+from app.database import Base
+from app.models.types import UUIDString
+
+
+class LockLease(Base):
+    """Short-lived mutual exclusion lease, used by the "lease" lock backend"""
+    __tablename__ = "lock_leases"
+    
+    lock_key = Column(String, primary_key=True)
+    owner = Column(UUIDString(), nullable=False)  # Random token of the holder
+    expires_at = Column(DateTime(timezone=True), nullable=False)  # Others may take over after this
+    
+    def __repr__(self):
+        return f"<LockLease(lock_key={self.lock_key}, owner={self.owner}, expires_at={self.expires_at})>"
@@ -1,23 +1,77 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, JSON, func
+from sqlalchemy import Column, String, DateTime, ForeignKey, Index, JSON, DDL, event, func
 from sqlalchemy.orm import relationship
 from app.database import Base
-import uuid
+from app.models.types import UUIDString
+from app.utils.ids import uuid7
 
 
 class RedemptionHistory(Base):
-    """Redemption History model for audit trail"""
+    """
+    Redemption History model for audit trail - RANGE partitioned by month
+    
+    One partition per calendar month (UTC) of redeemed_at, created ahead of
+    time by HistoryRetentionService; a default partition catches anything
+    else. Partitions past the retention period are rolled up into
+    redemption_daily_rollups and dropped.
+    """
     __tablename__ = "redemption_history"
+    __table_args__ = (
+        # Newest-first history of one book
+        Index("ix_redemption_history_book_id_redeemed_at", "book_id", "redeemed_at"),
+        {"postgresql_partition_by": "RANGE (redeemed_at)"},
+    )
+    # redeemed_at comes back in the INSERT's RETURNING, not a refresh
+    __mapper_args__ = {"eager_defaults": True}
     
-    history_id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    code = Column(String(50), ForeignKey("coupons.code"), nullable=False, index=True)
-    user_id = Column(String, ForeignKey("users.user_id"), nullable=False, index=True)
-    book_id = Column(String, ForeignKey("books.book_id"), nullable=False, index=True)
-    redeemed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
+    # The partition key has to be part of the primary key. UUIDv7 ids are
+    # time ordered, so new rows append to the right edge of the primary key
+    history_id = Column(UUIDString(), primary_key=True, default=uuid7)
+    code = Column(String(50), ForeignKey("coupon_codes.code"), nullable=False, index=True)
+    user_id = Column(UUIDString(), ForeignKey("users.user_id"), nullable=False, index=True)
+    book_id = Column(UUIDString(), ForeignKey("books.book_id"), nullable=False)
+    redeemed_at = Column(DateTime(timezone=True), server_default=func.now(), primary_key=True, index=True)
     redemption_metadata = Column(JSON, nullable=True)  # Store order_id, discount_amount, etc.
     
     # Relationships
-    coupon = relationship("Coupon", back_populates="redemption_history")
+    coupon = relationship(
+        "Coupon",
+        primaryjoin="foreign(RedemptionHistory.code) == Coupon.code",
+        back_populates="redemption_history"
+    )
     user = relationship("User", back_populates="redemption_history")
     
     def __repr__(self):
         return f"<RedemptionHistory(history_id={self.history_id}, code={self.code})>"
+
+
+HISTORY_PARTITION_DDL = [
+    """
+    CREATE OR REPLACE FUNCTION create_redemption_history_partition(p_month timestamptz) RETURNS text
+    LANGUAGE plpgsql AS $$
+    DECLARE
+        month_start timestamptz := date_trunc('month', p_month AT TIME ZONE 'UTC') AT TIME ZONE 'UTC';
+        month_end timestamptz := month_start + interval '1 month';
+        partition text := 'redemption_history_p' || to_char(month_start AT TIME ZONE 'UTC', 'YYYY_MM');
+    BEGIN
+        IF to_regclass(partition) IS NOT NULL THEN
+            RETURN partition;
+        END IF;
+        EXECUTE 'CREATE TABLE ' || quote_ident(partition)
+             || ' (LIKE redemption_history INCLUDING DEFAULTS INCLUDING CONSTRAINTS)';
+        -- Rows that landed in the default partition because the month had none yet
+        EXECUTE 'WITH moved AS (DELETE FROM redemption_history_default '
+             || 'WHERE redeemed_at >= $1 AND redeemed_at < $2 RETURNING *) '
+             || 'INSERT INTO ' || quote_ident(partition) || ' SELECT * FROM moved'
+        USING month_start, month_end;
+        EXECUTE 'ALTER TABLE redemption_history ATTACH PARTITION ' || quote_ident(partition)
+             || ' FOR VALUES FROM (' || quote_literal(month_start) || ') TO (' || quote_literal(month_end) || ')';
+        RETURN partition;
+    END $$
+    """,
+    "CREATE TABLE redemption_history_default PARTITION OF redemption_history DEFAULT",
+    "SELECT create_redemption_history_partition(now())",
+    "SELECT create_redemption_history_partition(now() + interval '1 month')",
+]
+
+for _statement in HISTORY_PARTITION_DDL:
+    event.listen(RedemptionHistory.__table__, "after_create", DDL(_statement))
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Date, Integer, ForeignKey
+from app.database import Base
+from app.models.types import UUIDString
+
+
+class RedemptionDailyRollup(Base):
+    """Per-book, per-day redemption counts kept after history partitions are dropped"""
+    __tablename__ = "redemption_daily_rollups"
+    
+    book_id = Column(UUIDString(), ForeignKey("books.book_id"), primary_key=True)
+    day = Column(Date, primary_key=True)  # UTC
+    redemptions = Column(Integer, nullable=False)
+    unique_users = Column(Integer, nullable=False)
+    unique_codes = Column(Integer, nullable=False)
+    
+    def __repr__(self):
+        return f"<RedemptionDailyRollup(book_id={self.book_id}, day={self.day}, redemptions={self.redemptions})>"
@@ -0,0 +1,23 @@
+"""
+Column types shared by the models
+"""
+import uuid
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.types import TypeDecorator
+
+
+class UUIDString(TypeDecorator):
+    """
+    Native uuid column read and written as canonical strings
+
+    Same as UUID(as_uuid=False), plus what SQLAlchemy 2.0.25 is missing
+    for asyncpg: multi-row ORM INSERTs match RETURNING rows to their
+    parameters by primary key, and asyncpg returns uuid objects where the
+    parameters hold strings, so the keys never matched.
+    """
+    impl = UUID(as_uuid=False)
+    cache_ok = True
+
+    def _sentinel_value_resolver(self, dialect):
+        # Maps a bound parameter to the value the driver hands back
+        return uuid.UUID if dialect.driver == "asyncpg" else None
@@ -1,6 +1,7 @@
 from sqlalchemy import Column, String, DateTime, Boolean, Enum as SQLEnum, func
 from sqlalchemy.orm import relationship
 from app.database import Base
+from app.models.types import UUIDString
 import uuid
 import enum
 
@@ -14,8 +15,10 @@ class UserRole(str, enum.Enum):
 class User(Base):
     """User model with authentication support"""
     __tablename__ = "users"
+    # created_at/updated_at come back in the INSERT/UPDATE's RETURNING, not a refresh
+    __mapper_args__ = {"eager_defaults": True}
     
-    user_id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = Column(UUIDString(), primary_key=True, default=lambda: str(uuid.uuid4()))
     name = Column(String, nullable=False)
     email = Column(String, unique=True, nullable=False, index=True)
     hashed_password = Column(String, nullable=False)
@@ -5,6 +5,7 @@ from sqlalchemy import Column, String, Integer, Boolean, DateTime, Text, Foreign
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
+from app.models.types import UUIDString
 import uuid
 
 
@@ -12,8 +13,8 @@ import uuid
 pool_users = Table(
     'pool_users',
     Base.metadata,
-    Column('pool_id', String, ForeignKey('user_pools.pool_id', ondelete='CASCADE'), primary_key=True),
-    Column('user_id', String, ForeignKey('users.user_id', ondelete='CASCADE'), primary_key=True),
+    Column('pool_id', UUIDString(), ForeignKey('user_pools.pool_id', ondelete='CASCADE'), primary_key=True),
+    Column('user_id', UUIDString(), ForeignKey('users.user_id', ondelete='CASCADE'), primary_key=True),
     Column('added_at', DateTime, server_default=func.now())
 )
 
@@ -21,11 +22,13 @@ pool_users = Table(
 class UserPool(Base):
     """User pool for bulk coupon distribution"""
     __tablename__ = 'user_pools'
+    # created_at/updated_at come back in the INSERT/UPDATE's RETURNING, not a refresh
+    __mapper_args__ = {"eager_defaults": True}
     
-    pool_id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    pool_id = Column(UUIDString(), primary_key=True, default=lambda: str(uuid.uuid4()))
     name = Column(String, nullable=False)
     description = Column(Text, nullable=True)
-    created_by = Column(String, ForeignKey('users.user_id'), nullable=False)
+    created_by = Column(UUIDString(), ForeignKey('users.user_id'), nullable=False)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, onupdate=func.now())
@@ -4,7 +4,7 @@ Pydantic schemas for request validation and response serialization
 from __future__ import annotations
 from pydantic import BaseModel, Field, field_validator, EmailStr
 from typing import Optional
-from datetime import datetime
+from datetime import date, datetime
 from app.utils.enums import CouponState
 
 
@@ -107,6 +107,15 @@ class BookResponse(BaseModel):
         from_attributes = True
 
 
+class BookInventoryResponse(BaseModel):
+    """Response schema for a book's coupon counts per state"""
+    book_id: str
+    total: int
+    counts: dict[str, int] = Field(..., description="Map of coupon state -> count")
+    expiration_date: Optional[datetime]
+    coupons_expired_at: Optional[datetime] = Field(None, description="When the expiration job finished this book")
+
+
 class GenerateCodesRequest(BaseModel):
     """Request schema for generating coupon codes"""
     count: int = Field(..., ge=1, le=10000, description="Number of codes to generate")
@@ -149,6 +158,7 @@ class CouponResponse(BaseModel):
     max_redemptions: int
     is_locked: bool
     locked_until: Optional[datetime]
+    locked_by: Optional[str] = None
     created_at: datetime
     updated_at: datetime
     has_redemptions_remaining: bool
@@ -159,6 +169,35 @@ class CouponResponse(BaseModel):
         use_enum_values = True
 
 
+class CouponLookupRequest(BaseModel):
+    """Request schema for looking up many coupons at once"""
+    codes: list[str] = Field(..., min_length=1, max_length=5000, description="Codes to look up")
+
+
+class CouponLookupResult(BaseModel):
+    """Lookup result for a single code (found=False for unknown codes)"""
+    code: str
+    found: bool
+    book_id: Optional[str] = None
+    state: Optional[CouponState] = None
+    redemption_count: Optional[int] = None
+    max_redemptions: Optional[int] = None
+    remaining_redemptions: Optional[int] = None
+    is_locked: Optional[bool] = None
+    locked_until: Optional[datetime] = None
+    expiration_date: Optional[datetime] = None
+    
+    class Config:
+        use_enum_values = True
+
+
+class CouponLookupResponse(BaseModel):
+    """Response schema for batch coupon lookup"""
+    found_count: int
+    not_found_count: int
+    results: list[CouponLookupResult]
+
+
 class AssignCouponRandomRequest(BaseModel):
     """Request schema for random coupon assignment"""
     book_id: str
@@ -177,10 +216,20 @@ class LockCouponRequest(BaseModel):
     lock_duration_seconds: int = Field(300, ge=1, le=3600, description="Lock duration in seconds")
 
 
+class UnlockCouponRequest(BaseModel):
+    """Request schema for unlocking a coupon"""
+    user_id: str = Field(..., description="Lease owner")
+
+
 class RedeemCouponRequest(BaseModel):
     """Request schema for redeeming a coupon"""
     user_id: str
     metadata: Optional[dict] = Field(None, description="Order details, discount info, etc.")
+    wait_seconds: Optional[float] = Field(
+        None,
+        ge=0,
+        description="Wait up to this many seconds for concurrent redemptions of the code instead of failing with 409"
+    )
 
 
 class AssignmentResponse(BaseModel):
@@ -204,6 +253,14 @@ class RedemptionHistoryResponse(BaseModel):
         from_attributes = True
 
 
+class DailyRedemptionsResponse(BaseModel):
+    """Response schema for per-day redemption counts"""
+    day: date
+    redemptions: int
+    unique_users: int
+    unique_codes: int
+
+
 class RedemptionResponse(BaseModel):
     """Response schema for coupon redemption"""
     success: bool
@@ -215,6 +272,40 @@ class RedemptionResponse(BaseModel):
     metadata: Optional[dict]
 
 
+class BatchRedeemItem(BaseModel):
+    """A single code within a batch redemption request"""
+    code: str = Field(..., min_length=1, max_length=50)
+    metadata: Optional[dict] = Field(None, description="Per-code metadata (overrides the batch metadata)")
+
+
+class BatchRedeemRequest(BaseModel):
+    """Request schema for redeeming several coupons in one transaction"""
+    user_id: str
+    items: list[BatchRedeemItem] = Field(..., min_length=1, max_length=100, description="Codes to redeem")
+    atomic: bool = Field(True, description="All-or-nothing when true, per-item results when false")
+    metadata: Optional[dict] = Field(None, description="Order details shared by every item")
+
+
+class BatchRedeemItemResult(BaseModel):
+    """Outcome of a single code within a batch redemption"""
+    code: str
+    success: bool
+    status_code: int
+    detail: Optional[str] = None
+    redeemed_at: Optional[datetime] = None
+    redemption_count: Optional[int] = None
+    remaining_redemptions: Optional[int] = None
+
+
+class BatchRedeemResponse(BaseModel):
+    """Response schema for batch redemption"""
+    success: bool
+    atomic: bool
+    redeemed_count: int
+    failed_count: int
+    results: list[BatchRedeemItemResult]
+
+
 # ===== User Schemas (Legacy - for backward compatibility) =====
 class UserCreate(BaseModel):
     """Request schema for creating a user (legacy endpoint)"""
@@ -3,14 +3,17 @@ Assignment service for randomly assigning coupons to users
 """
 from typing import List, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_
-from app.models import Coupon, Book
+from sqlalchemy import select, update, func, and_
+from sqlalchemy.orm import noload
+from app.models import Coupon
 from app.utils.enums import CouponState
 from app.utils.exceptions import (
     NoCodesAvailableException,
     MaxAssignmentsReachedException,
     CouponNotFoundException
 )
+from app.utils.metrics import PhaseTimer, ASSIGNMENT_PHASE_DURATION
+from app.services.book_policy import book_policies
 
 
 class AssignmentService:
@@ -26,7 +29,9 @@ class AssignmentService:
         """
         Randomly assign available coupons to a user
         
-        Uses ORDER BY RANDOM() for true randomness with LIMIT for performance
+        Uses ORDER BY RANDOM() for true randomness with LIMIT for performance.
+        Picking and assigning is a single UPDATE ... RETURNING, so the
+        assigned coupons come back without a reload.
         
         Args:
             db: Database session
@@ -41,13 +46,12 @@ class AssignmentService:
             NoCodesAvailableException: If not enough unassigned coupons
             MaxAssignmentsReachedException: If user exceeded assignment limit
         """
+        timer = PhaseTimer(ASSIGNMENT_PHASE_DURATION, operation="assign_random")
+        
         # Check book exists and get configuration
-        result = await db.execute(
-            select(Book).where(Book.book_id == book_id)
-        )
-        book = result.scalar_one_or_none()
+        book = await book_policies.get(db, book_id)
         if not book:
-            raise CouponNotFoundException(f"Book {book_id} not found")
+            raise CouponNotFoundException(book_id, f"Book {book_id} not found")
         
         # Check max assignments per user limit
         if book.max_assignments_per_user is not None:
@@ -69,9 +73,12 @@ class AssignmentService:
                     f"Requested: {count}"
                 )
         
-        # Find available unassigned coupons (ORDER BY RANDOM() with LIMIT)
-        result = await db.execute(
-            select(Coupon)
+        timer.mark("check_limits")
+        
+        # Pick available unassigned coupons (ORDER BY RANDOM() with LIMIT)
+        # and assign them in the same statement
+        available = (
+            select(Coupon.code)
             .where(
                 and_(
                     Coupon.book_id == book_id,
@@ -82,26 +89,26 @@ class AssignmentService:
             .limit(count)
             .with_for_update(skip_locked=True)  # Skip locked rows for concurrency
         )
-        available_coupons = result.scalars().all()
+        result = await db.execute(
+            update(Coupon)
+            .where(Coupon.book_id == book_id, Coupon.code.in_(available))
+            .values(assigned_user_id=user_id, state=CouponState.ASSIGNED)
+            .returning(Coupon)
+            .options(noload(Coupon.redemption_history))
+            .execution_options(synchronize_session=False)
+        )
+        assigned_coupons = result.scalars().all()
+        timer.mark("assign")
         
-        if len(available_coupons) < count:
+        if len(assigned_coupons) < count:
+            await db.rollback()
             raise NoCodesAvailableException(
                 f"Not enough unassigned coupons. Requested: {count}, "
-                f"Available: {len(available_coupons)}"
+                f"Available: {len(assigned_coupons)}"
             )
         
-        # Assign coupons to user
-        assigned_coupons = []
-        for coupon in available_coupons:
-            coupon.assigned_user_id = user_id
-            coupon.state = CouponState.ASSIGNED
-            assigned_coupons.append(coupon)
-        
         await db.commit()
-        
-        # Refresh to get updated relationships
-        for coupon in assigned_coupons:
-            await db.refresh(coupon)
+        timer.mark("commit")
         
         return assigned_coupons
     
@@ -126,25 +133,29 @@ class AssignmentService:
             CouponNotFoundException: If coupon not found or not available
             MaxAssignmentsReachedException: If user exceeded assignment limit
         """
+        timer = PhaseTimer(ASSIGNMENT_PHASE_DURATION, operation="assign_specific")
+        
         # Get coupon with lock
         result = await db.execute(
             select(Coupon)
-            .where(Coupon.code == code)
+            .where(Coupon.matches_code(code))
+            .options(noload(Coupon.redemption_history))
             .with_for_update(skip_locked=False)
         )
         coupon = result.scalar_one_or_none()
+        timer.mark("load")
         
         if not coupon:
-            raise CouponNotFoundException(f"Coupon {code} not found")
+            raise CouponNotFoundException(code)
         
         if coupon.state != CouponState.UNASSIGNED:
             raise CouponNotFoundException(
+                code,
                 f"Coupon {code} is not available for assignment (state: {coupon.state})"
             )
         
         # Check max assignments per user limit
-        result = await db.execute(select(Book).where(Book.book_id == coupon.book_id))
-        book = result.scalar_one()
+        book = await book_policies.get(db, coupon.book_id)
         
         if book.max_assignments_per_user is not None:
             result = await db.execute(
@@ -164,11 +175,13 @@ class AssignmentService:
                     f"({book.max_assignments_per_user}) for this book"
                 )
         
-        # Assign coupon
+        timer.mark("check_limits")
+        
+        # Assign coupon (the UPDATE returns updated_at, so no reload)
         coupon.assigned_user_id = user_id
         coupon.state = CouponState.ASSIGNED
         
         await db.commit()
-        await db.refresh(coupon)
+        timer.mark("commit")
         
         return coupon
@@ -0,0 +1,56 @@
+"""
+Periodic background jobs run inside each API worker
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicTask:
+    """Runs an async job on a fixed interval, each run with its own session"""
+
+    def __init__(
+        self,
+        name: str,
+        job: Callable[[AsyncSession], Awaitable[Any]],
+        interval_seconds: float
+    ):
+        self.name = name
+        self.job = job
+        self.interval_seconds = interval_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the task loop on the running event loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name=self.name)
+
+    async def stop(self):
+        """Cancel the task loop and wait for it to finish"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def run_once(self) -> Any:
+        """Run the job a single time"""
+        async with AsyncSessionLocal() as db:
+            return await self.job(db)
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Background task %s failed", self.name)
+            await asyncio.sleep(self.interval_seconds)
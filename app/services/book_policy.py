@@ -0,0 +1,120 @@
+"""
+Book redemption/assignment rules, cached per worker
+"""
+from datetime import datetime
+from typing import Iterable, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import get_settings
+from app.models import Book
+from app.services.invalidation_bus import InvalidationBus, invalidation_bus
+
+BOOK_NAMESPACE = "book"
+
+
+class BookPolicy:
+    """The Book columns redemption and assignment check, detached from any session"""
+    __slots__ = (
+        "book_id",
+        "expiration_date",
+        "allow_multi_redemption",
+        "max_redemptions_per_user",
+        "max_assignments_per_user",
+        "is_active",
+    )
+
+    def __init__(
+        self,
+        book_id: str,
+        expiration_date: Optional[datetime],
+        allow_multi_redemption: bool,
+        max_redemptions_per_user: int,
+        max_assignments_per_user: Optional[int],
+        is_active: bool
+    ):
+        self.book_id = book_id
+        self.expiration_date = expiration_date
+        self.allow_multi_redemption = allow_multi_redemption
+        self.max_redemptions_per_user = max_redemptions_per_user
+        self.max_assignments_per_user = max_assignments_per_user
+        self.is_active = is_active
+
+
+class BookPolicyService:
+    """
+    Load BookPolicy by book id, from this worker's cache when possible
+
+    Every redeem and assign needs the book's rules, which almost never
+    change. They are cached per worker and evicted through the
+    invalidation bus: whoever changes one of these columns must call
+    publish_change() in the same transaction.
+    """
+
+    COLUMNS = (
+        Book.book_id,
+        Book.expiration_date,
+        Book.allow_multi_redemption,
+        Book.max_redemptions_per_user,
+        Book.max_assignments_per_user,
+        Book.is_active,
+    )
+
+    def __init__(self, bus: InvalidationBus = invalidation_bus):
+        settings = get_settings()
+        self.bus = bus
+        self.cache = bus.cache(
+            BOOK_NAMESPACE,
+            settings.BOOK_POLICY_CACHE_SIZE,
+            settings.BOOK_POLICY_CACHE_TTL_SECONDS
+        )
+
+    async def get(self, db: AsyncSession, book_id: str) -> Optional[BookPolicy]:
+        """
+        Policy of one book
+
+        Args:
+            db: Database session
+            book_id: Book ID
+
+        Returns:
+            BookPolicy, or None if the book does not exist
+        """
+        policies = await self.get_many(db, [book_id])
+        return policies.get(book_id)
+
+    async def get_many(self, db: AsyncSession, book_ids: Iterable[str]) -> dict[str, BookPolicy]:
+        """
+        Policies of several books in at most one query
+
+        Args:
+            db: Database session
+            book_ids: Book IDs
+
+        Returns:
+            Dict of book_id to BookPolicy; missing books are left out
+        """
+        policies = {}
+        missing = []
+        for book_id in set(book_ids):
+            policy = self.cache.get(book_id)
+            if policy is None:
+                missing.append(book_id)
+            else:
+                policies[book_id] = policy
+        if not missing:
+            return policies
+
+        token = self.cache.token()
+        result = await db.execute(select(*self.COLUMNS).where(Book.book_id.in_(missing)))
+        for row in result:
+            policy = BookPolicy(*row)
+            policies[policy.book_id] = policy
+            self.cache.set(policy.book_id, policy, token)
+        return policies
+
+    async def publish_change(self, db: AsyncSession, *book_ids: str):
+        """Evict these books' policies in every worker when db commits"""
+        await self.bus.publish(db, BOOK_NAMESPACE, *book_ids)
+
+
+book_policies = BookPolicyService()
@@ -0,0 +1,124 @@
+"""
+Per-worker Bloom filter of every coupon code, kept current over the invalidation bus
+"""
+import asyncio
+import logging
+from typing import Iterable, Optional
+from urllib.parse import unquote
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from app.config import get_settings
+from app.database import AsyncSessionLocal
+from app.models import CouponCode
+from app.services.invalidation_bus import InvalidationBus, invalidation_bus
+from app.utils.bloom import BloomFilter
+
+logger = logging.getLogger(__name__)
+
+# The coupons insert trigger publishes "codes:<code>,<code>,..." with every inserted
+# code, '%', ',' and '*' percent-encoded (see REGISTER_COUPON_CODES_FUNCTION)
+CODES_NAMESPACE = "codes"
+
+REBUILD_BATCH_SIZE = 5_000  # Codes hashed between awaits: keeps each event loop stall short
+REBUILD_RETRY_SECONDS = 5.0
+SYNC_TIMEOUT_SECONDS = 1.0  # Wait for in-flight notifications before trusting a miss
+MIN_CAPACITY = 100_000
+HEADROOM = 1.25  # Capacity over the current code count, for codes added until the next rebuild
+
+
+class CodeFilter:
+    """
+    Answers "can this code exist?" without touching the database
+
+    Codes are never deleted from coupon_codes, so the filter only grows.
+    It is built by scanning coupon_codes once the bus is listening. After
+    that, each "codes" notification carries the codes a statement
+    inserted, and they are added without a query.
+
+    A miss is only trusted while the filter is complete: the bus is
+    listening, no rebuild is running, and no notification was lost.
+    Otherwise might_exist() says True and the caller asks the database.
+    A code committed on another worker a moment ago can still read as
+    missing until its notification arrives; confirm_absent() waits for
+    those before answering.
+    """
+
+    def __init__(self, bus: InvalidationBus = invalidation_bus, session_factory: async_sessionmaker = AsyncSessionLocal):
+        self.settings = get_settings()
+        self.bus = bus
+        self.session_factory = session_factory
+        self.filter: Optional[BloomFilter] = None
+        self._rebuild_task: Optional[asyncio.Task] = None
+        self._pending: Optional[list[str]] = None  # Codes notified while a rebuild scans
+        bus.subscribe(CODES_NAMESPACE, self)
+
+    @property
+    def ready(self) -> bool:
+        return self.filter is not None and self.bus.listening
+
+    def might_exist(self, code: str) -> bool:
+        """False only if code is certainly not a coupon code"""
+        return not self.ready or code in self.filter
+
+    async def confirm_absent(self, code: str) -> bool:
+        """
+        True only if code is not a coupon code, even one committed just now
+
+        A miss is checked again once the bus has evicted every notification
+        committed before the call, so a code created through another worker
+        right before this request is found.
+        """
+        if self.might_exist(code):
+            return False
+        return await self.bus.sync(SYNC_TIMEOUT_SECONDS) and not self.might_exist(code)
+
+    def evict(self, codes: Iterable[str]):
+        """Bus callback: these (encoded) codes were inserted"""
+        if self._pending is not None:
+            self._pending.extend(unquote(code) for code in codes)
+        elif self.filter is not None:
+            self.filter.update(unquote(code) for code in codes)
+            if self.filter.count > self.filter.capacity:
+                logger.info("Code filter is over capacity (%d codes); rebuilding it larger", self.filter.count)
+                self.clear()
+
+    def clear(self):
+        """Bus callback: notifications may have been missed, start over"""
+        self.filter = None
+        self._pending = None
+        if self._rebuild_task is not None:
+            self._rebuild_task.cancel()
+            self._rebuild_task = None
+        if self.bus.listening:
+            self._rebuild_task = asyncio.create_task(self._rebuild(), name="code-filter-rebuild")
+
+    async def _rebuild(self):
+        """Scan coupon_codes into a new filter, retrying until it succeeds"""
+        while True:
+            self._pending = []
+            try:
+                bloom = await self._scan()
+                break
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Code filter rebuild failed, retrying in %ss: %s", REBUILD_RETRY_SECONDS, e)
+                await asyncio.sleep(REBUILD_RETRY_SECONDS)
+        # Codes notified during the scan; some are in its snapshot already,
+        # which is harmless. Nothing awaits from here to publishing the filter.
+        bloom.update(self._pending)
+        self._pending = None
+        self.filter = bloom
+        self._rebuild_task = None
+        logger.info("Code filter ready: %d codes in %d KiB", bloom.count, bloom.nbytes // 1024)
+
+    async def _scan(self) -> BloomFilter:
+        async with self.session_factory() as db:
+            count = await db.scalar(select(func.count()).select_from(CouponCode))
+            bloom = BloomFilter(max(MIN_CAPACITY, int(count * HEADROOM)), self.settings.CODE_FILTER_ERROR_RATE)
+            result = await db.stream(
+                select(CouponCode.code).execution_options(yield_per=REBUILD_BATCH_SIZE)
+            )
+            async for codes in result.scalars().partitions():
+                bloom.update(codes)
+        return bloom
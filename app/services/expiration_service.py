@@ -0,0 +1,128 @@
+"""
+Expiration service that expires the coupons of books past their expiration date
+"""
+import logging
+from collections import Counter
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, text, and_
+from app.models import Book
+from app.config import get_settings
+from app.services.book_policy import book_policies
+
+logger = logging.getLogger(__name__)
+
+
+class ExpirationService:
+    """Transitions coupons of expired books to EXPIRED in bounded chunks"""
+
+    def __init__(self):
+        self.settings = get_settings()
+
+    async def expire_due_books(self, db: AsyncSession) -> dict[str, dict[str, int]]:
+        """
+        Expire the coupons of every book whose expiration_date has passed
+
+        Idempotent and restartable: work is selected by predicate (book past
+        its expiration date, coupon not yet in a terminal state), every chunk
+        commits on its own, and a book is only marked done
+        (coupons_expired_at) once no expirable coupon is left.
+
+        Args:
+            db: Database session
+
+        Returns:
+            Map of book_id -> {previous_state: coupons expired} for this run
+        """
+        result = await db.execute(
+            select(Book.book_id)
+            .where(
+                and_(
+                    Book.expiration_date <= text("now()"),
+                    Book.coupons_expired_at.is_(None)
+                )
+            )
+            .order_by(Book.expiration_date)
+        )
+        book_ids = result.scalars().all()
+        await db.commit()
+
+        summary = {}
+        for book_id in book_ids:
+            counts = await self.expire_book(db, book_id)
+            if counts:
+                summary[book_id] = counts
+                logger.info("Expired coupons of book %s: %s", book_id, counts)
+
+        return summary
+
+    async def expire_book(self, db: AsyncSession, book_id: str) -> dict[str, int]:
+        """
+        Expire one book's UNASSIGNED/ASSIGNED/LOCKED coupons in chunks
+
+        REDEEMED coupons keep their state: the redemption already happened
+        and REDEEMED is terminal in the state machine.
+
+        Args:
+            db: Database session
+            book_id: Book to process
+
+        Returns:
+            Number of coupons expired per previous state
+        """
+        chunk_size = self.settings.EXPIRATION_CHUNK_SIZE
+        counts = Counter()
+
+        while True:
+            result = await db.execute(
+                text("""
+                    WITH doomed AS (
+                        SELECT code, state FROM coupons
+                        WHERE book_id = :book_id
+                          AND state IN ('UNASSIGNED', 'ASSIGNED', 'LOCKED')
+                        LIMIT :chunk_size
+                        FOR UPDATE SKIP LOCKED
+                    ), expired AS (
+                        UPDATE coupons c
+                        SET state = 'EXPIRED',
+                            is_locked = false,
+                            locked_until = NULL,
+                            locked_by = NULL,
+                            updated_at = now()
+                        FROM doomed d
+                        WHERE c.book_id = :book_id AND c.code = d.code
+                        RETURNING d.state AS previous_state
+                    )
+                    SELECT previous_state, count(*) AS expired FROM expired
+                    GROUP BY previous_state
+                """),
+                {"book_id": book_id, "chunk_size": chunk_size}
+            )
+            chunk = {row.previous_state: row.expired for row in result}
+            await db.commit()
+
+            counts.update(chunk)
+            if sum(chunk.values()) < chunk_size:
+                break
+
+        # Rows skipped because they were locked are picked up by the next run.
+        # updated_at is the book's ETag validator; the NOTIFY evicts the
+        # book from every worker's policy cache when this commits.
+        result = await db.execute(
+            text("""
+                UPDATE books SET coupons_expired_at = now(), updated_at = now()
+                WHERE book_id = :book_id
+                  AND coupons_expired_at IS NULL
+                  AND NOT EXISTS (
+                      SELECT 1 FROM coupons
+                      WHERE book_id = :book_id
+                        AND state IN ('UNASSIGNED', 'ASSIGNED', 'LOCKED')
+                  )
+                RETURNING book_id
+            """),
+            {"book_id": book_id}
+        )
+        if result.first() is not None:
+            await book_policies.publish_change(db, book_id)
+        await db.commit()
+
+        return dict(counts)
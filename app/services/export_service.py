@@ -0,0 +1,172 @@
+"""
+Streaming CSV/NDJSON exports of a book's coupons, assignments and redemption history
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime
+from typing import Any, AsyncIterator, Iterable, Sequence
+from sqlalchemy import Row, Select, select
+from sqlalchemy.ext.asyncio import AsyncResult, async_sessionmaker
+from app.config import get_settings
+from app.models import Coupon, RedemptionHistory, User
+from app.utils.enums import ExportDataset, ExportFormat
+
+# gzip container (header + trailer) around the deflate stream
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=_json_default)
+    return value
+
+
+class CsvEncoder:
+    """RFC 4180 CSV with a header row; JSON columns are embedded as JSON text"""
+    media_type = "text/csv"
+
+    def header(self, columns: Sequence[str]) -> bytes:
+        return self._encode([columns])
+
+    def rows(self, rows: Iterable[Row]) -> bytes:
+        return self._encode([_csv_value(value) for value in row] for row in rows)
+
+    def _encode(self, rows: Iterable[Iterable[Any]]) -> bytes:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue().encode()
+
+
+class NdjsonEncoder:
+    """One JSON object per line"""
+    media_type = "application/x-ndjson"
+
+    def header(self, columns: Sequence[str]) -> bytes:
+        return b""
+
+    def rows(self, rows: Iterable[Row]) -> bytes:
+        return "".join(
+            json.dumps(row._asdict(), default=_json_default, separators=(",", ":")) + "\n"
+            for row in rows
+        ).encode()
+
+
+ENCODERS = {
+    ExportFormat.CSV: CsvEncoder(),
+    ExportFormat.NDJSON: NdjsonEncoder(),
+}
+
+
+def _coupons_query(book_id: str) -> Select:
+    return select(*Coupon.__table__.columns).where(Coupon.book_id == book_id).order_by(Coupon.code)
+
+
+def _assignments_query(book_id: str) -> Select:
+    return (
+        select(
+            Coupon.code,
+            Coupon.assigned_user_id.label("user_id"),
+            User.email,
+            User.name,
+            Coupon.state,
+            Coupon.redemption_count,
+            Coupon.max_redemptions,
+            Coupon.updated_at,
+        )
+        .join(User, User.user_id == Coupon.assigned_user_id)
+        .where(Coupon.book_id == book_id)
+        .order_by(Coupon.code)
+    )
+
+
+def _history_query(book_id: str) -> Select:
+    return (
+        select(*RedemptionHistory.__table__.columns)
+        .where(RedemptionHistory.book_id == book_id)
+        .order_by(RedemptionHistory.redeemed_at, RedemptionHistory.history_id)
+    )
+
+
+QUERIES = {
+    ExportDataset.COUPONS: _coupons_query,
+    ExportDataset.ASSIGNMENTS: _assignments_query,
+    ExportDataset.HISTORY: _history_query,
+}
+
+
+class ExportService:
+    """
+    Streams a book dataset from a server-side cursor
+
+    Rows are fetched EXPORT_BATCH_SIZE at a time and each batch is encoded
+    (and compressed) before the next one is fetched, so memory stays flat
+    whatever the size of the book. The generator is only advanced when the
+    ASGI server has sent the previous chunk, so a slow client slows the
+    cursor down instead of buffering the export in the worker.
+
+    The export runs in its own session: dependency sessions are closed
+    before a streaming body is sent. It holds one pooled connection until
+    the download finishes.
+    """
+
+    def __init__(self, session_factory: async_sessionmaker):
+        self.session_factory = session_factory
+        self.settings = get_settings()
+
+    async def stream(
+        self,
+        book_id: str,
+        dataset: ExportDataset,
+        export_format: ExportFormat,
+        compress: bool = False
+    ) -> AsyncIterator[bytes]:
+        """
+        Encode a dataset of a book chunk by chunk
+
+        Args:
+            book_id: Book ID
+            dataset: Which rows to export
+            export_format: CSV or NDJSON
+            compress: Emit a gzip stream instead of plain text
+
+        Yields:
+            Response body chunks
+        """
+        encoder = ENCODERS[export_format]
+        compressor = zlib.compressobj(wbits=GZIP_WBITS) if compress else None
+        query = QUERIES[dataset](book_id).execution_options(yield_per=self.settings.EXPORT_BATCH_SIZE)
+
+        async with self.session_factory() as db:
+            # Cursors need a transaction (even with DB_READ_ISOLATION_LEVEL=AUTOCOMMIT),
+            # and REPEATABLE READ keeps the whole export on one snapshot
+            await db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+            result = await db.stream(query)
+
+            async for chunk in self._chunks(encoder, result):
+                if compressor is not None:
+                    chunk = compressor.compress(chunk)
+                if chunk:
+                    yield chunk
+
+        if compressor is not None:
+            yield compressor.flush()
+
+    async def _chunks(self, encoder, result: AsyncResult) -> AsyncIterator[bytes]:
+        """Header, then one encoded chunk per fetched batch"""
+        yield encoder.header(list(result.keys()))
+        async for rows in result.partitions():
+            yield encoder.rows(rows)
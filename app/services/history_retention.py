@@ -0,0 +1,160 @@
+"""
+Monthly partition maintenance and retention for redemption_history
+"""
+import logging
+import re
+from datetime import date, datetime, timezone
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import text
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+_PARTITION_NAME = re.compile(r"^redemption_history_p(\d{4})_(\d{2})$")
+
+
+def _add_months(month: date, months: int) -> date:
+    """First day of the month `months` after `month`"""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+class HistoryRetentionService:
+    """Creates upcoming history partitions, rolls up and drops expired ones"""
+
+    def __init__(self):
+        self.settings = get_settings()
+
+    async def maintain(self, db: AsyncSession) -> dict[str, list[str]]:
+        """
+        Run one maintenance pass
+
+        Creates partitions for the current month and HISTORY_PARTITIONS_AHEAD
+        months ahead, then retires every monthly partition older than
+        HISTORY_RETENTION_MONTHS. Idempotent; safe to run on every worker.
+
+        Args:
+            db: Database session
+
+        Returns:
+            {"created": [...], "retired": [...], "kept": [...]} partition names
+        """
+        this_month = datetime.now(timezone.utc).date().replace(day=1)
+
+        created = []
+        await self._serialize(db)
+        for ahead in range(self.settings.HISTORY_PARTITIONS_AHEAD + 1):
+            month = _add_months(this_month, ahead)
+            existed = await self._partition_exists(db, month)
+            result = await db.execute(
+                text("SELECT create_redemption_history_partition(CAST(:month AS timestamptz))"),
+                {"month": datetime(month.year, month.month, 1, tzinfo=timezone.utc)}
+            )
+            if not existed:
+                created.append(result.scalar())
+        await db.commit()
+
+        cutoff = _add_months(this_month, -self.settings.HISTORY_RETENTION_MONTHS)
+        retired, kept = [], []
+        for partition, month in await self._monthly_partitions(db):
+            if month >= cutoff:
+                continue
+            outcome = await self.retire_partition(db, partition)
+            if outcome:
+                retired.append(partition)
+            elif outcome is not None:
+                kept.append(partition)
+
+        if created or retired:
+            logger.info("History partitions created: %s, retired: %s", created, retired)
+        if kept:
+            logger.warning("History partitions past retention kept for unexpired books: %s", kept)
+
+        return {"created": created, "retired": retired, "kept": kept}
+
+    async def retire_partition(self, db: AsyncSession, partition: str) -> Optional[bool]:
+        """
+        Roll a history partition up into redemption_daily_rollups and drop it
+
+        A partition is only dropped once every book redeemed in it has
+        expired: per-user redemption limits are enforced by counting history
+        rows, so dropping rows of a live book would reset those limits.
+        Rollup, detach and drop commit together.
+
+        Args:
+            db: Database session
+            partition: Partition table name
+
+        Returns:
+            True if the partition was dropped, False if it was kept, None if
+            another worker already dropped it
+        """
+        await self._serialize(db)
+        result = await db.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": partition})
+        if not result.scalar():
+            await db.rollback()
+            return None
+
+        # Name comes from the catalog and matched _PARTITION_NAME
+        result = await db.execute(text(f"""
+            SELECT EXISTS (
+                SELECT 1 FROM "{partition}" h
+                JOIN books b ON b.book_id = h.book_id
+                WHERE b.expiration_date IS NULL OR b.expiration_date > now()
+            )
+        """))
+        if result.scalar():
+            await db.rollback()
+            return False
+
+        await db.execute(text(f"""
+            INSERT INTO redemption_daily_rollups (book_id, day, redemptions, unique_users, unique_codes)
+            SELECT book_id,
+                   (redeemed_at AT TIME ZONE 'UTC')::date,
+                   count(*),
+                   count(DISTINCT user_id),
+                   count(DISTINCT code)
+            FROM "{partition}"
+            GROUP BY 1, 2
+            ON CONFLICT (book_id, day) DO UPDATE SET
+                redemptions = EXCLUDED.redemptions,
+                unique_users = EXCLUDED.unique_users,
+                unique_codes = EXCLUDED.unique_codes
+        """))
+        await db.execute(text(f'ALTER TABLE redemption_history DETACH PARTITION "{partition}"'))
+        await db.execute(text(f'DROP TABLE "{partition}"'))
+        await db.commit()
+        return True
+
+    async def _serialize(self, db: AsyncSession):
+        """
+        Serialize maintenance across workers for the current transaction
+
+        Concurrent CREATE/ATTACH of the same partition would fail. The lock
+        is transaction-scoped, so it cannot leak on a pooled connection.
+        """
+        await db.execute(text("SELECT pg_advisory_xact_lock(hashtext('redemption_history_maintenance'))"))
+
+    async def _partition_exists(self, db: AsyncSession, month: date) -> bool:
+        result = await db.execute(
+            text("SELECT to_regclass(:name) IS NOT NULL"),
+            {"name": f"redemption_history_p{month.year:04d}_{month.month:02d}"}
+        )
+        return bool(result.scalar())
+
+    async def _monthly_partitions(self, db: AsyncSession) -> list[tuple[str, date]]:
+        """Attached monthly partitions as (name, first day of month), oldest first"""
+        result = await db.execute(text("""
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'redemption_history'::regclass
+        """))
+        partitions = []
+        for name in result.scalars():
+            match = _PARTITION_NAME.match(name)
+            if match:
+                partitions.append((name, date(int(match.group(1)), int(match.group(2)), 1)))
+        await db.commit()
+        return sorted(partitions, key=lambda p: p[1])
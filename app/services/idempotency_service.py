@@ -0,0 +1,208 @@
+"""
+Idempotency-Key storage: request outcomes in idempotency_keys behind an in-process LRU
+"""
+import hashlib
+import logging
+import time
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy import text
+from app.config import get_settings
+from app.database import AsyncSessionLocal
+from app.utils.lru import LRUCache
+from app.utils.metrics import IDEMPOTENT_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+# Outcomes of IdempotencyService.begin()
+RESERVED = "reserved"        # First request with this key: run it
+REPLAY = "replay"            # Completed earlier with the same request: return the stored response
+MISMATCH = "mismatch"        # Key already used for a different request
+IN_PROGRESS = "in_progress"  # First request still running
+
+# Outcomes a retry may change; not stored, so the retry runs again
+RETRYABLE_STATUS_CODES = {408, 409, 423, 425, 429}
+
+PURGE_BATCH_SIZE = 5000
+
+
+class StoredResponse:
+    """Completed outcome of an idempotent request"""
+    __slots__ = ("fingerprint", "status_code", "body", "expires_at")
+
+    def __init__(self, fingerprint: bytes, status_code: int, body: bytes, expires_at: float):
+        self.fingerprint = fingerprint
+        self.status_code = status_code
+        self.body = body
+        self.expires_at = expires_at  # Unix time
+
+
+class IdempotencyService:
+    """
+    Reserve, complete and replay Idempotency-Key requests
+
+    The table is the source of truth across workers. Completed responses
+    never change until they expire, so each worker also keeps the most
+    recently used ones in an LRU: a hot retry is answered without a query.
+    Every database call runs in its own short transaction on the primary.
+    """
+
+    def __init__(self, session_factory: async_sessionmaker = AsyncSessionLocal):
+        self.settings = get_settings()
+        self.session_factory = session_factory
+        self.cache: LRUCache[StoredResponse] = LRUCache(self.settings.IDEMPOTENCY_CACHE_SIZE)
+
+    @staticmethod
+    def fingerprint(method: str, path: str, query: bytes, credentials: str, body: bytes) -> bytes:
+        """sha256 identifying a request; a key may only be reused with the same one"""
+        digest = hashlib.sha256()
+        for part in (method.encode(), path.encode(), query, credentials.encode(), body):
+            digest.update(len(part).to_bytes(8, "big"))
+            digest.update(part)
+        return digest.digest()
+
+    @staticmethod
+    def should_store(status_code: int) -> bool:
+        """Final outcomes are stored; server errors and retryable conflicts are not"""
+        return status_code < 500 and status_code not in RETRYABLE_STATUS_CODES
+
+    async def begin(self, key: str, fingerprint: bytes) -> tuple[str, Optional[StoredResponse]]:
+        """
+        Look a key up and reserve it if it is new (or expired)
+
+        Args:
+            key: Idempotency-Key header value
+            fingerprint: See fingerprint()
+
+        Returns:
+            (outcome, stored response for REPLAY else None)
+        """
+        stored = self.cache.get(key)
+        if stored is not None and stored.expires_at <= time.time():
+            self.cache.discard(key)
+            stored = None
+        if stored is None:
+            async with self.session_factory() as db:
+                stored = await self._reserve(db, key, fingerprint)
+            if stored is None:
+                IDEMPOTENT_REQUESTS.inc(result=RESERVED)
+                return RESERVED, None
+            if stored.status_code is not None:
+                self.cache.set(key, stored)
+
+        if stored.fingerprint != fingerprint:
+            outcome = MISMATCH
+        elif stored.status_code is None:
+            outcome = IN_PROGRESS
+        else:
+            outcome = REPLAY
+        IDEMPOTENT_REQUESTS.inc(result=outcome)
+        return outcome, stored if outcome == REPLAY else None
+
+    async def complete(self, key: str, fingerprint: bytes, status_code: int, body: bytes):
+        """Store the response of a reserved key for IDEMPOTENCY_TTL_SECONDS"""
+        ttl = self.settings.IDEMPOTENCY_TTL_SECONDS
+        try:
+            async with self.session_factory() as db:
+                await db.execute(
+                    text("""
+                        UPDATE idempotency_keys
+                        SET status_code = :status_code,
+                            response_body = :body,
+                            expires_at = now() + CAST(:ttl AS integer) * interval '1 second'
+                        WHERE key = :key AND fingerprint = :fingerprint AND status_code IS NULL
+                    """),
+                    {"key": key, "fingerprint": fingerprint, "status_code": status_code, "body": body, "ttl": ttl}
+                )
+                await db.commit()
+        except Exception as e:
+            # The response is still sent; the reservation lapses after IDEMPOTENCY_LOCK_SECONDS
+            logger.warning("Could not store the response for Idempotency-Key %s: %s", key, e)
+            return
+        self.cache.set(key, StoredResponse(fingerprint, status_code, body, time.time() + ttl))
+
+    async def release(self, key: str, fingerprint: bytes):
+        """Drop a reservation whose outcome is not stored, so a retry runs again"""
+        try:
+            async with self.session_factory() as db:
+                await db.execute(
+                    text(
+                        "DELETE FROM idempotency_keys "
+                        "WHERE key = :key AND fingerprint = :fingerprint AND status_code IS NULL"
+                    ),
+                    {"key": key, "fingerprint": fingerprint}
+                )
+                await db.commit()
+        except Exception as e:
+            logger.warning("Could not release Idempotency-Key %s: %s", key, e)
+
+    async def purge_expired(self, db: AsyncSession) -> int:
+        """
+        Delete expired keys in batches
+
+        Args:
+            db: Database session
+
+        Returns:
+            Number of keys deleted
+        """
+        purged = 0
+        while True:
+            result = await db.execute(
+                text("""
+                    DELETE FROM idempotency_keys
+                    WHERE key IN (
+                        SELECT key FROM idempotency_keys
+                        WHERE expires_at < now()
+                        LIMIT :batch_size
+                    )
+                    AND expires_at < now()  -- re-checked if a request took the key over meanwhile
+                """),
+                {"batch_size": PURGE_BATCH_SIZE}
+            )
+            await db.commit()
+            purged += result.rowcount
+            if result.rowcount < PURGE_BATCH_SIZE:
+                break
+        if purged:
+            logger.info("Purged %d expired idempotency keys", purged)
+        return purged
+
+    async def _reserve(self, db: AsyncSession, key: str, fingerprint: bytes) -> Optional[StoredResponse]:
+        """
+        Insert (or take over an expired) reservation in one round trip
+
+        Returns:
+            None if this request now owns the key, else the existing row
+            (status_code None while it is in flight)
+        """
+        result = await db.execute(
+            text("""
+                WITH reserved AS (
+                    INSERT INTO idempotency_keys (key, fingerprint, expires_at)
+                    VALUES (:key, :fingerprint, now() + CAST(:lock AS integer) * interval '1 second')
+                    ON CONFLICT (key) DO UPDATE
+                    SET fingerprint = EXCLUDED.fingerprint,
+                        status_code = NULL,
+                        response_body = NULL,
+                        expires_at = EXCLUDED.expires_at
+                    WHERE idempotency_keys.expires_at <= now()
+                    RETURNING key
+                )
+                SELECT fingerprint, status_code, response_body,
+                       CAST(extract(epoch FROM expires_at) AS float8) AS expires_at
+                FROM idempotency_keys
+                WHERE key = :key AND expires_at > now() AND NOT EXISTS (SELECT 1 FROM reserved)
+                UNION ALL
+                SELECT NULL, NULL, NULL, NULL FROM reserved
+            """),
+            {"key": key, "fingerprint": fingerprint, "lock": self.settings.IDEMPOTENCY_LOCK_SECONDS}
+        )
+        row = result.one_or_none()
+        await db.commit()
+        if row is None:
+            # Someone else reserved the key after this statement's snapshot was taken
+            return StoredResponse(fingerprint, None, None, 0.0)
+        if row.fingerprint is None:
+            return None
+        return StoredResponse(bytes(row.fingerprint), row.status_code, row.response_body, row.expires_at)
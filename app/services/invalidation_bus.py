@@ -0,0 +1,311 @@
+"""
+Cross-worker cache invalidation over Postgres LISTEN/NOTIFY
+"""
+import asyncio
+import logging
+import random
+import time
+from collections import defaultdict
+from typing import Generic, Hashable, Iterable, Optional, TypeVar
+import asyncpg
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import get_settings
+from app.utils.lru import LRUCache
+from app.utils.metrics import CACHE_INVALIDATIONS, CACHE_LOOKUPS, INVALIDATION_BUS_RECONNECTS
+
+logger = logging.getLogger(__name__)
+
+V = TypeVar("V")
+
+# Payloads are "<namespace>:<key>,<key>,..."; Postgres caps them just under 8000 bytes
+MAX_PAYLOAD_BYTES = 7900
+ALL_KEYS = "*"  # Key that empties the whole namespace
+
+RECONNECT_MIN_SECONDS = 0.5
+RECONNECT_MAX_SECONDS = 30.0
+
+
+class InvalidatingCache(Generic[V]):
+    """
+    Per-worker LRU whose entries other workers' writes evict
+
+    Entries are only served while the bus is listening: a worker that lost
+    its listener connection cannot know what changed, so it reads through.
+    Fill it like this:
+
+        token = cache.token()
+        value = ...  # load from the database
+        cache.set(key, value, token)
+
+    set() drops the value if any eviction arrived since token(), so a load
+    that raced with a write cannot cache the old row. This relies on the
+    load seeing rows committed before it started (READ COMMITTED, the
+    default). Entries also expire after ttl_seconds, which bounds how long
+    a write made outside the app (plain SQL, no NOTIFY) stays invisible.
+    """
+
+    def __init__(self, bus: "InvalidationBus", namespace: str, maxsize: int, ttl_seconds: float):
+        self.bus = bus
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self._entries: LRUCache[tuple[float, V]] = LRUCache(maxsize)
+        self._epoch = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[V]:
+        """Cached value for key, or None"""
+        if not self.bus.listening:
+            CACHE_LOOKUPS.inc(namespace=self.namespace, result="bypass")
+            return None
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] <= time.monotonic():
+            self._entries.discard(key)
+            entry = None
+        CACHE_LOOKUPS.inc(namespace=self.namespace, result="miss" if entry is None else "hit")
+        return None if entry is None else entry[1]
+
+    def token(self) -> int:
+        """Take before loading a value; pass to set()"""
+        return self._epoch
+
+    def set(self, key: Hashable, value: V, token: int):
+        """Cache a loaded value unless an eviction arrived since token was taken"""
+        if token != self._epoch or not self.bus.listening:
+            return
+        self._entries.set(key, (time.monotonic() + self.ttl_seconds, value))
+
+    def evict(self, keys: Iterable[Hashable]):
+        """Drop keys (and void fills in progress)"""
+        self._epoch += 1
+        for key in keys:
+            self._entries.discard(key)
+
+    def clear(self):
+        """Drop everything (and void fills in progress)"""
+        self._epoch += 1
+        self._entries.clear()
+
+
+class InvalidationBus:
+    """
+    Evicts cached keys in every worker when any worker writes them
+
+    A writer calls publish() inside its transaction. That queues a NOTIFY
+    on INVALIDATION_CHANNEL, which Postgres delivers when the transaction
+    commits (and drops if it rolls back). Each worker holds one dedicated
+    asyncpg connection that LISTENs on the channel. Notifications that
+    arrive within INVALIDATION_BATCH_MS are merged and evicted in one pass.
+
+    Postgres does not replay notifications sent while a listener was
+    disconnected. So when the connection is lost, caches stop serving and
+    are emptied. The listener reconnects with jittered backoff, LISTENs
+    again, then empties the caches once more before serving from them.
+    A silently dropped connection is caught by a SELECT 1 every
+    INVALIDATION_HEALTHCHECK_SECONDS.
+    """
+
+    def __init__(self, dsn: Optional[str] = None, channel: Optional[str] = None):
+        self.settings = get_settings()
+        url = dsn or self.settings.INVALIDATION_LISTEN_URL or self.settings.DATABASE_URL
+        # LISTEN needs a session of its own: with PgBouncer in transaction
+        # mode, point INVALIDATION_LISTEN_URL at Postgres directly
+        self.dsn = url.replace("postgresql+asyncpg://", "postgresql://")
+        self.channel = channel or self.settings.INVALIDATION_CHANNEL
+        self.subscribers: dict[str, list] = defaultdict(list)
+        self.listening = False
+        self._conn: Optional[asyncpg.Connection] = None
+        self._pending: list[str] = []
+        self._wakeup = asyncio.Event()
+        self._barrier: Optional[asyncio.Future] = None  # sync() callers waiting for the next round trip
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self, namespace: str, subscriber):
+        """
+        Deliver a namespace's notifications to subscriber
+
+        The subscriber implements evict(keys), called with the keys
+        published since the last batch, and clear(), called when keys may
+        have changed unseen (ALL_KEYS was published, or the listener
+        connection was lost or re-established).
+        """
+        self.subscribers[namespace].append(subscriber)
+
+    def cache(self, namespace: str, maxsize: int, ttl_seconds: float) -> InvalidatingCache:
+        """Create a cache evicted by publish(namespace, ...)"""
+        cache = InvalidatingCache(self, namespace, maxsize, ttl_seconds)
+        self.subscribe(namespace, cache)
+        return cache
+
+    async def publish(self, db: AsyncSession, namespace: str, *keys: str):
+        """
+        Evict keys in every worker once db's transaction commits
+
+        Call it before the commit. Keys must not contain ','; pass ALL_KEYS
+        to empty the namespace.
+
+        Args:
+            db: Session of the writing transaction
+            namespace: Cache namespace, e.g. "book"
+            keys: Keys to evict
+        """
+        for payload in self._payloads(namespace, keys):
+            await db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": self.channel, "payload": payload})
+        # This worker's own copy goes now; the notification evicts it again after commit
+        self._evict(namespace, set(keys))
+
+    async def sync(self, timeout: float) -> bool:
+        """
+        Wait until every notification committed before the call is evicted
+
+        Postgres sends a listener the notifications committed before a
+        query ahead of that query's result, so one SELECT 1 on the listener
+        connection is enough. Callers that arrive while it is queued share
+        it; those that arrive once it is sent wait for the next one.
+
+        Args:
+            timeout: Seconds to wait for the round trip
+
+        Returns:
+            False if the bus is not listening or did not answer in time
+        """
+        if not self.listening:
+            return False
+        if self._barrier is None:
+            self._barrier = asyncio.get_running_loop().create_future()
+            self._wakeup.set()
+        try:
+            return await asyncio.wait_for(asyncio.shield(self._barrier), timeout)
+        except asyncio.TimeoutError:
+            return False
+
+    def start(self):
+        """Start the listener on the running event loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="invalidation-bus")
+
+    async def stop(self):
+        """Stop listening and close the connection"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        backoff = RECONNECT_MIN_SECONDS
+        while True:
+            try:
+                await self._connect()
+                backoff = RECONNECT_MIN_SECONDS
+                await self._dispatch()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Invalidation listener on %r disconnected: %s", self.channel, e)
+            finally:
+                self._disconnect()
+            INVALIDATION_BUS_RECONNECTS.inc()
+            await asyncio.sleep(backoff * random.uniform(0.5, 1.0))
+            backoff = min(backoff * 2, RECONNECT_MAX_SECONDS)
+
+    async def _connect(self):
+        conn = await asyncpg.connect(self.dsn, timeout=self.settings.INVALIDATION_HEALTHCHECK_SECONDS)
+        self._conn = conn
+        conn.add_termination_listener(lambda _: self._wakeup.set())
+        await conn.add_listener(self.channel, self._on_notify)
+        # Anything written before LISTEN took effect was missed: start empty.
+        # Nothing runs in between, so caches never serve an entry from before.
+        self.listening = True
+        self._resync()
+        logger.info("Listening for cache invalidations on %r", self.channel)
+
+    def _disconnect(self):
+        self.listening = False
+        if self._barrier is not None:
+            self._barrier.set_result(False)
+            self._barrier = None
+        self._resync()
+        if self._conn is not None:
+            self._conn.terminate()
+            self._conn = None
+
+    async def _dispatch(self):
+        """Evict pending notifications in batches until the connection fails"""
+        batch_seconds = self.settings.INVALIDATION_BATCH_MS / 1000
+        healthcheck_seconds = self.settings.INVALIDATION_HEALTHCHECK_SECONDS
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), healthcheck_seconds)
+            except asyncio.TimeoutError:
+                await self._conn.fetchval("SELECT 1", timeout=healthcheck_seconds)
+                continue
+            if self._conn.is_closed():
+                raise ConnectionError("listener connection closed")
+            barrier, self._barrier = self._barrier, None
+            if barrier is not None:
+                try:
+                    await self._conn.fetchval("SELECT 1", timeout=healthcheck_seconds)
+                except BaseException:
+                    barrier.set_result(False)
+                    raise
+            elif batch_seconds > 0:
+                await asyncio.sleep(batch_seconds)  # let the rest of a burst arrive
+            if self._barrier is None:
+                self._wakeup.clear()
+            self._flush()
+            if barrier is not None:
+                barrier.set_result(True)
+
+    def _on_notify(self, conn, pid: int, channel: str, payload: str):
+        self._pending.append(payload)
+        self._wakeup.set()
+
+    def _flush(self):
+        pending, self._pending = self._pending, []
+        keys: dict[str, set[str]] = defaultdict(set)
+        for payload in pending:
+            namespace, _, joined = payload.partition(":")
+            keys[namespace].update(joined.split(","))
+        for namespace, namespace_keys in keys.items():
+            self._evict(namespace, namespace_keys)
+
+    def _evict(self, namespace: str, keys: set[str]):
+        for subscriber in self.subscribers.get(namespace, ()):
+            if ALL_KEYS in keys:
+                subscriber.clear()
+            else:
+                subscriber.evict(keys)
+        CACHE_INVALIDATIONS.inc(len(keys), namespace=namespace)
+
+    def _resync(self):
+        for subscribers in self.subscribers.values():
+            for subscriber in subscribers:
+                subscriber.clear()
+
+    @staticmethod
+    def _payloads(namespace: str, keys: Iterable[str]) -> list[str]:
+        """Pack keys into as few payloads as fit MAX_PAYLOAD_BYTES"""
+        payloads = []
+        prefix = f"{namespace}:"
+        chunk: list[str] = []
+        size = len(prefix.encode())
+        for key in keys:
+            key_size = len(key.encode()) + 1
+            if chunk and size + key_size > MAX_PAYLOAD_BYTES:
+                payloads.append(prefix + ",".join(chunk))
+                chunk, size = [], len(prefix.encode())
+            chunk.append(key)
+            size += key_size
+        if chunk:
+            payloads.append(prefix + ",".join(chunk))
+        return payloads
+
+
+# One listener per worker process
+invalidation_bus = InvalidationBus()
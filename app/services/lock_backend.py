@@ -0,0 +1,341 @@
+"""
+Redemption lock backends: PostgreSQL advisory locks, a lease table, or in-process locks
+"""
+import asyncio
+import logging
+import time
+import uuid
+import weakref
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import AsyncIterator, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from app.config import get_settings
+from app.utils.metrics import REDEEM_LOCK_ATTEMPTS
+
+logger = logging.getLogger(__name__)
+
+# SQLSTATE raised when lock_timeout elapses
+LOCK_NOT_AVAILABLE = "55P03"
+
+# Backoff between lease acquisition attempts while waiting
+LEASE_POLL_MIN_SECONDS = 0.005
+LEASE_POLL_MAX_SECONDS = 0.1
+
+
+class LockUnavailable(Exception):
+    """Raised when a lock is held elsewhere (or was not acquired within the wait budget)"""
+
+
+class LockBackend(ABC):
+    """
+    Per-code mutual exclusion for redemptions
+
+    Redemptions also row-lock the coupon, so the backend does not guard
+    correctness on its own: it makes concurrent redemptions of a code fail
+    fast (or queue within a budget) before any row is touched.
+
+    The body of hold()/hold_many() must end its own transaction (commit or
+    rollback). Backends that lock inside the caller's transaction release
+    with it; the others release after the body returns.
+    """
+    name = ""
+
+    @abstractmethod
+    def hold(self, db: AsyncSession, key: str, wait_seconds: Optional[float] = None):
+        """
+        Hold the lock on a key for the duration of the block
+
+        Args:
+            db: Database session the protected work runs in
+            key: Key to lock (a coupon code)
+            wait_seconds: Max seconds to wait for the lock (None fails fast)
+
+        Raises:
+            LockUnavailable: If the lock is held elsewhere (or the wait timed out)
+        """
+
+    @abstractmethod
+    def hold_many(self, db: AsyncSession, keys: list[str]):
+        """
+        Try to lock several keys at once, without waiting
+
+        Yields the keys that were acquired; the others are held elsewhere.
+
+        Args:
+            db: Database session the protected work runs in
+            keys: Keys to lock, in the order to lock them
+        """
+
+
+class AdvisoryLockBackend(LockBackend):
+    """
+    Transaction-scoped PostgreSQL advisory locks on hashtext(code)
+
+    One extra statement per redemption and nothing to release: the
+    COMMIT/ROLLBACK that ends the caller's transaction drops the lock, so
+    it is safe behind PgBouncer transaction pooling. Works across workers
+    and nodes sharing the database.
+    """
+    name = "advisory"
+
+    @asynccontextmanager
+    async def hold(self, db: AsyncSession, key: str, wait_seconds: Optional[float] = None) -> AsyncIterator[None]:
+        if wait_seconds is None:
+            acquired = await self._try_acquire(db, key)
+        else:
+            acquired = await self._acquire(db, key, wait_seconds)
+        if not acquired:
+            raise LockUnavailable(key)
+        yield
+
+    @asynccontextmanager
+    async def hold_many(self, db: AsyncSession, keys: list[str]) -> AsyncIterator[list[str]]:
+        # One round trip, locks taken in the given order
+        result = await db.execute(
+            text(
+                "SELECT c.code, pg_try_advisory_xact_lock(hashtext(c.code)) AS acquired "
+                "FROM unnest(CAST(:codes AS text[])) WITH ORDINALITY AS c(code, ord) "
+                "ORDER BY c.ord"
+            ),
+            {"codes": keys}
+        )
+        acquired = [row.code for row in result if row.acquired]
+        REDEEM_LOCK_ATTEMPTS.inc(len(acquired), backend=self.name, result="acquired")
+        REDEEM_LOCK_ATTEMPTS.inc(len(keys) - len(acquired), backend=self.name, result="contended")
+        yield acquired
+
+    async def _try_acquire(self, db: AsyncSession, key: str) -> bool:
+        """Try pg_try_advisory_xact_lock(); True if acquired"""
+        result = await db.execute(
+            text("SELECT pg_try_advisory_xact_lock(hashtext(:code))"),
+            {"code": key}
+        )
+        acquired = bool(result.scalar())
+        REDEEM_LOCK_ATTEMPTS.inc(backend=self.name, result="acquired" if acquired else "contended")
+        return acquired
+
+    async def _acquire(self, db: AsyncSession, key: str, timeout_seconds: float) -> bool:
+        """
+        Wait in pg_advisory_xact_lock() with a transaction-local lock_timeout
+
+        PostgreSQL queues contenders instead of them polling.
+
+        Returns:
+            True if acquired, False if the timeout elapsed (the transaction
+            is rolled back)
+        """
+        timeout_ms = max(int(timeout_seconds * 1000), 1)
+        await db.execute(
+            text("SELECT set_config('lock_timeout', :timeout, true)"),
+            {"timeout": f"{timeout_ms}ms"}
+        )
+        try:
+            await db.execute(
+                text("SELECT pg_advisory_xact_lock(hashtext(:code))"),
+                {"code": key}
+            )
+        except DBAPIError as e:
+            if getattr(e.orig, "sqlstate", None) != LOCK_NOT_AVAILABLE:
+                raise
+            await db.rollback()
+            REDEEM_LOCK_ATTEMPTS.inc(backend=self.name, result="timeout")
+            return False
+
+        # The budget only bounds the queueing, not the rest of the transaction
+        await db.execute(text("SET LOCAL lock_timeout = DEFAULT"))
+        REDEEM_LOCK_ATTEMPTS.inc(backend=self.name, result="waited")
+        return True
+
+
+class LeaseLockBackend(LockBackend):
+    """
+    Leases in the lock_leases table
+
+    Acquiring inserts a row (or takes over an expired one) and commits, so
+    the lease is visible to every worker and node and outlives nothing but
+    LOCK_LEASE_TTL_SECONDS if the holder crashes. Costs two extra short
+    transactions per redemption; waiting polls with backoff. The session
+    must not have a transaction in progress when hold() is entered.
+    """
+    name = "lease"
+
+    def __init__(self):
+        self.settings = get_settings()
+
+    @asynccontextmanager
+    async def hold(self, db: AsyncSession, key: str, wait_seconds: Optional[float] = None) -> AsyncIterator[None]:
+        owner = str(uuid.uuid4())
+        acquired = await self._acquire(db, [key], owner)
+        if not acquired and wait_seconds:
+            deadline = time.monotonic() + wait_seconds
+            delay = LEASE_POLL_MIN_SECONDS
+            while not acquired and time.monotonic() + delay < deadline:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, LEASE_POLL_MAX_SECONDS)
+                acquired = await self._acquire(db, [key], owner)
+            result = "waited" if acquired else "timeout"
+        else:
+            result = "acquired" if acquired else "contended"
+        REDEEM_LOCK_ATTEMPTS.inc(backend=self.name, result=result)
+        if not acquired:
+            raise LockUnavailable(key)
+
+        try:
+            yield
+        finally:
+            await self._release(db, acquired, owner)
+
+    @asynccontextmanager
+    async def hold_many(self, db: AsyncSession, keys: list[str]) -> AsyncIterator[list[str]]:
+        owner = str(uuid.uuid4())
+        acquired = await self._acquire(db, keys, owner)
+        REDEEM_LOCK_ATTEMPTS.inc(len(acquired), backend=self.name, result="acquired")
+        REDEEM_LOCK_ATTEMPTS.inc(len(keys) - len(acquired), backend=self.name, result="contended")
+        try:
+            yield [key for key in keys if key in acquired]
+        finally:
+            await self._release(db, acquired, owner)
+
+    async def _acquire(self, db: AsyncSession, keys: list[str], owner: str) -> list[str]:
+        """Insert or take over expired leases for keys; return the keys now owned"""
+        result = await db.execute(
+            text("""
+                INSERT INTO lock_leases (lock_key, owner, expires_at)
+                SELECT k, CAST(:owner AS uuid), now() + CAST(:ttl AS integer) * interval '1 second'
+                FROM unnest(CAST(:keys AS text[])) AS k
+                ON CONFLICT (lock_key) DO UPDATE
+                SET owner = EXCLUDED.owner, expires_at = EXCLUDED.expires_at
+                WHERE lock_leases.expires_at <= now()
+                RETURNING lock_key
+            """),
+            {"keys": keys, "owner": owner, "ttl": self.settings.LOCK_LEASE_TTL_SECONDS}
+        )
+        acquired = list(result.scalars())
+        await db.commit()
+        return acquired
+
+    async def _release(self, db: AsyncSession, keys: list[str], owner: str):
+        """Delete the leases still owned by owner"""
+        if not keys:
+            return
+        # Whatever the body left open is abandoned, like on session close
+        if db.in_transaction():
+            await db.rollback()
+        try:
+            await db.execute(
+                text(
+                    "DELETE FROM lock_leases "
+                    "WHERE lock_key = ANY(CAST(:keys AS text[])) AND owner = CAST(:owner AS uuid)"
+                ),
+                {"keys": keys, "owner": owner}
+            )
+            await db.commit()
+        except Exception as e:
+            # The protected work is already committed; the lease expires on its own
+            await db.rollback()
+            logger.warning("Could not release leases %s: %s", keys, e)
+
+
+class InProcessLockBackend(LockBackend):
+    """
+    asyncio.Lock per key, held in a WeakValueDictionary
+
+    No database round trips. Entries are only referenced by the callers
+    holding or waiting on them and disappear with the last one, so memory
+    stays proportional to the keys in use. Only excludes redemptions in
+    the same process: use it for single-worker deployments and tests.
+    """
+    name = "in_process"
+
+    def __init__(self):
+        self._locks: weakref.WeakValueDictionary[str, asyncio.Lock] = weakref.WeakValueDictionary()
+
+    def _lock(self, key: str) -> asyncio.Lock:
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[key] = lock
+        return lock
+
+    @staticmethod
+    def _free(lock: asyncio.Lock) -> bool:
+        """Whether acquire() would return at once: not held and nobody queued for it"""
+        # Right after a release the lock reads unlocked while its next waiter is
+        # still being woken; acquire() would then queue behind that waiter
+        return not lock.locked() and not lock._waiters
+
+    @asynccontextmanager
+    async def hold(self, db: AsyncSession, key: str, wait_seconds: Optional[float] = None) -> AsyncIterator[None]:
+        # The local reference keeps the entry alive while held or waited on
+        lock = self._lock(key)
+        if wait_seconds is None:
+            if not self._free(lock):
+                REDEEM_LOCK_ATTEMPTS.inc(backend=self.name, result="contended")
+                raise LockUnavailable(key)
+            await lock.acquire()
+            REDEEM_LOCK_ATTEMPTS.inc(backend=self.name, result="acquired")
+        else:
+            try:
+                await asyncio.wait_for(lock.acquire(), wait_seconds)
+            except asyncio.TimeoutError:
+                REDEEM_LOCK_ATTEMPTS.inc(backend=self.name, result="timeout")
+                raise LockUnavailable(key)
+            REDEEM_LOCK_ATTEMPTS.inc(backend=self.name, result="waited")
+
+        try:
+            yield
+        finally:
+            lock.release()
+
+    @asynccontextmanager
+    async def hold_many(self, db: AsyncSession, keys: list[str]) -> AsyncIterator[list[str]]:
+        held = []
+        try:
+            for key in keys:
+                lock = self._lock(key)
+                if self._free(lock):
+                    await lock.acquire()
+                    held.append((key, lock))
+            REDEEM_LOCK_ATTEMPTS.inc(len(held), backend=self.name, result="acquired")
+            REDEEM_LOCK_ATTEMPTS.inc(len(keys) - len(held), backend=self.name, result="contended")
+            yield [key for key, _ in held]
+        finally:
+            for _, lock in held:
+                lock.release()
+
+
+LOCK_BACKENDS = {
+    AdvisoryLockBackend.name: AdvisoryLockBackend,
+    LeaseLockBackend.name: LeaseLockBackend,
+    InProcessLockBackend.name: InProcessLockBackend,
+}
+
+
+def create_lock_backend(name: str) -> LockBackend:
+    """
+    Instantiate a lock backend by name
+
+    Raises:
+        ValueError: If the name is not one of LOCK_BACKENDS
+    """
+    try:
+        return LOCK_BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown LOCK_BACKEND {name!r}, expected one of {sorted(LOCK_BACKENDS)}")
+
+
+@lru_cache()
+def get_lock_backend() -> LockBackend:
+    """Process-wide lock backend selected by LOCK_BACKEND"""
+    settings = get_settings()
+    backend = create_lock_backend(settings.LOCK_BACKEND)
+    if backend.name == InProcessLockBackend.name and settings.WEB_CONCURRENCY > 1:
+        logger.warning(
+            "LOCK_BACKEND=in_process only excludes redemptions within one process, "
+            "but WEB_CONCURRENCY=%s", settings.WEB_CONCURRENCY
+        )
+    return backend
@@ -0,0 +1,65 @@
+"""
+Lock sweeper that releases coupons whose lock has expired
+"""
+import logging
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import text
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+class LockSweeper:
+    """Moves LOCKED coupons with an expired locked_until back to ASSIGNED/UNASSIGNED"""
+
+    def __init__(self):
+        self.settings = get_settings()
+
+    async def release_expired_locks(self, db: AsyncSession) -> int:
+        """
+        Release expired locks in batches
+
+        Each batch is a single UPDATE over at most LOCK_SWEEP_BATCH_SIZE rows,
+        picked through the partial index on locked_until and committed on its
+        own. SKIP LOCKED lets several workers sweep concurrently and never
+        blocks on a coupon that is being redeemed.
+
+        Args:
+            db: Database session
+
+        Returns:
+            Number of coupons released
+        """
+        batch_size = self.settings.LOCK_SWEEP_BATCH_SIZE
+        released = 0
+
+        while True:
+            result = await db.execute(
+                text("""
+                    UPDATE coupons
+                    SET state = CASE WHEN assigned_user_id IS NULL
+                                     THEN 'UNASSIGNED' ELSE 'ASSIGNED' END,
+                        is_locked = false,
+                        locked_until = NULL,
+                        locked_by = NULL,
+                        updated_at = now()
+                    WHERE (code, book_id) IN (
+                        SELECT code, book_id FROM coupons
+                        WHERE state = 'LOCKED' AND locked_until < now()
+                        ORDER BY locked_until
+                        LIMIT :batch_size
+                        FOR UPDATE SKIP LOCKED
+                    )
+                """),
+                {"batch_size": batch_size}
+            )
+            await db.commit()
+
+            released += result.rowcount
+            if result.rowcount < batch_size:
+                break
+
+        if released:
+            logger.info("Released %d expired coupon locks", released)
+
+        return released
@@ -0,0 +1,86 @@
+"""
+Per-book partition management for the coupons table
+"""
+import logging
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+
+class CouponPartitionService:
+    """Creates, detaches and drops the coupon partition of a book"""
+    
+    async def create_book_partition(self, db: AsyncSession, book_id: str) -> str:
+        """
+        Give a book its own coupons partition
+        
+        Idempotent. Coupons of the book that were already stored in the
+        default partition are moved over. Does not commit.
+        
+        Args:
+            db: Database session
+            book_id: Book ID
+            
+        Returns:
+            Partition table name
+        """
+        result = await db.execute(
+            text("SELECT create_coupon_partition(CAST(:book_id AS uuid))"),
+            {"book_id": book_id}
+        )
+        return result.scalar()
+    
+    async def detach_book_partition(self, db: AsyncSession, book_id: str) -> Optional[str]:
+        """
+        Detach a book's partition, keeping it as a standalone table for archiving
+        
+        The book's coupons disappear from the coupons table instantly; the
+        detached table can be dumped and dropped later. Commits.
+        
+        Args:
+            db: Database session
+            book_id: Book ID
+            
+        Returns:
+            Name of the detached table, or None if the book had no partition
+        """
+        result = await db.execute(
+            text("SELECT detach_coupon_partition(CAST(:book_id AS uuid))"),
+            {"book_id": book_id}
+        )
+        partition = result.scalar()
+        await db.commit()
+        
+        if partition:
+            logger.info("Detached coupon partition %s of book %s", partition, book_id)
+        return partition
+    
+    async def drop_book_inventory(self, db: AsyncSession, book_id: str) -> bool:
+        """
+        Drop all coupons of a book by dropping its partition
+        
+        Codes stay registered in coupon_codes so they are never reissued and
+        redemption history keeps pointing at them. Commits.
+        
+        Args:
+            db: Database session
+            book_id: Book ID
+            
+        Returns:
+            True if a partition was dropped
+        """
+        result = await db.execute(
+            text("SELECT detach_coupon_partition(CAST(:book_id AS uuid))"),
+            {"book_id": book_id}
+        )
+        partition = result.scalar()
+        if partition:
+            # Name comes from coupon_partition_name(): 'coupons_' || md5(book_id)
+            await db.execute(text(f'DROP TABLE "{partition}"'))
+        await db.commit()
+        
+        if partition:
+            logger.info("Dropped coupon partition %s of book %s", partition, book_id)
+        return partition is not None
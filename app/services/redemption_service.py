@@ -1,27 +1,54 @@
 """
-Redemption service with PostgreSQL advisory lock implementation
+Redemption service: lease-based coupon locks, redemption under a pluggable lock backend
 """
+import time
 from typing import Optional
 from datetime import datetime, timedelta, timezone
+from fastapi import HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, text
-from app.models import Coupon, Book, RedemptionHistory
+from sqlalchemy import select, insert, update, func, and_, or_, case
+from sqlalchemy.orm import noload
+from app.models import Coupon, CouponCode, RedemptionHistory
 from app.utils.enums import CouponState
 from app.utils.exceptions import (
+    CouponServiceException,
     CouponNotFoundException,
     CouponLockedException,
+    LockNotHeldException,
     InvalidStateTransitionException,
     NoRedemptionsRemainingException,
     CouponExpiredException
 )
+from app.utils.metrics import (
+    PhaseTimer,
+    REDEMPTION_PHASE_DURATION,
+    REDEMPTIONS,
+    LOCK_LEASES
+)
+from app.utils.ids import uuid7
+from app.utils.keyed_lock import KeyedLock, KeyedLockQueueFull, KeyedLockTimeout
+from app.services.book_policy import BookPolicy, book_policies
+from app.services.lock_backend import LockBackend, LockUnavailable, get_lock_backend
 from app.config import get_settings
 
+# Per-code FIFO queue for redemptions that opted into waiting
+_redeem_queue = KeyedLock(max_waiters=get_settings().REDEEM_WAIT_QUEUE_LIMIT)
+
 
 class RedemptionService:
-    """Handles coupon locking and redemption with PostgreSQL advisory locks"""
+    """
+    Handles coupon locking and redemption
+    
+    Locks are leases stored on the coupon row; redemptions serialize on
+    the LockBackend selected by LOCK_BACKEND (transaction-scoped advisory
+    locks by default). Neither the leases nor the advisory and lease
+    backends keep state on the database connection, so they work behind
+    PgBouncer in transaction pooling mode.
+    """
     
-    def __init__(self):
+    def __init__(self, lock_backend: Optional[LockBackend] = None):
         self.settings = get_settings()
+        self.lock_backend = lock_backend or get_lock_backend()
     
     async def lock_coupon(
         self,
@@ -31,126 +58,222 @@ class RedemptionService:
         lock_duration_seconds: int = 300
     ) -> Coupon:
         """
-        Lock a coupon using PostgreSQL advisory lock
+        Lock a coupon by taking a lease on it
         
-        Advisory lock prevents concurrent redemption attempts on the same code.
-        Lock is released automatically on session end or explicit unlock.
+        A single conditional UPDATE moves an ASSIGNED coupon (or one whose
+        lock has lapsed) to LOCKED, owned by user_id until locked_until.
+        Nothing is tied to the database connection, so the lease survives
+        connection pooling (including PgBouncer transaction pooling) and
+        expires on its own if the owner never comes back.
         
         Args:
             db: Database session
             code: Coupon code to lock
-            user_id: User attempting to lock
-            lock_duration_seconds: Duration in seconds
+            user_id: User taking the lease
+            lock_duration_seconds: Lease duration in seconds
             
         Returns:
             Locked Coupon object
             
         Raises:
             CouponNotFoundException: If coupon not found
-            CouponLockedException: If coupon already locked
+            CouponLockedException: If another lease is still active
             InvalidStateTransitionException: If state transition invalid
         """
-        # Get coupon
-        result = await db.execute(
-            select(Coupon).where(Coupon.code == code)
-        )
-        coupon = result.scalar_one_or_none()
+        timer = PhaseTimer(REDEMPTION_PHASE_DURATION, operation="lock")
         
-        if not coupon:
-            raise CouponNotFoundException(f"Coupon {code} not found")
+        lapsed = and_(
+            Coupon.state == CouponState.LOCKED,
+            Coupon.locked_until <= func.now(),
+            Coupon.assigned_user_id.is_not(None)
+        )
+        coupon = await self._update_lease(
+            db,
+            update(Coupon)
+            .where(Coupon.matches_code(code), or_(Coupon.state == CouponState.ASSIGNED, lapsed))
+            .values(
+                state=CouponState.LOCKED,
+                is_locked=True,
+                locked_until=func.now() + timedelta(seconds=lock_duration_seconds),
+                locked_by=user_id
+            )
+        )
+        timer.mark("lease")
         
-        # Validate state transition
-        if not CouponState.is_valid_transition(coupon.state, CouponState.LOCKED):
+        if coupon is None:
+            LOCK_LEASES.inc(operation="lock", result="rejected")
+            coupon = await self._get_coupon(db, code)
+            if coupon.state == CouponState.LOCKED:
+                raise CouponLockedException(
+                    f"Coupon {code} is locked until {coupon.locked_until}"
+                )
             raise InvalidStateTransitionException(
                 str(coupon.state),
                 CouponState.LOCKED.value
             )
         
-        # Check if already locked
-        if coupon.is_locked and coupon.locked_until and coupon.locked_until > datetime.now(timezone.utc):
-            raise CouponLockedException(
-                f"Coupon {code} is locked until {coupon.locked_until}"
-            )
+        await db.commit()
+        timer.mark("commit")
+        LOCK_LEASES.inc(operation="lock", result="acquired")
+        
+        return coupon
+    
+    async def renew_lock(
+        self,
+        db: AsyncSession,
+        code: str,
+        user_id: str,
+        lock_duration_seconds: int = 300
+    ) -> Coupon:
+        """
+        Extend a lease held by user_id to lock_duration_seconds from now
         
-        # Try to acquire PostgreSQL advisory lock
-        # Use hashtext() to convert string to bigint for advisory lock
-        lock_acquired = await self._try_acquire_advisory_lock(db, code)
+        Only an unexpired lease can be renewed: once it lapsed another user
+        may already have locked the coupon.
         
-        if not lock_acquired:
-            raise CouponLockedException(
-                f"Could not acquire lock on coupon {code} - concurrent access"
+        Args:
+            db: Database session
+            code: Coupon code
+            user_id: Lease owner
+            lock_duration_seconds: New lease duration in seconds
+            
+        Returns:
+            Locked Coupon object
+            
+        Raises:
+            CouponNotFoundException: If coupon not found
+            LockNotHeldException: If user_id does not hold an active lease
+        """
+        coupon = await self._update_lease(
+            db,
+            update(Coupon)
+            .where(
+                Coupon.matches_code(code),
+                Coupon.state == CouponState.LOCKED,
+                Coupon.locked_by == user_id,
+                Coupon.locked_until > func.now()
             )
+            .values(locked_until=func.now() + timedelta(seconds=lock_duration_seconds))
+        )
         
-        # Update coupon state
-        coupon.state = CouponState.LOCKED
-        coupon.is_locked = True
-        coupon.locked_until = datetime.now(timezone.utc) + timedelta(seconds=lock_duration_seconds)
+        if coupon is None:
+            LOCK_LEASES.inc(operation="renew", result="rejected")
+            await self._get_coupon(db, code)
+            raise LockNotHeldException(code)
         
         await db.commit()
-        await db.refresh(coupon)
+        LOCK_LEASES.inc(operation="renew", result="renewed")
         
         return coupon
     
     async def unlock_coupon(
         self,
         db: AsyncSession,
-        code: str
+        code: str,
+        user_id: Optional[str]
     ) -> Coupon:
         """
-        Unlock a coupon and release advisory lock
+        Release a coupon's lease
+        
+        The lease is only released if user_id holds it (or it has lapsed).
+        user_id=None force-releases it; only the admin route passes that.
+        Unlocking a coupon that is not LOCKED is a no-op.
         
         Args:
             db: Database session
             code: Coupon code to unlock
+            user_id: Expected lease owner, or None to force
             
         Returns:
             Unlocked Coupon object
+            
+        Raises:
+            CouponNotFoundException: If coupon not found
+            LockNotHeldException: If another user holds an active lease
         """
-        # Get coupon
-        result = await db.execute(
-            select(Coupon).where(Coupon.code == code)
-        )
-        coupon = result.scalar_one_or_none()
-        
-        if not coupon:
-            raise CouponNotFoundException(f"Coupon {code} not found")
+        timer = PhaseTimer(REDEMPTION_PHASE_DURATION, operation="unlock")
         
-        # Release advisory lock first and commit to ensure it's released
-        await self._release_advisory_lock(db, code)
-        await db.commit()  # Commit the lock release immediately
+        conditions = [Coupon.matches_code(code), Coupon.state == CouponState.LOCKED]
+        if user_id is not None:
+            conditions.append(or_(Coupon.locked_by == user_id, Coupon.locked_until <= func.now()))
+        coupon = await self._update_lease(
+            db,
+            update(Coupon)
+            .where(*conditions)
+            .values(
+                state=case(
+                    (Coupon.assigned_user_id.is_(None), CouponState.UNASSIGNED.value),
+                    else_=CouponState.ASSIGNED.value
+                ),
+                is_locked=False,
+                locked_until=None,
+                locked_by=None
+            )
+        )
+        timer.mark("lease")
         
-        # Revert to previous state (ASSIGNED if has user, otherwise UNASSIGNED)
-        if coupon.assigned_user_id:
-            coupon.state = CouponState.ASSIGNED
-        else:
-            coupon.state = CouponState.UNASSIGNED
-        
-        coupon.is_locked = False
-        coupon.locked_until = None
+        if coupon is None:
+            coupon = await self._get_coupon(db, code)
+            if coupon.state == CouponState.LOCKED:
+                LOCK_LEASES.inc(operation="unlock", result="rejected")
+                raise LockNotHeldException(code)
+            return coupon
         
         await db.commit()
-        await db.refresh(coupon)
+        timer.mark("commit")
+        LOCK_LEASES.inc(operation="unlock", result="released")
         
         return coupon
     
+    async def _update_lease(self, db: AsyncSession, statement) -> Optional[Coupon]:
+        """Run a conditional lease UPDATE; return the updated coupon, or None if no row matched"""
+        result = await db.execute(
+            statement
+            .returning(Coupon)
+            .options(noload(Coupon.redemption_history))
+            .execution_options(synchronize_session=False)
+        )
+        return result.scalar_one_or_none()
+    
+    async def _get_coupon(self, db: AsyncSession, code: str) -> Coupon:
+        """Load a coupon to explain why a conditional UPDATE did not match"""
+        result = await db.execute(
+            select(Coupon)
+            .where(Coupon.matches_code(code))
+            .options(noload(Coupon.redemption_history))
+        )
+        coupon = result.scalar_one_or_none()
+        if not coupon:
+            raise CouponNotFoundException(code)
+        return coupon
+    
     async def redeem_coupon(
         self,
         db: AsyncSession,
         code: str,
         user_id: str,
-        metadata: Optional[dict] = None
+        metadata: Optional[dict] = None,
+        wait_seconds: Optional[float] = None
     ) -> tuple[Coupon, RedemptionHistory]:
         """
-        Redeem a coupon with advisory lock protection
+        Redeem a coupon under the per-code redemption lock
         
         Handles both single and multi-redemption coupons.
         Creates audit trail in RedemptionHistory.
         
+        By default a concurrent redemption of the same code fails
+        immediately. With wait_seconds the request instead queues behind
+        other redemptions of the code (FIFO within this process, then in the
+        lock backend across processes) and only fails if it is not served
+        within the budget.
+        
         Args:
             db: Database session
             code: Coupon code to redeem
             user_id: User redeeming the coupon
             metadata: Optional metadata (order info, etc.)
+            wait_seconds: Max seconds to wait for concurrent redemptions,
+                capped at REDEEM_MAX_WAIT_SECONDS (None/0 fails fast)
             
         Returns:
             Tuple of (Coupon, RedemptionHistory)
@@ -159,32 +282,76 @@ class RedemptionService:
             CouponNotFoundException: If coupon not found
             CouponExpiredException: If coupon expired
             NoRedemptionsRemainingException: If no redemptions left
-            CouponLockedException: If cannot acquire lock
+            CouponLockedException: If cannot acquire lock (within the budget)
         """
-        # Try to acquire advisory lock
-        lock_acquired = await self._try_acquire_advisory_lock(db, code)
-        if not lock_acquired:
+        if not wait_seconds:
+            return await self._redeem(db, code, user_id, metadata)
+        
+        budget = min(wait_seconds, self.settings.REDEEM_MAX_WAIT_SECONDS)
+        deadline = time.monotonic() + budget
+        try:
+            async with _redeem_queue.hold(code, timeout=budget):
+                return await self._redeem(
+                    db, code, user_id, metadata,
+                    lock_wait_seconds=deadline - time.monotonic()
+                )
+        except KeyedLockQueueFull:
             raise CouponLockedException(
-                f"Could not acquire lock on coupon {code} - concurrent redemption"
+                f"Too many pending redemptions for coupon {code} - retry later"
+            )
+        except KeyedLockTimeout:
+            raise CouponLockedException(
+                f"Timed out after {budget}s waiting to redeem coupon {code}"
             )
+    
+    async def _redeem(
+        self,
+        db: AsyncSession,
+        code: str,
+        user_id: str,
+        metadata: Optional[dict],
+        lock_wait_seconds: Optional[float] = None
+    ) -> tuple[Coupon, RedemptionHistory]:
+        """Redeem under the backend's lock on the code; waits up to lock_wait_seconds if given"""
+        timer = PhaseTimer(REDEMPTION_PHASE_DURATION, operation="redeem")
         
+        try:
+            async with self.lock_backend.hold(db, code, lock_wait_seconds):
+                timer.mark("lock")
+                return await self._redeem_locked(db, code, user_id, metadata, timer)
+        except LockUnavailable:
+            raise CouponLockedException(
+                f"Could not acquire lock on coupon {code} - concurrent redemption"
+            )
+    
+    async def _redeem_locked(
+        self,
+        db: AsyncSession,
+        code: str,
+        user_id: str,
+        metadata: Optional[dict],
+        timer: PhaseTimer
+    ) -> tuple[Coupon, RedemptionHistory]:
+        """Redemption itself; the caller holds the code's lock"""
         try:
             # Get coupon with row lock
             result = await db.execute(
                 select(Coupon)
-                .where(Coupon.code == code)
+                .where(Coupon.matches_code(code))
+                .options(noload(Coupon.redemption_history))
                 .with_for_update()
             )
             coupon = result.scalar_one_or_none()
             
             if not coupon:
-                raise CouponNotFoundException(f"Coupon {code} not found")
+                raise CouponNotFoundException(code)
+            
+            # Abandoned checkout: an expired lock reverts to ASSIGNED
+            self.release_expired_lock(coupon)
             
             # Get book to check expiration and config
-            result = await db.execute(
-                select(Book).where(Book.book_id == coupon.book_id)
-            )
-            book = result.scalar_one()
+            book = await book_policies.get(db, coupon.book_id)
+            timer.mark("load")
             
             # Check expiration
             if book.expiration_date and book.expiration_date < datetime.now(timezone.utc):
@@ -235,6 +402,8 @@ class RedemptionService:
                         f"({book.max_redemptions_per_user}) for this coupon"
                     )
             
+            timer.mark("validate")
+            
             # Perform redemption
             coupon.redemption_count += 1
             
@@ -247,6 +416,7 @@ class RedemptionService:
             # Clear lock
             coupon.is_locked = False
             coupon.locked_until = None
+            coupon.locked_by = None
             
             # Create redemption history record
             history = RedemptionHistory(
@@ -257,45 +427,227 @@ class RedemptionService:
             )
             db.add(history)
             
+            # The flush returns updated_at and redeemed_at, so no reload
             await db.commit()
-            await db.refresh(coupon)
-            await db.refresh(history)
+            timer.mark("commit")
+            REDEMPTIONS.inc(operation="redeem")
             
             return coupon, history
             
-        finally:
-            # Always release advisory lock
-            await self._release_advisory_lock(db, code)
+        except Exception:
+            # Ends the transaction (and with it a transaction-scoped lock)
+            await db.rollback()
+            raise
     
-    async def _try_acquire_advisory_lock(self, db: AsyncSession, code: str) -> bool:
+    async def redeem_coupons_batch(
+        self,
+        db: AsyncSession,
+        user_id: str,
+        items: list[tuple[str, Optional[dict]]],
+        atomic: bool = True
+    ) -> list[tuple[str, Optional[Coupon], Optional[RedemptionHistory], Optional[HTTPException]]]:
         """
-        Try to acquire PostgreSQL advisory lock on a coupon code
+        Redeem several coupons in a single transaction
         
-        Uses hashtext() to convert string to bigint for pg_try_advisory_lock()
+        Codes are locked through the lock backend in sorted order without
+        waiting (one round trip for the advisory and lease backends); codes
+        held elsewhere fail with CouponLockedException. Coupons are
+        row-locked in the same order, books and per-user counts are
+        loaded in one query each, and all history rows are written with a
+        single multi-row INSERT.
         
         Args:
             db: Database session
-            code: Coupon code
+            user_id: User redeeming the coupons
+            items: (code, metadata) pairs in request order
+            atomic: If True, nothing is committed unless every item succeeds
             
         Returns:
-            True if lock acquired, False otherwise
+            One (code, Coupon, RedemptionHistory, error) tuple per item, in
+            request order. Coupon/history are None for failed items. With
+            atomic, items rolled back only because another failed get a
+            424 HTTPException.
         """
-        result = await db.execute(
-            text("SELECT pg_try_advisory_lock(hashtext(:code))"),
-            {"code": code}
-        )
-        lock_acquired = result.scalar()
-        return bool(lock_acquired)
+        timer = PhaseTimer(REDEMPTION_PHASE_DURATION, operation="redeem_batch")
+        codes = sorted({code for code, _ in items})
+        
+        # Locks in deterministic order
+        async with self.lock_backend.hold_many(db, codes) as locked_codes:
+            timer.mark("lock")
+            return await self._redeem_batch_locked(db, user_id, items, atomic, locked_codes, timer)
     
-    async def _release_advisory_lock(self, db: AsyncSession, code: str):
+    async def _redeem_batch_locked(
+        self,
+        db: AsyncSession,
+        user_id: str,
+        items: list[tuple[str, Optional[dict]]],
+        atomic: bool,
+        locked_codes: list[str],
+        timer: PhaseTimer
+    ) -> list[tuple[str, Optional[Coupon], Optional[RedemptionHistory], Optional[HTTPException]]]:
+        """Batch redemption itself; the caller holds the locks on locked_codes"""
+        # Row locks in the same order, without loading redemption history
+        coupons = {}
+        if locked_codes:
+            # Joining through coupon_codes lets each probe prune to one partition
+            result = await db.execute(
+                select(Coupon)
+                .join(CouponCode, and_(
+                    CouponCode.code == Coupon.code,
+                    CouponCode.book_id == Coupon.book_id
+                ))
+                .where(CouponCode.code.in_(locked_codes))
+                .options(noload(Coupon.redemption_history))
+                .order_by(Coupon.code)
+                .with_for_update(of=Coupon)
+            )
+            coupons = {coupon.code: coupon for coupon in result.scalars()}
+        
+        books = {}
+        user_redemptions = {}
+        if coupons:
+            books = await book_policies.get_many(db, {c.book_id for c in coupons.values()})
+            
+            result = await db.execute(
+                select(RedemptionHistory.code, func.count())
+                .where(
+                    RedemptionHistory.code.in_(list(coupons)),
+                    RedemptionHistory.user_id == user_id
+                )
+                .group_by(RedemptionHistory.code)
+            )
+            user_redemptions = dict(result.all())
+        timer.mark("load")
+        
+        now = datetime.now(timezone.utc)
+        outcomes = []
+        history_rows = []
+        for code, metadata in items:
+            coupon = coupons.get(code)
+            try:
+                if code not in locked_codes:
+                    raise CouponLockedException(code)
+                if coupon is None:
+                    raise CouponNotFoundException(code)
+                self._check_batch_redeemable(
+                    coupon,
+                    books[coupon.book_id],
+                    user_redemptions.get(code, 0),
+                    now
+                )
+            except CouponServiceException as e:
+                outcomes.append((code, None, e))
+                continue
+            
+            coupon.redemption_count += 1
+            coupon.state = CouponState.REDEEMED
+            coupon.is_locked = False
+            coupon.locked_until = None
+            coupon.locked_by = None
+            user_redemptions[code] = user_redemptions.get(code, 0) + 1
+            
+            row = {
+                "history_id": uuid7(),
+                "code": code,
+                "user_id": user_id,
+                "book_id": coupon.book_id,
+                "redemption_metadata": metadata,
+            }
+            history_rows.append(row)
+            outcomes.append((code, row, None))
+        
+        timer.mark("validate")
+        
+        failed = any(error is not None for _, _, error in outcomes)
+        if atomic and failed:
+            await db.rollback()
+            # Not an error of its own: a plain HTTPException is not counted in SERVICE_EXCEPTIONS
+            rolled_back = HTTPException(
+                status_code=status.HTTP_424_FAILED_DEPENDENCY,
+                detail="Not redeemed: another item in the batch failed"
+            )
+            return [
+                (code, None, None, error or rolled_back)
+                for code, _, error in outcomes
+            ]
+        
+        histories = {}
+        if history_rows:
+            result = await db.execute(
+                insert(RedemptionHistory)
+                .values(history_rows)
+                .returning(RedemptionHistory)
+            )
+            histories = {h.history_id: h for h in result.scalars()}
+        timer.mark("insert_history")
+        
+        await db.commit()
+        timer.mark("commit")
+        REDEMPTIONS.inc(len(history_rows), operation="redeem_batch")
+        
+        return [
+            (code, None, None, error) if error is not None
+            else (code, coupons[code], histories[row["history_id"]], None)
+            for code, row, error in outcomes
+        ]
+    
+    @staticmethod
+    def _check_batch_redeemable(
+        coupon: Coupon,
+        book: BookPolicy,
+        user_redemptions: int,
+        now: datetime
+    ) -> None:
         """
-        Release PostgreSQL advisory lock on a coupon code
+        Validate a coupon for batch redemption (same rules as redeem_coupon)
         
-        Args:
-            db: Database session
-            code: Coupon code
+        Raises:
+            CouponExpiredException: If the book has expired (coupon is marked EXPIRED)
+            NoRedemptionsRemainingException: If no redemptions left for the coupon or user
+            InvalidStateTransitionException: If coupon state does not allow redemption
         """
-        await db.execute(
-            text("SELECT pg_advisory_unlock(hashtext(:code))"),
-            {"code": code}
-        )
+        RedemptionService.release_expired_lock(coupon, now)
+        
+        if book.expiration_date and book.expiration_date < now:
+            coupon.state = CouponState.EXPIRED
+            raise CouponExpiredException(coupon.code)
+        
+        if not coupon.has_redemptions_remaining:
+            raise NoRedemptionsRemainingException(coupon.code)
+        
+        valid_states = [CouponState.ASSIGNED]
+        if book.allow_multi_redemption:
+            valid_states.append(CouponState.REDEEMED)
+        
+        if coupon.state not in valid_states:
+            raise InvalidStateTransitionException(str(coupon.state), "REDEEMED")
+        
+        if book.max_redemptions_per_user and user_redemptions >= book.max_redemptions_per_user:
+            raise NoRedemptionsRemainingException(coupon.code)
+    
+    @staticmethod
+    def is_lock_expired(coupon: Coupon, now: Optional[datetime] = None) -> bool:
+        """Check if a coupon is LOCKED but its locked_until has passed"""
+        if coupon.state != CouponState.LOCKED or not coupon.locked_until:
+            return False
+        return coupon.locked_until <= (now or datetime.now(timezone.utc))
+    
+    @staticmethod
+    def release_expired_lock(coupon: Coupon, now: Optional[datetime] = None) -> bool:
+        """
+        Lazily release an expired lock (in memory, persisted on commit)
+        
+        Mirrors what the lock sweeper does so the redeem path does not have
+        to wait for the next sweep.
+        
+        Returns:
+            True if the lock had expired and was released
+        """
+        if not RedemptionService.is_lock_expired(coupon, now):
+            return False
+        
+        coupon.state = CouponState.ASSIGNED if coupon.assigned_user_id else CouponState.UNASSIGNED
+        coupon.is_locked = False
+        coupon.locked_until = None
+        coupon.locked_by = None
+        return True
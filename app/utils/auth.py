@@ -11,7 +11,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
 from app.config import get_settings
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.models.user import User, UserRole
 
 # Password hashing
@@ -132,6 +132,19 @@ async def get_current_user(
     return user
 
 
+async def get_current_user_read(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_read_db)
+) -> User:
+    """
+    get_current_user for read-only endpoints
+    
+    Looks the user up in the endpoint's own read-only session, so a GET
+    request does not open a second, read-write session just for auth.
+    """
+    return await get_current_user(credentials, db)
+
+
 async def get_current_active_user(
     current_user: User = Depends(get_current_user)
 ) -> User:
@@ -166,6 +179,13 @@ async def require_admin(
     return current_user
 
 
+async def require_admin_read(
+    current_user: User = Depends(get_current_user_read)
+) -> User:
+    """require_admin for read-only endpoints"""
+    return await require_admin(current_user)
+
+
 async def get_optional_user(
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
     db: AsyncSession = Depends(get_db)
@@ -0,0 +1,57 @@
+"""
+Bloom filter: compact set membership with false positives, never false negatives
+"""
+import math
+from typing import Iterable
+
+
+class BloomFilter:
+    """
+    Bit array sized for capacity items at error_rate false positives
+
+    `item in bloom` is False only if item was never added. Items cannot be
+    removed. Adding more than capacity items still works, but the false
+    positive rate climbs above error_rate.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        self.capacity = max(capacity, 1)
+        self.error_rate = error_rate
+        self.num_bits = max(64, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / self.capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0  # Items added, repeats included
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.bits)
+
+    def _positions(self, item: str) -> list[int]:
+        # Double hashing (Kirsch-Mitzenmacher) on the built-in str hash, which
+        # is cached per string object. It is salted per process, so a filter
+        # is only meaningful inside the process that built it.
+        h1 = hash(item)
+        h2 = hash((item, self.num_hashes)) | 1
+        m = self.num_bits
+        position = h1 % m
+        positions = []
+        for _ in range(self.num_hashes):
+            positions.append(position)
+            position = (position + h2) % m
+        return positions
+
+    def add(self, item: str):
+        """Add one item"""
+        bits = self.bits
+        for position in self._positions(item):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def update(self, items: Iterable[str]):
+        """Add several items"""
+        for item in items:
+            self.add(item)
+
+    def __contains__(self, item: str) -> bool:
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
@@ -0,0 +1,55 @@
+"""
+Who sent a request, for per-client throttles outside the route dependencies
+"""
+from typing import Optional
+from jose import JWTError, jwt
+from starlette.datastructures import Headers
+from starlette.types import Scope
+from app.config import get_settings
+
+
+def authenticated_user_id(scope: Scope) -> Optional[str]:
+    """
+    The user id ("sub") of a valid Bearer token on the request, if any
+
+    The signature and expiry are checked, so the id cannot be forged, but
+    the user is not looked up: a deleted or inactive user's token still
+    identifies it here.
+    """
+    authorization = Headers(scope=scope).get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    settings = get_settings()
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        return None
+    user_id = payload.get("sub")
+    return str(user_id) if user_id is not None else None
+
+
+def client_address(scope: Scope) -> str:
+    """
+    The client's IP address, seen through TRUSTED_PROXY_HOPS reverse proxies
+
+    Each trusted proxy appends the address it received the request from to
+    X-Forwarded-For, so the client is that many entries from the right.
+    Entries further left were written by the client and are ignored. With
+    no trusted proxies, or a shorter header, the peer address is used.
+    """
+    hops = get_settings().TRUSTED_PROXY_HOPS
+    if hops > 0:
+        forwarded = ",".join(Headers(scope=scope).getlist("x-forwarded-for"))
+        addresses = [address.strip() for address in forwarded.split(",") if address.strip()]
+        if len(addresses) >= hops:
+            return addresses[-hops]
+    return scope["client"][0] if scope.get("client") else "unknown"
+
+
+def client_key(scope: Scope) -> str:
+    """The authenticated user when there is one, otherwise the client address"""
+    user_id = authenticated_user_id(scope)
+    if user_id is not None:
+        return f"user:{user_id}"
+    return f"ip:{client_address(scope)}"
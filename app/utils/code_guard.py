@@ -0,0 +1,93 @@
+"""
+Cheap rejection of guessed coupon codes on the single-code endpoints
+"""
+import re
+from typing import Optional
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.config import get_settings
+from app.services.code_filter import CodeFilter
+from app.utils.client_identity import client_key
+from app.utils.exceptions import coupon_not_found_detail
+from app.utils.metrics import CODE_GUARD_REJECTIONS
+from app.utils.sliding_window import SlidingWindowCounter
+
+# GET /coupons/{code}; POST /coupons/{lock,unlock,redeem,assign}/{code}, /lock/{code}/renew and /unlock/{code}/force
+GUARDED_PATHS = {
+    "GET": re.compile(r"^/api/v1/coupons/(?P<code>[^/]+)$"),
+    "POST": re.compile(r"^/api/v1/coupons/(?:lock|unlock|redeem|assign)/(?P<code>[^/]+)(?:/renew|/force)?$"),
+}
+
+
+class CodeGuardMiddleware:
+    """
+    ASGI middleware that shields the database from code enumeration
+
+    Two checks run before the route:
+
+    - A client with CODE_MISS_LIMIT misses in the last
+      CODE_MISS_WINDOW_SECONDS gets 429 with Retry-After. Clients are
+      told apart by the user of a valid Bearer token, else by address
+      (X-Forwarded-For through TRUSTED_PROXY_HOPS proxies).
+    - A code the CodeFilter proves does not exist gets the route's 404
+      without a query or a redemption lock. The proof waits for
+      notifications already committed, so a code created through another
+      worker just before is not refused.
+
+    Each such 404, and each 404 the route returns, counts as a miss for
+    the client. Miss counts are kept per worker, so a client spread over
+    N workers can make up to N times the limit.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        code_filter: Optional[CodeFilter] = None,
+        misses: Optional[SlidingWindowCounter] = None
+    ):
+        settings = get_settings()
+        self.app = app
+        self.code_filter = code_filter or CodeFilter()
+        self.misses = misses or SlidingWindowCounter(
+            settings.CODE_MISS_LIMIT,
+            settings.CODE_MISS_WINDOW_SECONDS,
+            settings.CODE_MISS_MAX_CLIENTS
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        pattern = GUARDED_PATHS.get(scope.get("method")) if scope["type"] == "http" else None
+        match = pattern.match(scope["path"]) if pattern else None
+        if match is None:
+            await self.app(scope, receive, send)
+            return
+
+        client = client_key(scope)
+        if self.misses.exceeded(client):
+            CODE_GUARD_REJECTIONS.inc(reason="throttled")
+            response = JSONResponse(
+                {"detail": "Too many unknown coupon codes; slow down"},
+                status_code=429,
+                headers={"Retry-After": str(self.misses.retry_after(client))}
+            )
+            await response(scope, receive, send)
+            return
+
+        code = match["code"]
+        if await self.code_filter.confirm_absent(code):
+            self.misses.add(client)
+            CODE_GUARD_REJECTIONS.inc(reason="unknown_code")
+            response = JSONResponse({"detail": coupon_not_found_detail(code)}, status_code=404)
+            await response(scope, receive, send)
+            return
+
+        status_code = None
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+        if status_code == 404:
+            self.misses.add(client)
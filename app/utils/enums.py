@@ -25,3 +25,16 @@ class CouponState(str, Enum):
     def is_valid_transition(cls, from_state: "CouponState", to_state: "CouponState") -> bool:
         """Check if state transition is valid"""
         return to_state in cls.get_valid_transitions(from_state)
+
+
+class ExportDataset(str, Enum):
+    """Book datasets available for streaming export"""
+    COUPONS = "coupons"
+    ASSIGNMENTS = "assignments"
+    HISTORY = "history"
+
+
+class ExportFormat(str, Enum):
+    """Streaming export encodings"""
+    CSV = "csv"
+    NDJSON = "ndjson"
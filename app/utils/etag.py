@@ -0,0 +1,52 @@
+"""
+ETags and conditional GET (If-None-Match)
+"""
+import hashlib
+from typing import Any, Optional
+from fastapi import Request, Response, status
+
+
+def make_etag(*validators: Any) -> str:
+    """
+    Weak ETag over values that change whenever the representation does
+
+    Validators are ids, updated_at timestamps, counters or lists of them;
+    never the serialized body, so tagging costs no serialization. Weak,
+    because the same entity is also sent compressed.
+    """
+    digest = hashlib.blake2b(repr(validators).encode(), digest_size=16).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether If-None-Match lists etag (weak comparison) or is *"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in header.split(","))
+
+
+def not_modified(request: Request, response: Response, *validators: Any) -> Optional[Response]:
+    """
+    Tag a GET response and check it against the client's cached copy
+
+    Sets ETag (and Cache-Control: no-cache, so clients always revalidate)
+    on the route's injected response.
+
+    Args:
+        request: Incoming request
+        response: Response injected into the route
+        validators: Values the ETag is derived from (see make_etag)
+
+    Returns:
+        A 304 response to return as is, or None if the body has to be sent
+    """
+    etag = make_etag(*validators)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    if etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=response.headers)
+    return None
@@ -1,18 +1,26 @@
+from typing import Optional
 from fastapi import HTTPException, status
+from app.utils.metrics import SERVICE_EXCEPTIONS
+
+
+def coupon_not_found_detail(code: str) -> str:
+    """The 404 detail for an unknown code, wherever the 404 is answered"""
+    return f"Coupon {code} not found"
 
 
 class CouponServiceException(HTTPException):
     """Base exception for coupon service"""
     def __init__(self, status_code: int, detail: str):
         super().__init__(status_code=status_code, detail=detail)
+        SERVICE_EXCEPTIONS.inc(exception=type(self).__name__)
 
 
 class CouponNotFoundException(CouponServiceException):
     """Coupon not found"""
-    def __init__(self, code: str):
+    def __init__(self, code: str, detail: Optional[str] = None):
         super().__init__(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Coupon with code '{code}' not found"
+            detail=detail or coupon_not_found_detail(code)
         )
 
 
@@ -43,6 +51,15 @@ class CouponLockedException(CouponServiceException):
         )
 
 
+class LockNotHeldException(CouponServiceException):
+    """Coupon lock lease is not held by the caller (other owner, or lapsed)"""
+    def __init__(self, code: str):
+        super().__init__(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Coupon '{code}' is not locked by this user"
+        )
+
+
 class InvalidStateTransitionException(CouponServiceException):
     """Invalid state transition"""
     def __init__(self, from_state: str, to_state: str):
@@ -95,3 +112,8 @@ class DuplicateCodeException(CouponServiceException):
             status_code=status.HTTP_409_CONFLICT,
             detail=f"Code '{code}' already exists"
         )
+
+
+# Export a zero counter for every exception class so /metrics is complete before the first error
+for _exception_class in (CouponServiceException, *CouponServiceException.__subclasses__()):
+    SERVICE_EXCEPTIONS.inc(0, exception=_exception_class.__name__)
@@ -0,0 +1,142 @@
+"""
+Idempotency-Key handling for the redeem and assign endpoints
+"""
+import json
+import re
+from typing import Optional
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.services.idempotency_service import (
+    IN_PROGRESS,
+    MISMATCH,
+    REPLAY,
+    IdempotencyService,
+)
+
+IDEMPOTENCY_HEADER = "idempotency-key"
+MAX_KEY_LENGTH = 255
+
+# POST /coupons/redeem/{code}, /coupons/redeem:batch, /coupons/assign and /coupons/assign/{code}
+IDEMPOTENT_PATHS = re.compile(r"^/api/v1/coupons/(?:redeem/[^/]+|redeem:batch|assign(?:/[^/]+)?)$")
+
+
+async def _send_json(send: Send, status_code: int, body: bytes, extra_headers: Optional[list] = None):
+    headers = [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(body)).encode()),
+    ]
+    await send({"type": "http.response.start", "status": status_code, "headers": headers + (extra_headers or [])})
+    await send({"type": "http.response.body", "body": body})
+
+
+def _detail(message: str) -> bytes:
+    return json.dumps({"detail": message}).encode()
+
+
+class IdempotencyMiddleware:
+    """
+    ASGI middleware that makes retried redeem/assign requests safe
+
+    A POST to IDEMPOTENT_PATHS with an Idempotency-Key header reserves the
+    key before the route runs. Its response is stored once the route
+    finishes, and before it is sent. A retry with the same key and the
+    same request gets the stored status and body back, with an
+    Idempotent-Replayed header. The retry never reaches the route, so it
+    takes no locks and does not touch coupon rows.
+
+    - The same key with a different request (method, path, credentials or
+      body) gets 422.
+    - A retry while the first request is still running gets 409.
+    - 5xx and retryable responses (see RETRYABLE_STATUS_CODES) are not
+      stored, and the retry runs again.
+
+    If the worker dies after the route commits but before the response is
+    stored, the reservation lapses after IDEMPOTENCY_LOCK_SECONDS. A
+    retry after that runs again.
+    """
+
+    def __init__(self, app: ASGIApp, service: Optional[IdempotencyService] = None):
+        self.app = app
+        self.service = service or IdempotencyService()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not IDEMPOTENT_PATHS.match(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        key = headers.get(IDEMPOTENCY_HEADER)
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+        if not key or len(key) > MAX_KEY_LENGTH:
+            await _send_json(send, 400, _detail(f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters"))
+            return
+
+        body = await self._read_body(receive)
+        fingerprint = IdempotencyService.fingerprint(
+            scope["method"], scope["path"], scope["query_string"], headers.get("authorization", ""), body
+        )
+
+        outcome, stored = await self.service.begin(key, fingerprint)
+        if outcome == REPLAY:
+            await _send_json(send, stored.status_code, stored.body, [(b"idempotent-replayed", b"true")])
+            return
+        if outcome == MISMATCH:
+            await _send_json(send, 422, _detail("Idempotency-Key was already used for a different request"))
+            return
+        if outcome == IN_PROGRESS:
+            await _send_json(
+                send, 409, _detail("A request with this Idempotency-Key is still in progress"),
+                [(b"retry-after", b"1")]
+            )
+            return
+
+        await self._run_reserved(scope, receive, send, key, fingerprint, body)
+
+    async def _run_reserved(self, scope: Scope, receive: Receive, send: Send, key: str, fingerprint: bytes, body: bytes):
+        """Run the route with the buffered body, store its response, then send it"""
+        body_sent = False
+        start: Optional[Message] = None
+        chunks = []
+
+        async def replay_receive() -> Message:
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        async def capture(message: Message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        try:
+            await self.app(scope, replay_receive, capture)
+        except Exception:
+            await self.service.release(key, fingerprint)
+            raise
+
+        response_body = b"".join(chunks)
+        if start is not None and self.service.should_store(start["status"]):
+            await self.service.complete(key, fingerprint, start["status"], response_body)
+        else:
+            await self.service.release(key, fingerprint)
+
+        if start is not None:
+            await send(start)
+            await send({"type": "http.response.body", "body": response_body})
+
+    @staticmethod
+    async def _read_body(receive: Receive) -> bytes:
+        body = b""
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                return body
+            body += message.get("body", b"")
+            if not message.get("more_body", False):
+                return body
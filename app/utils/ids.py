@@ -0,0 +1,29 @@
+"""
+Identifier generation
+"""
+import os
+import time
+import uuid
+
+
+def uuid7() -> str:
+    """
+    Generate a time-ordered UUID (RFC 9562 version 7)
+
+    The first 48 bits are the Unix time in milliseconds, so ids generated
+    later sort later and B-tree inserts land on the right edge of the index
+    instead of random pages. The remaining 74 bits are random.
+
+    Returns:
+        UUID string in canonical form
+    """
+    unix_ms = time.time_ns() // 1_000_000
+    rand = int.from_bytes(os.urandom(10), "big")
+    value = (
+        (unix_ms & 0xFFFF_FFFF_FFFF) << 80
+        | 0x7 << 76                          # version
+        | (rand >> 62 & 0xFFF) << 64         # rand_a
+        | 0b10 << 62                         # variant
+        | rand & 0x3FFF_FFFF_FFFF_FFFF       # rand_b
+    )
+    return str(uuid.UUID(int=value))
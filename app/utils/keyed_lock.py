@@ -0,0 +1,67 @@
+"""
+In-process per-key locks with bounded wait queues
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Optional
+
+
+class KeyedLockTimeout(Exception):
+    """Raised when a key could not be acquired within the deadline"""
+
+
+class KeyedLockQueueFull(Exception):
+    """Raised when too many callers are already waiting on a key"""
+
+
+class KeyedLock:
+    """
+    One asyncio.Lock per key, created on demand and dropped when unused
+
+    asyncio.Lock wakes waiters in FIFO order, so contenders for the same key
+    are served fairly. Entries are reference counted and removed as soon as
+    no caller holds or waits on them, so memory stays proportional to the
+    number of keys currently in contention.
+    """
+
+    def __init__(self, max_waiters: Optional[int] = None):
+        self.max_waiters = max_waiters
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._users: dict[str, int] = {}
+
+    def waiters(self, key: str) -> int:
+        """Number of callers holding or waiting on a key"""
+        return self._users.get(key, 0)
+
+    @asynccontextmanager
+    async def hold(self, key: str, timeout: Optional[float] = None):
+        """
+        Hold the lock for a key
+
+        Args:
+            key: Key to serialize on
+            timeout: Max seconds to wait for the lock (None waits forever)
+
+        Raises:
+            KeyedLockQueueFull: If max_waiters callers are already queued
+            KeyedLockTimeout: If the lock was not acquired in time
+        """
+        if self.max_waiters is not None and self.waiters(key) > self.max_waiters:
+            raise KeyedLockQueueFull(key)
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        self._users[key] = self._users.get(key, 0) + 1
+        try:
+            try:
+                await asyncio.wait_for(lock.acquire(), timeout)
+            except asyncio.TimeoutError:
+                raise KeyedLockTimeout(key)
+            try:
+                yield
+            finally:
+                lock.release()
+        finally:
+            self._users[key] -= 1
+            if not self._users[key]:
+                del self._users[key]
+                del self._locks[key]
@@ -0,0 +1,276 @@
+"""
+In-process metrics with Prometheus text exposition
+
+Each worker keeps its own registry; scrape every worker (or aggregate in
+Prometheus) when running several uvicorn workers.
+"""
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Callable, Optional
+from starlette.routing import Match
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: tuple, extra: Optional[tuple] = None) -> str:
+    pairs = list(labels) + list(extra or ())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Metric(ABC):
+    """Base class for a named metric with optional labels"""
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+
+    @abstractmethod
+    def collect(self) -> list[str]:
+        """Sample lines for this metric, without the HELP/TYPE header"""
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        lines.extend(self.collect())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """Monotonically increasing value per label set"""
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str):
+        super().__init__(name, documentation)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self) -> list[str]:
+        return [f"{self.name}{_format_labels(k)} {v}" for k, v in self._values.items()]
+
+
+class Gauge(Metric):
+    """Point-in-time value, either set explicitly or read from a callback"""
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, callback: Optional[Callable[[], float]] = None):
+        super().__init__(name, documentation)
+        self.callback = callback
+        self._values: dict[tuple, float] = {}
+
+    def set(self, value: float, **labels):
+        self._values[tuple(sorted(labels.items()))] = value
+
+    def collect(self) -> list[str]:
+        if self.callback is not None:
+            return [f"{self.name} {self.callback()}"]
+        return [f"{self.name}{_format_labels(k)} {v}" for k, v in self._values.items()]
+
+
+class Histogram(Metric):
+    """Cumulative bucketed observations per label set"""
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, documentation)
+        self.buckets = tuple(sorted(buckets))
+        self._series: dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        series = self._series.get(key)
+        if series is None:
+            # [bucket counts..., sum, count]
+            series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the wrapped block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def collect(self) -> list[str]:
+        lines = []
+        for key, series in self._series.items():
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{self.name}_bucket{_format_labels(key, (('le', bound),))} {count}")
+            lines.append(f"{self.name}_bucket{_format_labels(key, (('le', '+Inf'),))} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {series[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {series[-1]}")
+        return lines
+
+
+class PhaseTimer:
+    """
+    Records consecutive phases of an operation into a histogram
+
+    Each mark() observes the time since the previous mark (or creation)
+    under the given phase label.
+    """
+
+    def __init__(self, histogram: Histogram, **labels):
+        self.histogram = histogram
+        self.labels = labels
+        self._last = time.perf_counter()
+
+    def mark(self, phase: str):
+        now = time.perf_counter()
+        self.histogram.observe(now - self._last, phase=phase, **self.labels)
+        self._last = now
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together on /metrics"""
+
+    def __init__(self):
+        self._metrics: dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str) -> Counter:
+        return self.register(Counter(name, documentation))
+
+    def gauge(self, name: str, documentation: str, callback: Optional[Callable[[], float]] = None) -> Gauge:
+        return self.register(Gauge(name, documentation, callback))
+
+    def histogram(self, name: str, documentation: str, buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, buckets))
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+registry = MetricsRegistry()
+
+HTTP_REQUEST_DURATION = registry.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template"
+)
+SERVICE_EXCEPTIONS = registry.counter(
+    "coupon_service_exceptions_total",
+    "Coupon service exceptions raised, by exception class"
+)
+REDEEM_LOCK_ATTEMPTS = registry.counter(
+    "redeem_lock_attempts_total",
+    "Redemption lock attempts by backend and result (acquired/contended/waited/timeout)"
+)
+LOCK_LEASES = registry.counter(
+    "coupon_lock_lease_operations_total",
+    "Coupon lock lease operations by operation (lock/renew/unlock) and result"
+)
+REDEMPTIONS = registry.counter(
+    "coupon_redemptions_total",
+    "Successful coupon redemptions by operation"
+)
+REDEMPTION_PHASE_DURATION = registry.histogram(
+    "redemption_phase_duration_seconds",
+    "Time spent in each RedemptionService phase"
+)
+ASSIGNMENT_PHASE_DURATION = registry.histogram(
+    "assignment_phase_duration_seconds",
+    "Time spent in each AssignmentService phase"
+)
+IDEMPOTENT_REQUESTS = registry.counter(
+    "idempotent_requests_total",
+    "Requests carrying an Idempotency-Key by result (reserved/replay/mismatch/in_progress)"
+)
+CACHE_LOOKUPS = registry.counter(
+    "cache_lookups_total",
+    "In-process cache lookups by namespace and result (hit/miss/bypass)"
+)
+CACHE_INVALIDATIONS = registry.counter(
+    "cache_invalidations_total",
+    "Keys evicted by the invalidation bus, by namespace"
+)
+CODE_GUARD_REJECTIONS = registry.counter(
+    "code_guard_rejections_total",
+    "Single-code requests answered before the route, by reason (unknown_code/throttled)"
+)
+INVALIDATION_BUS_RECONNECTS = registry.counter(
+    "invalidation_bus_reconnects_total",
+    "Times the invalidation listener lost its connection and reconnected"
+)
+
+
+def register_pool_gauges(engine, prefix: str = "db_pool"):
+    """Expose SQLAlchemy connection pool usage for an async engine"""
+    pool = engine.sync_engine.pool
+    registry.gauge(f"{prefix}_size", "Configured pool size", pool.size)
+    registry.gauge(f"{prefix}_checked_out", "Connections currently checked out", pool.checkedout)
+    registry.gauge(f"{prefix}_overflow", "Overflow connections currently open (negative while below pool_size)", pool.overflow)
+    registry.gauge(f"{prefix}_checked_in", "Idle connections in the pool", pool.checkedin)
+
+
+def _route_template(scope) -> str:
+    """Path template of the route that served (or would have served) the request"""
+    route = scope.get("route")
+    if route is None:
+        # Answered by a middleware before routing (guard, idempotent replay)
+        app = scope.get("app")
+        for candidate in getattr(getattr(app, "router", None), "routes", ()):
+            if candidate.matches(scope)[0] == Match.FULL:
+                route = candidate
+                break
+    return getattr(route, "path", "unmatched")
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording per-route request latency
+
+    Install it outside the other middlewares so responses they produce on
+    their own are timed as well.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Label by route template, not raw path, to bound cardinality
+            HTTP_REQUEST_DURATION.observe(
+                time.perf_counter() - start,
+                method=scope["method"],
+                route=_route_template(scope),
+                status=status_code
+            )
@@ -0,0 +1,92 @@
+"""
+Per-request SQL statistics: Server-Timing header, slow request log and test helpers
+"""
+import json
+import logging
+import re
+import time
+from app.config import get_settings
+from app.database import track_queries
+
+logger = logging.getLogger(__name__)
+
+_QUERY_COUNT_PATTERN = re.compile(r'db;dur=[0-9.]+;desc="(\d+) queries"')
+
+
+class QueryStatsMiddleware:
+    """
+    ASGI middleware that counts SQL statements per request
+
+    Adds a Server-Timing header (query count, total DB time, slowest
+    statement) and logs one JSON line when total DB time exceeds
+    SLOW_REQUEST_DB_MS.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.settings = get_settings()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+
+        with track_queries() as stats:
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", server_timing(stats).encode("latin-1")))
+                    message["headers"] = headers
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                if stats.total_seconds * 1000 >= self.settings.SLOW_REQUEST_DB_MS:
+                    route = scope.get("route")
+                    logger.warning(json.dumps({
+                        "event": "slow_db_request",
+                        "method": scope["method"],
+                        "route": getattr(route, "path", scope["path"]),
+                        "query_count": stats.count,
+                        "db_ms": round(stats.total_seconds * 1000, 2),
+                        "request_ms": round((time.perf_counter() - start) * 1000, 2),
+                        "slowest_ms": round(stats.slowest_seconds * 1000, 2),
+                        "slowest_statement": stats.slowest_statement,
+                    }))
+
+
+def server_timing(stats) -> str:
+    """Format query stats as a Server-Timing header value"""
+    return (
+        f'db;dur={stats.total_seconds * 1000:.2f};desc="{stats.count} queries", '
+        f'db-slowest;dur={stats.slowest_seconds * 1000:.2f}'
+    )
+
+
+def query_count(response) -> int:
+    """Read the SQL query count from a response's Server-Timing header"""
+    match = _QUERY_COUNT_PATTERN.search(response.headers.get("server-timing", ""))
+    if match is None:
+        raise AssertionError("Response has no db Server-Timing entry (is QueryStatsMiddleware installed?)")
+    return int(match.group(1))
+
+
+def assert_max_queries(response, max_queries: int):
+    """
+    Test helper: fail if the request behind `response` ran too many queries
+
+    Works with any HTTP client (TestClient, httpx against a live server)
+    since it reads the Server-Timing header.
+
+    Example:
+        response = client.get(f"/api/v1/coupons/{code}")
+        assert_max_queries(response, 1)
+    """
+    count = query_count(response)
+    assert count <= max_queries, (
+        f"{response.request.method} {response.request.url} ran {count} SQL queries "
+        f"(max {max_queries}); Server-Timing: {response.headers.get('server-timing')}"
+    )
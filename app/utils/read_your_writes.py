@@ -0,0 +1,87 @@
+"""
+Read-your-writes pinning for replica-routed reads
+"""
+import time
+from http.cookies import SimpleCookie
+from typing import Optional
+from fastapi import Request
+from app.config import get_settings
+from app.utils.client_identity import authenticated_user_id
+from app.utils.lru import LRUCache
+
+# Cookie holding the unix time until which this client reads from the primary
+PRIMARY_UNTIL_COOKIE = "read_primary_until"
+# The same time as a response header, for clients without cookies to echo back
+PRIMARY_UNTIL_HEADER = "X-Read-Primary-Until"
+
+_SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+# Authenticated users who wrote through this worker -> unix time their pin ends
+_pinned_users: LRUCache[float] = LRUCache(get_settings().READ_YOUR_WRITES_MAX_USERS)
+
+
+def _pin_active(until: Optional[str], now: float) -> bool:
+    """Whether a client-supplied pin time is in the future (and not beyond one window)"""
+    try:
+        until = float(until or 0)
+    except ValueError:
+        return False
+    return now < until <= now + get_settings().READ_YOUR_WRITES_SECONDS
+
+
+def reads_pinned_to_primary(request: Request) -> bool:
+    """
+    True while the client is inside the read-your-writes window of its last write
+
+    Any of three signals pins it: the cookie, the X-Read-Primary-Until
+    header echoed from a write response, or a write by the same
+    authenticated user through this worker.
+    """
+    now = time.time()
+    if _pin_active(request.cookies.get(PRIMARY_UNTIL_COOKIE), now):
+        return True
+    if _pin_active(request.headers.get(PRIMARY_UNTIL_HEADER), now):
+        return True
+    user_id = authenticated_user_id(request.scope)
+    return user_id is not None and (_pinned_users.get(user_id) or 0) > now
+
+
+class ReadYourWritesMiddleware:
+    """
+    ASGI middleware that pins a client's reads to the primary after it writes
+
+    Every successful non-GET request sets a short-lived cookie and returns
+    the same time in X-Read-Primary-Until, for clients that do not keep
+    cookies to send back. A request with a valid Bearer token also pins
+    its user in this worker, with nothing for the client to carry. While
+    any of them holds, get_read_db serves that client from the primary, so
+    it sees its own writes even if the replica lags behind.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.window_seconds = get_settings().READ_YOUR_WRITES_SECONDS
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in _SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                until = f"{time.time() + self.window_seconds:.3f}"
+                user_id = authenticated_user_id(scope)
+                if user_id is not None:
+                    _pinned_users.set(user_id, float(until))
+                cookie = SimpleCookie()
+                cookie[PRIMARY_UNTIL_COOKIE] = until
+                cookie[PRIMARY_UNTIL_COOKIE]["max-age"] = int(self.window_seconds) + 1
+                cookie[PRIMARY_UNTIL_COOKIE]["path"] = "/"
+                cookie[PRIMARY_UNTIL_COOKIE]["httponly"] = True
+                headers = list(message.get("headers", []))
+                headers.append((b"set-cookie", cookie.output(header="").strip().encode("latin-1")))
+                headers.append((PRIMARY_UNTIL_HEADER.lower().encode("latin-1"), until.encode("latin-1")))
+                message["headers"] = headers
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,49 @@
+"""
+Single-pass JSON serialization for list endpoints
+"""
+from typing import Any, Mapping, Optional
+from fastapi import Response
+from pydantic import TypeAdapter
+from app.config import get_settings
+
+
+class JSONSerializer:
+    """
+    Prebuilt TypeAdapter that validates rows once and dumps them in pydantic-core
+
+    A route returning models built with model_validate() gets them validated
+    a second time against response_model, then walked by jsonable_encoder and
+    encoded by json.dumps, all in Python. render() instead validates straight
+    from row attributes (Core Rows or ORM objects) and returns the finished
+    bytes, which FastAPI sends as is. The route keeps response_model for the
+    OpenAPI schema; the output is byte-for-byte the same.
+    """
+
+    def __init__(self, schema: Any):
+        self.adapter = TypeAdapter(schema)
+
+    def validate(self, data: Any) -> Any:
+        """Validate data, reading fields from attributes where it is not a dict"""
+        return self.adapter.validate_python(data, from_attributes=True)
+
+    def dump(self, data: Any) -> bytes:
+        """Validate data and encode it as JSON"""
+        return self.adapter.dump_json(self.validate(data))
+
+    def render(self, data: Any, rows: int, headers: Optional[Mapping[str, str]] = None) -> Any:
+        """
+        Serialize a list result, taking the fast path unless it is below FAST_JSON_MIN_ROWS
+
+        Args:
+            data: Rows, or a dict holding them, matching the schema
+            rows: Number of rows in data
+            headers: Headers for the fast-path Response; pass the route's
+                injected Response.headers so both paths send them
+
+        Returns:
+            A JSON Response when rows >= FAST_JSON_MIN_ROWS, otherwise the
+            validated value for FastAPI to serialize as usual
+        """
+        if rows >= get_settings().FAST_JSON_MIN_ROWS:
+            return Response(content=self.dump(data), media_type="application/json", headers=headers)
+        return self.validate(data)
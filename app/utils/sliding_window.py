@@ -0,0 +1,74 @@
+"""
+Per-key event counts over a sliding time window
+"""
+import math
+import time
+from typing import Hashable, Optional
+from app.utils.lru import LRUCache
+
+
+class SlidingWindowCounter:
+    """
+    Approximate count of events per key over the last window_seconds
+
+    Each key keeps two fixed windows: the current one and the one before.
+    The previous count is weighted by how much of it the sliding window
+    still covers. That costs two integers per key instead of a timestamp
+    per event. At most max_keys keys are tracked; the least recently used
+    are dropped first. Not shared between workers.
+    """
+
+    def __init__(self, limit: int, window_seconds: float, max_keys: int):
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self._windows: LRUCache[list] = LRUCache(max_keys)  # [window start, previous, current]
+
+    def _roll(self, key: Hashable, now: float) -> Optional[list]:
+        window = self._windows.get(key)
+        if window is None:
+            return None
+        start = now - now % self.window_seconds
+        if window[0] != start:
+            previous = window[2] if start - window[0] == self.window_seconds else 0
+            window[:] = [start, previous, 0]
+        return window
+
+    def count(self, key: Hashable, now: Optional[float] = None) -> float:
+        """Estimated events for key in the last window_seconds"""
+        now = time.monotonic() if now is None else now
+        window = self._roll(key, now)
+        if window is None:
+            return 0.0
+        start, previous, current = window
+        return previous * (1 - (now - start) / self.window_seconds) + current
+
+    def add(self, key: Hashable, now: Optional[float] = None) -> float:
+        """Record one event for key; returns the new count"""
+        now = time.monotonic() if now is None else now
+        window = self._roll(key, now)
+        if window is None:
+            window = [now - now % self.window_seconds, 0, 0]
+            self._windows.set(key, window)
+        window[2] += 1
+        return self.count(key, now)
+
+    def exceeded(self, key: Hashable, now: Optional[float] = None) -> bool:
+        """Whether key has reached limit"""
+        return self.count(key, now) >= self.limit
+
+    def retry_after(self, key: Hashable, now: Optional[float] = None) -> int:
+        """Whole seconds until key's count drops below limit"""
+        now = time.monotonic() if now is None else now
+        window = self._roll(key, now)
+        if window is None:
+            return 0
+        start, previous, current = window
+        if current >= self.limit:
+            # Wait for this window to end, then for its weight in the next to fall below limit
+            wait = start + self.window_seconds - now + self.window_seconds * (1 - self.limit / current)
+        elif previous:
+            # previous * (1 - t / window) + current < limit, t measured from start
+            wait = self.window_seconds * (1 - (self.limit - current) / previous) - (now - start)
+        else:
+            wait = 0
+        return max(1, math.floor(wait) + 1)
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Cost of guessed coupon codes with and without the code guard
+
+Drives GET /coupons/{code} and POST /coupons/redeem/{code} in-process
+through the API (httpx ASGI transport) with random codes that do not
+exist, and times:
+
+- unguarded: the API as is (a primary-key lookup, or for redeem a lock
+  plus a lookup, per guess)
+- filtered: wrapped in CodeGuardMiddleware with the miss throttle out of
+  the way; the Bloom filter answers the guesses
+- throttled: the default CODE_MISS_LIMIT; after the limit guesses get 429
+
+It also requests every seeded code through the guard: none may be
+rejected (a Bloom filter has no false negatives), and reports the
+filter's size and false positive rate on the guesses.
+
+Usage:
+    python -m benchmarks.code_guard --codes 100000 --guesses 2000 --output code_guard.json
+"""
+import os
+
+# The benchmark wraps the app in its own middleware to reach its filter
+os.environ["CODE_GUARD_ENABLED"] = "false"
+
+import argparse
+import asyncio
+import json
+import random
+import string
+import time
+from collections import Counter, defaultdict
+
+import asyncpg
+import httpx
+
+from app.config import get_settings
+from app.database import engine
+from app.main import app
+from app.services.code_filter import CodeFilter
+from app.services.invalidation_bus import invalidation_bus
+from app.utils.code_guard import CodeGuardMiddleware
+from app.utils.sliding_window import SlidingWindowCounter
+from benchmarks.contention import seed_hot_codes
+from benchmarks.load_test import percentile
+from benchmarks.seed import asyncpg_dsn
+
+
+def random_code() -> str:
+    return "GUESS-" + "".join(random.choices(string.ascii_uppercase + string.digits, k=12))
+
+
+async def guess(client: httpx.AsyncClient, codes: list[str], user_id: str, latencies: list, outcomes: Counter):
+    for i, code in enumerate(codes):
+        start = time.perf_counter()
+        if i % 2:
+            response = await client.post(f"/api/v1/coupons/redeem/{code}", json={"user_id": user_id})
+        else:
+            response = await client.get(f"/api/v1/coupons/{code}")
+        latencies.append(time.perf_counter() - start)
+        outcomes[str(response.status_code)] += 1
+
+
+async def main(args) -> dict:
+    settings = get_settings()
+    conn = await asyncpg.connect(asyncpg_dsn(settings.DATABASE_URL))
+    code_filter = CodeFilter()
+    guesses = [random_code() for _ in range(args.guesses)]
+    latencies = defaultdict(list)
+    outcomes = defaultdict(Counter)
+
+    try:
+        dataset = await seed_hot_codes(conn, args.codes, 1, 1)
+        user_id = dataset["user_ids"][0]
+
+        invalidation_bus.start()
+        start = time.perf_counter()
+        while not code_filter.ready:
+            await asyncio.sleep(0.05)
+        build_seconds = time.perf_counter() - start
+        print(f"filter ready in {build_seconds:.2f}s: {code_filter.filter.count} codes, "
+              f"{code_filter.filter.nbytes // 1024} KiB", flush=True)
+
+        paths = {
+            "unguarded": app,
+            "filtered": CodeGuardMiddleware(
+                app, code_filter=code_filter, misses=SlidingWindowCounter(args.guesses * 10, 60, 1000)
+            ),
+            "throttled": CodeGuardMiddleware(app, code_filter=code_filter),
+        }
+        for label, asgi_app in paths.items():
+            transport = httpx.ASGITransport(app=asgi_app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                await guess(client, guesses, user_id, latencies[label], outcomes[label])
+
+        # No seeded code may be turned away by the filter. Stopping the bus
+        # clears the filter, so keep hold of it for the report.
+        bloom = code_filter.filter
+        rejected = sum(1 for code in dataset["codes"] if not code_filter.might_exist(code))
+        false_positives = sum(1 for code in guesses if code_filter.might_exist(code))
+    finally:
+        await invalidation_bus.stop()
+        await conn.close()
+        await engine.dispose()
+
+    results = {}
+    for label, samples in latencies.items():
+        samples.sort()
+        results[label] = {
+            "requests": len(samples),
+            "p50_ms": round(percentile(samples, 50) * 1000, 3),
+            "p99_ms": round(percentile(samples, 99) * 1000, 3),
+            "outcomes": dict(outcomes[label]),
+        }
+        print(f"{label:<10} p50={results[label]['p50_ms']:>8}ms p99={results[label]['p99_ms']:>8}ms "
+              f"{dict(outcomes[label])}", flush=True)
+
+    return {
+        "codes": args.codes,
+        "guesses": args.guesses,
+        "filter": {
+            "build_seconds": round(build_seconds, 3),
+            "bytes": bloom.nbytes,
+            "false_positive_rate": round(false_positives / len(guesses), 5),
+            "existing_codes_rejected": rejected,
+        },
+        "paths": results,
+        "ok": rejected == 0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Unknown-code guard benchmark")
+    parser.add_argument("--codes", type=int, default=100_000, help="Existing codes to seed")
+    parser.add_argument("--guesses", type=int, default=2000, help="Random unknown codes per path")
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = asyncio.run(main(args))
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+    raise SystemExit(0 if report["ok"] else 1)
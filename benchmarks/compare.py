@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Compare two load test reports and gate on performance regressions
+
+Exits with status 1 when any endpoint present in both runs regressed
+beyond the allowed tolerance, so it can be used as a CI gate.
+
+Usage:
+    python -m benchmarks.compare baseline.json candidate.json --tolerance 10
+"""
+import argparse
+import json
+import sys
+
+# Metric -> True if a higher value is better
+METRICS = {
+    "rps": True,
+    "p50_ms": False,
+    "p95_ms": False,
+    "p99_ms": False,
+    "error_rate": False,
+}
+
+
+def compare(baseline: dict, candidate: dict, tolerance_pct: float, error_rate_slack: float) -> tuple[list[dict], bool]:
+    """
+    Compare per-endpoint metrics of two reports
+
+    Args:
+        baseline: Report of the reference run
+        candidate: Report of the run under test
+        tolerance_pct: Allowed relative degradation for throughput/latency, in percent
+        error_rate_slack: Allowed absolute increase in error rate
+
+    Returns:
+        (rows, regressed) where rows hold one entry per endpoint and metric
+    """
+    rows = []
+    regressed = False
+
+    for endpoint in sorted(set(baseline["endpoints"]) & set(candidate["endpoints"])):
+        before = baseline["endpoints"][endpoint]
+        after = candidate["endpoints"][endpoint]
+
+        for metric, higher_is_better in METRICS.items():
+            old, new = before[metric], after[metric]
+            if metric == "error_rate":
+                worse = new - old > error_rate_slack
+                change = new - old
+            else:
+                change = ((new - old) / old * 100) if old else 0.0
+                worse = (-change if higher_is_better else change) > tolerance_pct
+
+            regressed = regressed or worse
+            rows.append({
+                "endpoint": endpoint,
+                "metric": metric,
+                "baseline": old,
+                "candidate": new,
+                "change": round(change, 4 if metric == "error_rate" else 2),
+                "regression": worse,
+            })
+
+    return rows, regressed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare two load test reports")
+    parser.add_argument("baseline", help="Baseline report JSON")
+    parser.add_argument("candidate", help="Candidate report JSON")
+    parser.add_argument("--tolerance", type=float, default=10.0, help="Allowed degradation in percent")
+    parser.add_argument("--error-rate-slack", type=float, default=0.001, help="Allowed absolute error rate increase")
+    parser.add_argument("--json", action="store_true", help="Print the comparison as JSON")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    rows, regressed = compare(baseline, candidate, args.tolerance, args.error_rate_slack)
+
+    if args.json:
+        print(json.dumps({"regressed": regressed, "rows": rows}, indent=2))
+    else:
+        for row in rows:
+            flag = "REGRESSION" if row["regression"] else ""
+            print(
+                f"{row['endpoint']:<32} {row['metric']:<11} "
+                f"{row['baseline']:>10} -> {row['candidate']:>10} ({row['change']:+}) {flag}"
+            )
+        print("\nRegression detected" if regressed else "\nNo regression")
+
+    sys.exit(1 if regressed else 0)
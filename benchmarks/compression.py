@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Response size and CPU cost of compression, and the cost of a 304
+
+Serializes --rows synthetic coupons the way GET /books/{id}/coupons does
+and reports, per encoding, the body size and the time to compress it
+(gzip at several levels, brotli if the package is installed). Then it
+compares building the full 200 body with answering a matching
+If-None-Match: the 304 path only hashes codes and updated_at.
+
+Needs no database.
+
+Usage:
+    python -m benchmarks.compression --rows 10000 --repeat 10 --output compression.json
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+from typing import List
+
+from app.schemas import CouponResponse
+from app.utils.compression import CompressionMiddleware, brotli
+from app.utils.etag import make_etag
+from app.utils.serialization import JSONSerializer
+from benchmarks.serialization import coupon_row, make_coupons
+
+
+def median_ms(func, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return round(statistics.median(samples) * 1000, 3)
+
+
+def compress(encoding: str, level: int, body: bytes) -> bytes:
+    middleware = CompressionMiddleware(None, gzip_level=level, brotli_quality=level)
+    compressor = middleware.compressor(encoding)
+    return compressor.compress(body) + compressor.finish()
+
+
+def main(args) -> dict:
+    random.seed(args.seed)
+    rows = [coupon_row(values) for values in make_coupons(args.rows)]
+    body = JSONSerializer(List[CouponResponse]).dump(rows)
+
+    settings = [("gzip", level) for level in (1, 6, 9)]
+    if brotli is not None:
+        settings += [("br", quality) for quality in (1, 4, 11)]
+
+    encodings = {"identity": {"bytes": len(body), "ratio": 1.0, "compress_ms": 0.0}}
+    for encoding, level in settings:
+        compressed = compress(encoding, level, body)
+        encodings[f"{encoding}-{level}"] = {
+            "bytes": len(compressed),
+            "ratio": round(len(body) / len(compressed), 2),
+            "compress_ms": median_ms(lambda: compress(encoding, level, body), args.repeat),
+        }
+    for name, result in encodings.items():
+        print(f"{name:<10} bytes={result['bytes']:>10} ratio={result['ratio']:>6} compress={result['compress_ms']}ms")
+
+    serializer = JSONSerializer(List[CouponResponse])
+    full_ms = median_ms(lambda: serializer.dump(rows), args.repeat)
+    etag_ms = median_ms(lambda: make_etag([(row.code, row.updated_at) for row in rows]), args.repeat)
+    print(f"200 body={full_ms}ms 304 etag={etag_ms}ms ({round(full_ms / etag_ms, 1)}x cheaper)")
+
+    return {
+        "rows": args.rows,
+        "brotli_available": brotli is not None,
+        "encodings": encodings,
+        "conditional_get": {"full_body_ms": full_ms, "etag_only_ms": etag_ms},
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Response compression and ETag benchmark")
+    parser.add_argument("--rows", type=int, default=10_000, help="Coupons in the response")
+    parser.add_argument("--repeat", type=int, default=10, help="Timed runs per measurement")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for the synthetic rows")
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = main(args)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
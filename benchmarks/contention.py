@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Contention benchmark and correctness checker for hot-code redemption
+
+Models a flash sale: many clients race to redeem a handful of
+multi-redemption codes. For each concurrency level it seeds fresh hot
+codes, hammers RedemptionService.redeem_coupon (in-process, or through the
+HTTP API with --base-url) until the codes are exhausted or the time is up,
+then verifies against the database that
+
+- redemption_count never exceeds max_redemptions,
+- redemption_history rows match redemption_count per code,
+- successful client responses match the committed redemptions.
+
+Reports goodput (successful redemptions/s) against the 409 rate as JSON.
+
+Usage:
+    python -m benchmarks.contention --levels 1,8,32,128 --hot-codes 3 \\
+        --max-redemptions 2000 --duration 20 --output contention.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+import asyncpg
+import httpx
+
+from app.config import get_settings
+from app.database import AsyncSessionLocal
+from app.services.redemption_service import RedemptionService
+from app.utils.auth import get_password_hash
+from app.utils.exceptions import CouponServiceException
+from benchmarks.load_test import percentile
+from benchmarks.seed import asyncpg_dsn, copy_rows
+
+# Effectively unlimited per-user redemptions so only max_redemptions binds
+UNLIMITED_PER_USER = 2_147_483_647
+
+
+async def seed_hot_codes(conn: asyncpg.Connection, hot_codes: int, max_redemptions: int, users: int) -> dict:
+    """Create a multi-redemption book with a few ASSIGNED hot codes"""
+    run_id = uuid.uuid4().hex[:8].upper()
+    user_ids = [str(uuid.uuid4()) for _ in range(users)]
+    hashed_password = get_password_hash("benchmark123")
+    await copy_rows(
+        conn,
+        "users",
+        ["user_id", "name", "email", "hashed_password", "role", "is_active"],
+        [
+            (user_id, f"Hot User {i}", f"hot-{run_id.lower()}-{i}@example.com", hashed_password, "user", True)
+            for i, user_id in enumerate(user_ids)
+        ]
+    )
+
+    book_id = str(uuid.uuid4())
+    await copy_rows(
+        conn,
+        "books",
+        [
+            "book_id", "name", "description", "owner_id", "expiration_date",
+            "allow_multi_redemption", "max_redemptions_per_user", "max_assignments_per_user",
+            "code_pattern", "total_code_count", "is_active"
+        ],
+        [(
+            book_id, f"Flash sale {run_id}", "Contention benchmark", user_ids[0],
+            datetime.now(timezone.utc) + timedelta(days=1), True, UNLIMITED_PER_USER, None,
+            None, hot_codes, True
+        )]
+    )
+
+    await conn.execute("SELECT create_coupon_partition($1::uuid)", book_id)
+    codes = [f"HOT{run_id}-{i}" for i in range(hot_codes)]
+    await copy_rows(
+        conn,
+        "coupons",
+        ["code", "book_id", "assigned_user_id", "state", "redemption_count", "max_redemptions", "is_locked"],
+        [(code, book_id, user_ids[0], "ASSIGNED", 0, max_redemptions, False) for code in codes]
+    )
+    return {"book_id": book_id, "codes": codes, "user_ids": user_ids}
+
+
+async def check_invariants(conn: asyncpg.Connection, codes: list[str], client_successes: int) -> dict:
+    """Verify counters and history against each other and the client's view"""
+    rows = await conn.fetch(
+        """
+        SELECT c.code, c.redemption_count, c.max_redemptions,
+               (SELECT count(*) FROM redemption_history h WHERE h.code = c.code) AS history_rows
+        FROM coupons c
+        WHERE c.code = ANY($1::text[])
+        """,
+        codes
+    )
+    over_redeemed = [r["code"] for r in rows if r["redemption_count"] > r["max_redemptions"]]
+    history_mismatch = [r["code"] for r in rows if r["history_rows"] != r["redemption_count"]]
+    committed = sum(r["redemption_count"] for r in rows)
+
+    return {
+        "ok": not over_redeemed and not history_mismatch and committed == client_successes,
+        "committed_redemptions": committed,
+        "client_successes": client_successes,
+        "over_redeemed_codes": over_redeemed,
+        "history_mismatch_codes": history_mismatch,
+    }
+
+
+async def redeem_in_process(service: RedemptionService, code: str, user_id: str, wait_seconds: float) -> str:
+    """Redeem through the service with a fresh session; return the outcome label"""
+    async with AsyncSessionLocal() as db:
+        try:
+            await service.redeem_coupon(db, code, user_id, {"source": "contention"}, wait_seconds=wait_seconds)
+            return "200"
+        except CouponServiceException as e:
+            return str(e.status_code)
+        except Exception as e:
+            return type(e).__name__
+
+
+async def redeem_over_http(client: httpx.AsyncClient, code: str, user_id: str, wait_seconds: float) -> str:
+    """Redeem through the API; return the status code (or error class)"""
+    try:
+        response = await client.post(
+            f"/api/v1/coupons/redeem/{code}",
+            json={"user_id": user_id, "metadata": {"source": "contention"}, "wait_seconds": wait_seconds}
+        )
+        return str(response.status_code)
+    except httpx.HTTPError as e:
+        return type(e).__name__
+
+
+async def run_level(conn: asyncpg.Connection, concurrency: int, args, client=None) -> dict:
+    """Run one concurrency level against freshly seeded hot codes"""
+    dataset = await seed_hot_codes(conn, args.hot_codes, args.max_redemptions, args.users)
+    codes = dataset["codes"]
+    exhausted = set()
+    outcomes = Counter()
+    latencies = []
+    service = RedemptionService()
+    deadline = time.perf_counter() + args.duration
+
+    async def client_loop():
+        while time.perf_counter() < deadline and len(exhausted) < len(codes):
+            code = random.choice(codes)
+            user_id = random.choice(dataset["user_ids"])
+            start = time.perf_counter()
+            if client is not None:
+                outcome = await redeem_over_http(client, code, user_id, args.wait_seconds)
+            else:
+                outcome = await redeem_in_process(service, code, user_id, args.wait_seconds)
+            latencies.append(time.perf_counter() - start)
+            outcomes[outcome] += 1
+            if outcome == "400":
+                # No redemptions remaining: stop picking this code
+                exhausted.add(code)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    attempts = sum(outcomes.values())
+    successes = outcomes["200"]
+    return {
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "attempts": attempts,
+        "successes": successes,
+        "goodput_rps": round(successes / elapsed, 2),
+        "attempt_rps": round(attempts / elapsed, 2),
+        "conflict_rate": round(outcomes["409"] / attempts, 4) if attempts else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "outcomes": dict(outcomes),
+        "invariants": await check_invariants(conn, codes, successes),
+    }
+
+
+async def main(args) -> dict:
+    settings = get_settings()
+    conn = await asyncpg.connect(asyncpg_dsn(settings.DATABASE_URL))
+    client = None
+    if args.base_url:
+        limits = httpx.Limits(max_connections=max(args.levels), max_keepalive_connections=max(args.levels))
+        client = httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=30)
+
+    try:
+        levels = []
+        for concurrency in args.levels:
+            result = await run_level(conn, concurrency, args, client)
+            levels.append(result)
+            print(
+                f"concurrency={concurrency:<5} goodput={result['goodput_rps']:>9}/s "
+                f"409-rate={result['conflict_rate']:<7} invariants={'OK' if result['invariants']['ok'] else 'VIOLATED'}",
+                flush=True
+            )
+    finally:
+        await conn.close()
+        if client is not None:
+            await client.aclose()
+
+    return {
+        "mode": "http" if args.base_url else "in-process",
+        "hot_codes": args.hot_codes,
+        "max_redemptions": args.max_redemptions,
+        "wait_seconds": args.wait_seconds,
+        "levels": levels,
+        "ok": all(level["invariants"]["ok"] for level in levels),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hot-code redemption contention benchmark")
+    parser.add_argument("--levels", type=lambda v: [int(x) for x in v.split(",")], default=[1, 8, 32, 128],
+                        help="Comma separated concurrency levels")
+    parser.add_argument("--hot-codes", type=int, default=3, help="Number of hot codes per level")
+    parser.add_argument("--max-redemptions", type=int, default=1000, help="max_redemptions of each hot code")
+    parser.add_argument("--users", type=int, default=100, help="Distinct users redeeming")
+    parser.add_argument("--duration", type=float, default=20, help="Max seconds per level")
+    parser.add_argument("--wait-seconds", type=float, default=0,
+                        help="Server-side wait budget per redemption (0 fails fast with 409)")
+    parser.add_argument("--base-url", default=None, help="Go through the HTTP API instead of calling the service")
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = asyncio.run(main(args))
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+    raise SystemExit(0 if report["ok"] else 1)
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Throughput and memory of the streaming book export
+
+Streams each dataset of a seeded book through ExportService in-process,
+the way the export endpoint does, and reports rows/s, bytes and the peak
+Python heap (tracemalloc) while streaming. With --read-delay-ms the
+consumer sleeps after every chunk, like a slow client: the peak should
+not grow, because the cursor is only advanced when a chunk is consumed.
+
+Usage:
+    python -m benchmarks.export --manifest bench_manifest.json --format csv --gzip
+"""
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+
+from app.database import PrimaryReadSessionLocal, engine
+from app.services.export_service import ExportService
+from app.utils.enums import ExportDataset, ExportFormat
+
+
+async def run_dataset(service: ExportService, book_id: str, dataset: ExportDataset, args) -> dict:
+    chunks = 0
+    size = 0
+    tracemalloc.start()
+    start = time.perf_counter()
+    async for chunk in service.stream(book_id, dataset, args.format, compress=args.gzip):
+        chunks += 1
+        size += len(chunk)
+        if args.read_delay_ms:
+            await asyncio.sleep(args.read_delay_ms / 1000)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "chunks": chunks,
+        "bytes": size,
+        "seconds": round(elapsed, 3),
+        "mb_per_second": round(size / elapsed / 1e6, 2),
+        "peak_heap_mb": round(peak / 1e6, 2),
+    }
+
+
+async def main(args) -> dict:
+    if args.book_id:
+        book_id = args.book_id
+    else:
+        with open(args.manifest) as f:
+            book_id = json.load(f)["books"][0]["book_id"]
+
+    # Primary so the numbers do not depend on replica lag
+    service = ExportService(PrimaryReadSessionLocal)
+    datasets = {}
+    for dataset in ExportDataset:
+        result = await run_dataset(service, book_id, dataset, args)
+        datasets[dataset.value] = result
+        print(
+            f"{dataset.value:<12} bytes={result['bytes']:>12} {result['mb_per_second']:>7}MB/s "
+            f"peak_heap={result['peak_heap_mb']}MB",
+            flush=True
+        )
+    await engine.dispose()
+    return {
+        "book_id": book_id,
+        "format": args.format.value,
+        "gzip": args.gzip,
+        "read_delay_ms": args.read_delay_ms,
+        "datasets": datasets,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Streaming export benchmark")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--manifest", help="Manifest written by benchmarks.seed (exports its first book)")
+    source.add_argument("--book-id", help="Book to export")
+    parser.add_argument("--format", type=ExportFormat, default=ExportFormat.CSV, help="csv or ndjson")
+    parser.add_argument("--gzip", action="store_true", help="Compress the stream")
+    parser.add_argument("--read-delay-ms", type=float, default=0, help="Consumer delay per chunk")
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = asyncio.run(main(args))
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
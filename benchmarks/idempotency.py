@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Cost of Idempotency-Key retries compared with the redemption they replay
+
+Drives POST /coupons/redeem/{code} in-process through the API (httpx ASGI
+transport) wrapped in IdempotencyMiddleware. For --requests keys it times:
+
+- no_key: a redemption without Idempotency-Key (baseline)
+- first: a redemption with a fresh key (reservation + work + store)
+- replay_cache: --retries retries answered from the worker's LRU
+- replay_db: the same retry after evicting the key from the LRU
+
+It then checks that replays redeemed nothing: redemption_count and
+history rows must match the number of successful non-replayed requests.
+
+Usage:
+    python -m benchmarks.idempotency --requests 500 --retries 3 --output idempotency.json
+"""
+import os
+
+# The benchmark wraps the app in its own middleware to reach its LRU
+os.environ["IDEMPOTENCY_ENABLED"] = "false"
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from collections import Counter, defaultdict
+
+import asyncpg
+import httpx
+
+from app.config import get_settings
+from app.database import engine
+from app.main import app
+from app.services.idempotency_service import IdempotencyService
+from app.utils.idempotency import IdempotencyMiddleware
+from benchmarks.contention import check_invariants, seed_hot_codes
+from benchmarks.load_test import percentile
+from benchmarks.seed import asyncpg_dsn
+
+
+async def main(args) -> dict:
+    settings = get_settings()
+    conn = await asyncpg.connect(asyncpg_dsn(settings.DATABASE_URL))
+    service = IdempotencyService()
+    transport = httpx.ASGITransport(app=IdempotencyMiddleware(app, service=service))
+    latencies = defaultdict(list)
+    outcomes = defaultdict(Counter)
+
+    try:
+        dataset = await seed_hot_codes(conn, args.codes, 1_000_000, args.users)
+        codes = dataset["codes"]
+
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            async def call(label: str, code: str, body: dict, key: str = None) -> httpx.Response:
+                headers = {"Idempotency-Key": key} if key else {}
+                start = time.perf_counter()
+                response = await client.post(f"/api/v1/coupons/redeem/{code}", json=body, headers=headers)
+                latencies[label].append(time.perf_counter() - start)
+                outcomes[label][str(response.status_code)] += 1
+                return response
+
+            for _ in range(args.requests):
+                code = random.choice(codes)
+                body = {"user_id": random.choice(dataset["user_ids"]), "metadata": {"source": "idempotency"}}
+                await call("no_key", code, body)
+
+                key = str(uuid.uuid4())
+                first = await call("first", code, body, key)
+                for _ in range(args.retries):
+                    replay = await call("replay_cache", code, body, key)
+                    if replay.content != first.content:
+                        outcomes["replay_cache"]["different_body"] += 1
+                service.cache.discard(key)
+                replay = await call("replay_db", code, body, key)
+                if replay.content != first.content:
+                    outcomes["replay_db"]["different_body"] += 1
+
+        successes = outcomes["no_key"]["200"] + outcomes["first"]["200"]
+        invariants = await check_invariants(conn, codes, successes)
+    finally:
+        await conn.close()
+        await engine.dispose()
+
+    results = {}
+    for label, samples in latencies.items():
+        samples.sort()
+        results[label] = {
+            "requests": len(samples),
+            "p50_ms": round(percentile(samples, 50) * 1000, 3),
+            "p99_ms": round(percentile(samples, 99) * 1000, 3),
+            "outcomes": dict(outcomes[label]),
+        }
+        print(f"{label:<13} p50={results[label]['p50_ms']:>8}ms p99={results[label]['p99_ms']:>8}ms", flush=True)
+
+    ok = invariants["ok"] and not any(outcomes[label]["different_body"] for label in ("replay_cache", "replay_db"))
+    return {"requests": args.requests, "retries": args.retries, "paths": results, "invariants": invariants, "ok": ok}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Idempotency-Key replay benchmark")
+    parser.add_argument("--requests", type=int, default=500, help="Idempotency keys to exercise")
+    parser.add_argument("--retries", type=int, default=3, help="LRU-served retries per key")
+    parser.add_argument("--codes", type=int, default=100, help="Multi-redemption codes to redeem")
+    parser.add_argument("--users", type=int, default=50, help="Distinct users redeeming")
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = asyncio.run(main(args))
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+    raise SystemExit(0 if report["ok"] else 1)
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Invalidation bus: notify-to-evict latency, batching, and what the cache saves
+
+Starts --workers InvalidationBus listeners (one connection each, as one
+per uvicorn worker would) in this process, then:
+
+- latency: fills a key in every listener's cache, publishes it from a
+  committed transaction and times until the last listener evicted it
+- burst: commits --burst single-key publishes back to back and counts the
+  eviction passes each listener needed (fewer passes = more batching)
+- policy: times BookPolicyService.get for a seeded book with the cache
+  bypassed and with it warm
+
+It checks that no listener kept a published key.
+
+Usage:
+    python -m benchmarks.invalidation --workers 8 --notifications 200 --burst 1000 --output invalidation.json
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import uuid
+
+import asyncpg
+
+from app.config import get_settings
+from app.database import AsyncSessionLocal, engine
+from app.services.book_policy import BookPolicyService
+from app.services.invalidation_bus import InvalidationBus
+from benchmarks.contention import seed_hot_codes
+from benchmarks.load_test import percentile
+from benchmarks.seed import asyncpg_dsn
+
+NAMESPACE = "bench"
+
+
+async def wait_until(predicate, timeout: float = 5.0) -> bool:
+    deadline = time.perf_counter() + timeout
+    while not predicate():
+        if time.perf_counter() > deadline:
+            return False
+        await asyncio.sleep(0.0005)
+    return True
+
+
+async def publish(bus: InvalidationBus, *keys: str):
+    async with AsyncSessionLocal() as db:
+        await bus.publish(db, NAMESPACE, *keys)
+        await db.commit()
+
+
+async def measure_latency(buses: list, caches: list, notifications: int) -> dict:
+    samples = []
+    stale = 0
+    for _ in range(notifications):
+        key = str(uuid.uuid4())
+        for cache in caches:
+            cache.set(key, True, cache.token())
+        start = time.perf_counter()
+        await publish(buses[0], key)
+        if not await wait_until(lambda: all(cache.get(key) is None for cache in caches)):
+            stale += 1
+            continue
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {
+        "notifications": notifications,
+        "p50_ms": round(percentile(samples, 50) * 1000, 3) if samples else None,
+        "p99_ms": round(percentile(samples, 99) * 1000, 3) if samples else None,
+        "stale_keys": stale,
+    }
+
+
+async def measure_burst(buses: list, caches: list, burst: int) -> dict:
+    passes = [0] * len(caches)
+    for i, cache in enumerate(caches):
+        evict = cache.evict
+
+        def counting_evict(keys, i=i, evict=evict):
+            passes[i] += 1
+            evict(keys)
+        cache.evict = counting_evict
+
+    keys = [str(uuid.uuid4()) for _ in range(burst)]
+    for cache in caches:
+        for key in keys:
+            cache.set(key, True, cache.token())
+    start = time.perf_counter()
+    for key in keys:
+        await publish(buses[0], key)
+    done = await wait_until(lambda: all(len(cache) == 0 for cache in caches), timeout=30)
+    elapsed = time.perf_counter() - start
+    return {
+        "publishes": burst,
+        "seconds": round(elapsed, 3),
+        "eviction_passes_per_worker": round(statistics.mean(passes), 1),
+        "stale_keys": 0 if done else sum(len(cache) for cache in caches),
+    }
+
+
+async def measure_policy(bus: InvalidationBus, book_id: str, lookups: int) -> dict:
+    service = BookPolicyService(bus)
+    results = {}
+    for label, listening in (("uncached", False), ("cached", True)):
+        bus.listening = listening
+        samples = []
+        async with AsyncSessionLocal() as db:
+            await service.get(db, book_id)  # warm the cache / the connection
+            for _ in range(lookups):
+                start = time.perf_counter()
+                await service.get(db, book_id)
+                samples.append(time.perf_counter() - start)
+            await db.commit()
+        samples.sort()
+        results[label] = {
+            "p50_ms": round(percentile(samples, 50) * 1000, 4),
+            "p99_ms": round(percentile(samples, 99) * 1000, 4),
+        }
+    bus.listening = True
+    return results
+
+
+async def main(args) -> dict:
+    settings = get_settings()
+    buses = [InvalidationBus() for _ in range(args.workers)]
+    caches = [bus.cache(NAMESPACE, args.burst + args.notifications, 3600) for bus in buses]
+    conn = await asyncpg.connect(asyncpg_dsn(settings.DATABASE_URL))
+    try:
+        for bus in buses:
+            bus.start()
+        if not await wait_until(lambda: all(bus.listening for bus in buses)):
+            raise SystemExit("listeners did not connect")
+
+        latency = await measure_latency(buses, caches, args.notifications)
+        print(f"latency p50={latency['p50_ms']}ms p99={latency['p99_ms']}ms stale={latency['stale_keys']}", flush=True)
+        burst = await measure_burst(buses, caches, args.burst)
+        print(
+            f"burst {burst['publishes']} publishes in {burst['seconds']}s, "
+            f"{burst['eviction_passes_per_worker']} eviction passes per worker", flush=True
+        )
+        dataset = await seed_hot_codes(conn, 1, 1, 1)
+        policy = await measure_policy(buses[0], dataset["book_id"], args.lookups)
+        print(f"book policy uncached p50={policy['uncached']['p50_ms']}ms cached p50={policy['cached']['p50_ms']}ms")
+    finally:
+        for bus in buses:
+            await bus.stop()
+        await conn.close()
+        await engine.dispose()
+
+    ok = latency["stale_keys"] == 0 and burst["stale_keys"] == 0
+    return {"workers": args.workers, "latency": latency, "burst": burst, "book_policy": policy, "ok": ok}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="LISTEN/NOTIFY cache invalidation benchmark")
+    parser.add_argument("--workers", type=int, default=8, help="Listeners (one per simulated worker)")
+    parser.add_argument("--notifications", type=int, default=200, help="Publishes timed one at a time")
+    parser.add_argument("--burst", type=int, default=1000, help="Publishes committed back to back")
+    parser.add_argument("--lookups", type=int, default=1000, help="Book policy lookups per mode")
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = asyncio.run(main(args))
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+    raise SystemExit(0 if report["ok"] else 1)
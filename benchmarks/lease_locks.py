@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Load test and correctness checker for lease-based coupon locks
+
+Many clients race to lock a few ASSIGNED codes. A client that gets the
+lease holds it briefly, renews it, checks that another user can neither
+renew nor unlock it, then unlocks it. The run reports throughput and
+latency per operation and verifies that
+
+- no two clients ever held the same code at once,
+- every foreign renew/unlock was rejected and every owner renew/unlock
+  succeeded,
+- afterwards no coupon is left LOCKED and no advisory lock is left on any
+  server connection.
+
+Point DATABASE_URL at PgBouncer (docker-compose --profile pgbouncer up,
+port 6432) with DB_PGBOUNCER_TRANSACTION_POOLING=true to run it under
+transaction pooling.
+
+Usage:
+    python -m benchmarks.lease_locks --concurrency 64 --codes 8 --duration 20
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter, defaultdict
+
+import asyncpg
+import httpx
+
+from app.config import get_settings
+from app.database import AsyncSessionLocal
+from app.services.redemption_service import RedemptionService
+from app.utils.exceptions import CouponServiceException
+from benchmarks.contention import seed_hot_codes
+from benchmarks.load_test import percentile
+from benchmarks.seed import asyncpg_dsn
+
+
+class ServiceClient:
+    """Calls RedemptionService in-process, one session per call"""
+
+    def __init__(self):
+        self.service = RedemptionService()
+
+    async def call(self, operation: str, code: str, user_id: str, lease_seconds: int) -> str:
+        async with AsyncSessionLocal() as db:
+            try:
+                if operation == "lock":
+                    await self.service.lock_coupon(db, code, user_id, lease_seconds)
+                elif operation == "renew":
+                    await self.service.renew_lock(db, code, user_id, lease_seconds)
+                else:
+                    await self.service.unlock_coupon(db, code, user_id)
+                return "200"
+            except CouponServiceException as e:
+                return str(e.status_code)
+            except Exception as e:
+                return type(e).__name__
+
+
+class HttpClient:
+    """Calls the lock endpoints of a running API"""
+
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+
+    async def call(self, operation: str, code: str, user_id: str, lease_seconds: int) -> str:
+        paths = {
+            "lock": f"/api/v1/coupons/lock/{code}",
+            "renew": f"/api/v1/coupons/lock/{code}/renew",
+            "unlock": f"/api/v1/coupons/unlock/{code}",
+        }
+        body = {"user_id": user_id}
+        if operation != "unlock":
+            body["lock_duration_seconds"] = lease_seconds
+        try:
+            response = await self.client.post(paths[operation], json=body)
+            return str(response.status_code)
+        except httpx.HTTPError as e:
+            return type(e).__name__
+
+
+async def check_leftovers(conn: asyncpg.Connection, codes: list[str]) -> dict:
+    """Coupons still LOCKED and advisory locks still held anywhere"""
+    still_locked = await conn.fetchval(
+        "SELECT count(*) FROM coupons WHERE code = ANY($1::text[]) AND (state = 'LOCKED' OR locked_by IS NOT NULL)",
+        codes
+    )
+    advisory_locks = await conn.fetchval("SELECT count(*) FROM pg_locks WHERE locktype = 'advisory'")
+    return {"still_locked": still_locked, "advisory_locks": advisory_locks}
+
+
+async def run(conn: asyncpg.Connection, client, args) -> dict:
+    dataset = await seed_hot_codes(conn, args.codes, 1, args.users)
+    codes, user_ids = dataset["codes"], dataset["user_ids"]
+    holders = {}
+    outcomes = defaultdict(Counter)
+    latencies = defaultdict(list)
+    violations = Counter()
+    deadline = time.perf_counter() + args.duration
+
+    async def call(operation: str, code: str, user_id: str, label: str = None) -> str:
+        start = time.perf_counter()
+        outcome = await client.call(operation, code, user_id, args.lease_seconds)
+        latencies[label or operation].append(time.perf_counter() - start)
+        outcomes[label or operation][outcome] += 1
+        return outcome
+
+    async def client_loop():
+        while time.perf_counter() < deadline:
+            code = random.choice(codes)
+            owner = random.choice(user_ids)
+            if await call("lock", code, owner) != "200":
+                continue
+            if code in holders:
+                violations["double_grant"] += 1
+            holders[code] = owner
+
+            await asyncio.sleep(random.uniform(0, args.hold_ms / 1000))
+            if await call("renew", code, owner) != "200":
+                violations["owner_renew_failed"] += 1
+
+            intruder = random.choice([u for u in user_ids if u != owner])
+            if await call("renew", code, intruder, "foreign_renew") != "409":
+                violations["foreign_renew_accepted"] += 1
+            if await call("unlock", code, intruder, "foreign_unlock") != "409":
+                violations["foreign_unlock_accepted"] += 1
+
+            # Clear before unlocking: the lease is still ours until the unlock commits
+            del holders[code]
+            if await call("unlock", code, owner) != "200":
+                violations["owner_unlock_failed"] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+
+    leftovers = await check_leftovers(conn, codes)
+    if leftovers["still_locked"]:
+        violations["left_locked"] += leftovers["still_locked"]
+    if leftovers["advisory_locks"]:
+        violations["leaked_advisory_locks"] += leftovers["advisory_locks"]
+
+    operations = {}
+    for operation, samples in latencies.items():
+        samples.sort()
+        operations[operation] = {
+            "requests": len(samples),
+            "rps": round(len(samples) / elapsed, 2),
+            "p50_ms": round(percentile(samples, 50) * 1000, 2),
+            "p99_ms": round(percentile(samples, 99) * 1000, 2),
+            "outcomes": dict(outcomes[operation]),
+        }
+    return {
+        "mode": "http" if args.base_url else "in-process",
+        "transaction_pooling": get_settings().DB_PGBOUNCER_TRANSACTION_POOLING,
+        "concurrency": args.concurrency,
+        "codes": args.codes,
+        "elapsed_s": round(elapsed, 3),
+        "leases_granted": outcomes["lock"]["200"],
+        "operations": operations,
+        "leftovers": leftovers,
+        "violations": dict(violations),
+        "ok": not violations,
+    }
+
+
+async def main(args) -> dict:
+    settings = get_settings()
+    # No statement cache so this connection also works through PgBouncer
+    conn = await asyncpg.connect(asyncpg_dsn(settings.DATABASE_URL), statement_cache_size=0)
+    http = None
+    if args.base_url:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        http = httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=30)
+    try:
+        client = HttpClient(http) if http is not None else ServiceClient()
+        return await run(conn, client, args)
+    finally:
+        await conn.close()
+        if http is not None:
+            await http.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lease-based coupon lock load test")
+    parser.add_argument("--concurrency", type=int, default=64, help="Concurrent clients")
+    parser.add_argument("--codes", type=int, default=8, help="Codes the clients race on")
+    parser.add_argument("--users", type=int, default=50, help="Distinct lock owners")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds to run")
+    parser.add_argument("--lease-seconds", type=int, default=30, help="Lease duration per lock/renew")
+    parser.add_argument("--hold-ms", type=float, default=20, help="Max time a client holds a lease")
+    parser.add_argument("--base-url", default=None, help="Go through the HTTP API instead of calling the service")
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = asyncio.run(main(args))
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+    raise SystemExit(0 if report["ok"] else 1)
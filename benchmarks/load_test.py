@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Concurrent load test for the coupon lifecycle
+
+Drives assign / lock+unlock / redeem / get traffic against a running API
+using the manifest written by benchmarks.seed, then reports RPS, latency
+percentiles and error rates per endpoint as JSON.
+
+Usage:
+    python -m benchmarks.load_test --manifest bench_manifest.json \\
+        --concurrency 50 --duration 60 --output run_a.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import httpx
+
+# Relative weight of each operation in the traffic mix
+DEFAULT_MIX = {"assign": 1, "lock_unlock": 2, "redeem": 3, "get": 4, "lookup": 1}
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Recorder:
+    """Collects latency and status code samples per endpoint"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    async def call(self, endpoint: str, request):
+        """Await an httpx request coroutine and record its outcome"""
+        start = time.perf_counter()
+        try:
+            response = await request
+            status = response.status_code
+        except httpx.HTTPError as e:
+            response = None
+            status = type(e).__name__
+        self.latencies[endpoint].append(time.perf_counter() - start)
+        self.statuses[endpoint][str(status)] += 1
+        return response
+
+    def report(self, elapsed: float) -> dict:
+        endpoints = {}
+        for endpoint, samples in sorted(self.latencies.items()):
+            samples.sort()
+            statuses = self.statuses[endpoint]
+            # 409/404 on contended or exhausted codes are expected business outcomes,
+            # only 5xx and transport failures count as errors
+            errors = sum(n for s, n in statuses.items() if not s.isdigit() or int(s) >= 500)
+            endpoints[endpoint] = {
+                "requests": len(samples),
+                "rps": round(len(samples) / elapsed, 2),
+                "p50_ms": round(percentile(samples, 50) * 1000, 2),
+                "p95_ms": round(percentile(samples, 95) * 1000, 2),
+                "p99_ms": round(percentile(samples, 99) * 1000, 2),
+                "max_ms": round(samples[-1] * 1000, 2),
+                "error_rate": round(errors / len(samples), 4),
+                "status_counts": dict(statuses),
+            }
+        return endpoints
+
+
+async def worker(
+    client: httpx.AsyncClient,
+    recorder: Recorder,
+    manifest: dict,
+    codes: asyncio.Queue,
+    mix: dict,
+    deadline: float
+):
+    """Issue requests until the deadline, picking each operation from the mix"""
+    operations = list(mix)
+    weights = [mix[op] for op in operations]
+
+    while time.perf_counter() < deadline:
+        operation = random.choices(operations, weights)[0]
+        user_id = random.choice(manifest["user_ids"])
+
+        if operation == "assign":
+            book = random.choice(manifest["books"])
+            await recorder.call("POST /coupons/assign", client.post(
+                "/api/v1/coupons/assign",
+                json={"book_id": book["book_id"], "user_id": user_id, "count": 1}
+            ))
+            continue
+
+        if operation == "lookup":
+            sample = []
+            while len(sample) < 20 and not codes.empty():
+                sample.append(codes.get_nowait())
+            for code in sample:
+                codes.put_nowait(code)
+            if sample:
+                await recorder.call("POST /coupons:lookup", client.post(
+                    "/api/v1/coupons:lookup", json={"codes": sample}
+                ))
+            else:
+                await asyncio.sleep(0.01)
+            continue
+
+        if codes.empty():
+            # Every sampled code is redeemed or in use by another client
+            await asyncio.sleep(0.01)
+            continue
+        code = codes.get_nowait()
+
+        if operation == "get":
+            await recorder.call("GET /coupons/{code}", client.get(f"/api/v1/coupons/{code}"))
+            codes.put_nowait(code)
+        elif operation == "lock_unlock":
+            await recorder.call("POST /coupons/lock/{code}", client.post(
+                f"/api/v1/coupons/lock/{code}",
+                json={"user_id": user_id, "lock_duration_seconds": 30}
+            ))
+            await recorder.call("POST /coupons/unlock/{code}", client.post(
+                f"/api/v1/coupons/unlock/{code}", json={"user_id": user_id}
+            ))
+            codes.put_nowait(code)
+        else:
+            # Redeemed codes are consumed and not put back
+            await recorder.call("POST /coupons/redeem/{code}", client.post(
+                f"/api/v1/coupons/redeem/{code}",
+                json={"user_id": user_id, "metadata": {"source": "load_test"}}
+            ))
+
+
+async def run(base_url: str, manifest: dict, concurrency: int, duration: float, mix: dict) -> dict:
+    """
+    Run the load test
+
+    Args:
+        base_url: API base URL
+        manifest: Manifest written by benchmarks.seed
+        concurrency: Number of concurrent virtual clients
+        duration: Test duration in seconds
+        mix: Operation -> relative weight
+
+    Returns:
+        JSON-serialisable report
+    """
+    codes = asyncio.Queue()
+    all_codes = [code for book in manifest["books"] for code in book["assigned_codes"]]
+    random.shuffle(all_codes)
+    for code in all_codes:
+        codes.put_nowait(code)
+
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        start = time.perf_counter()
+        deadline = start + duration
+        await asyncio.gather(*(
+            worker(client, recorder, manifest, codes, mix, deadline)
+            for _ in range(concurrency)
+        ))
+        elapsed = time.perf_counter() - start
+
+    endpoints = recorder.report(elapsed)
+    total = sum(e["requests"] for e in endpoints.values())
+    return {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "base_url": base_url,
+        "concurrency": concurrency,
+        "duration_s": round(elapsed, 2),
+        "mix": mix,
+        "total_requests": total,
+        "total_rps": round(total / elapsed, 2),
+        "endpoints": endpoints,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Coupon lifecycle load test")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--manifest", default="bench_manifest.json", help="Manifest from benchmarks.seed")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=30, help="Seconds")
+    parser.add_argument("--mix", type=json.loads, default=DEFAULT_MIX, help="JSON operation weights")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for a reproducible mix")
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    with open(args.manifest) as f:
+        manifest = json.load(f)
+
+    report = asyncio.run(run(args.base_url, manifest, args.concurrency, args.duration, args.mix))
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Per-redeem latency of each redemption lock backend
+
+For each backend it seeds fresh multi-redemption codes and runs
+RedemptionService.redeem_coupon in-process with that backend for
+--duration seconds. With many codes (the default) redemptions rarely
+collide, so the numbers show what the lock itself costs per redeem; with
+--codes 1 they show how each backend behaves under contention. Also
+reports SQL statements per redeem and checks the same invariants as
+benchmarks.contention.
+
+Usage:
+    python -m benchmarks.lock_backends --backends advisory,lease,in_process \\
+        --concurrency 16 --codes 1000 --duration 15 --output lock_backends.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+
+import asyncpg
+
+from app.config import get_settings
+from app.database import AsyncSessionLocal, track_queries
+from app.services.lock_backend import LOCK_BACKENDS, create_lock_backend
+from app.services.redemption_service import RedemptionService
+from app.utils.exceptions import CouponServiceException
+from benchmarks.contention import check_invariants, seed_hot_codes
+from benchmarks.load_test import percentile
+from benchmarks.seed import asyncpg_dsn
+
+
+async def warm_up():
+    """Open a pooled connection so the first redeems do not pay for connecting"""
+    async with AsyncSessionLocal() as db:
+        await db.connection()
+
+
+async def run_backend(conn: asyncpg.Connection, name: str, args) -> dict:
+    """Redeem against freshly seeded codes through one backend"""
+    dataset = await seed_hot_codes(conn, args.codes, args.max_redemptions, args.users)
+    codes = dataset["codes"]
+    service = RedemptionService(lock_backend=create_lock_backend(name))
+    outcomes = Counter()
+    latencies = []
+    statements = []
+    deadline = time.perf_counter() + args.duration
+
+    async def client_loop():
+        while time.perf_counter() < deadline:
+            code = random.choice(codes)
+            user_id = random.choice(dataset["user_ids"])
+            start = time.perf_counter()
+            with track_queries() as stats:
+                async with AsyncSessionLocal() as db:
+                    try:
+                        await service.redeem_coupon(db, code, user_id, {"source": "lock_backends"})
+                        outcome = "200"
+                    except CouponServiceException as e:
+                        outcome = str(e.status_code)
+                    except Exception as e:
+                        outcome = type(e).__name__
+            latencies.append(time.perf_counter() - start)
+            outcomes[outcome] += 1
+            if outcome == "200":
+                statements.append(stats.count)
+
+    await asyncio.gather(*(warm_up() for _ in range(args.concurrency)))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    attempts = sum(outcomes.values())
+    successes = outcomes["200"]
+    return {
+        "backend": name,
+        "elapsed_s": round(elapsed, 3),
+        "attempts": attempts,
+        "successes": successes,
+        "goodput_rps": round(successes / elapsed, 2),
+        "conflict_rate": round(outcomes["409"] / attempts, 4) if attempts else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "statements_per_redeem": round(sum(statements) / len(statements), 2) if statements else None,
+        "outcomes": dict(outcomes),
+        "invariants": await check_invariants(conn, codes, successes),
+    }
+
+
+async def main(args) -> dict:
+    settings = get_settings()
+    conn = await asyncpg.connect(asyncpg_dsn(settings.DATABASE_URL))
+    try:
+        backends = []
+        for name in args.backends:
+            result = await run_backend(conn, name, args)
+            backends.append(result)
+            print(
+                f"backend={name:<11} p50={result['p50_ms']:>7}ms p99={result['p99_ms']:>7}ms "
+                f"goodput={result['goodput_rps']:>9}/s statements={result['statements_per_redeem']} "
+                f"invariants={'OK' if result['invariants']['ok'] else 'VIOLATED'}",
+                flush=True
+            )
+    finally:
+        await conn.close()
+
+    return {
+        "concurrency": args.concurrency,
+        "codes": args.codes,
+        "backends": backends,
+        "ok": all(backend["invariants"]["ok"] for backend in backends),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Redemption lock backend latency benchmark")
+    parser.add_argument("--backends", type=lambda v: v.split(","), default=list(LOCK_BACKENDS),
+                        help="Comma separated backends to compare")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients")
+    parser.add_argument("--codes", type=int, default=1000, help="Codes the clients redeem (fewer means more contention)")
+    parser.add_argument("--max-redemptions", type=int, default=1_000_000, help="max_redemptions of each code")
+    parser.add_argument("--users", type=int, default=100, help="Distinct users redeeming")
+    parser.add_argument("--duration", type=float, default=15, help="Seconds per backend")
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    unknown = set(args.backends) - set(LOCK_BACKENDS)
+    if unknown:
+        parser.error(f"unknown backends: {', '.join(sorted(unknown))}")
+
+    report = asyncio.run(main(args))
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+    raise SystemExit(0 if report["ok"] else 1)
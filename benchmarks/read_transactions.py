@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Latency of a GET-style read under each session mode
+
+Runs the GET /coupons/{code} lookup in-process for --duration seconds per
+mode, against codes from a seed manifest:
+
+- read_write: the old get_db behaviour, BEGIN ... COMMIT
+- read_only: get_read_db, BEGIN ... READ ONLY, closed without commit
+- autocommit: no transaction at all (DB_READ_ISOLATION_LEVEL=AUTOCOMMIT)
+
+Reports latency percentiles per mode and the delta against read_write.
+All modes use the primary so the replica does not skew the comparison.
+
+Usage:
+    python -m benchmarks.read_transactions --manifest bench_manifest.json \\
+        --concurrency 16 --duration 10 --output read_transactions.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.database import AsyncSessionLocal, PrimaryReadSessionLocal, engine
+from app.models import Coupon
+from benchmarks.load_test import percentile
+
+AutocommitSessionLocal = async_sessionmaker(
+    engine.execution_options(isolation_level="AUTOCOMMIT"),
+    class_=AsyncSession,
+    expire_on_commit=False,
+    autoflush=False,
+)
+
+MODES = {
+    "read_write": (AsyncSessionLocal, True),
+    "read_only": (PrimaryReadSessionLocal, False),
+    "autocommit": (AutocommitSessionLocal, False),
+}
+
+
+async def run_mode(mode: str, codes: list[str], concurrency: int, duration: float) -> dict:
+    session_factory, commit = MODES[mode]
+    latencies = []
+    deadline = time.perf_counter() + duration
+
+    async def client_loop():
+        while time.perf_counter() < deadline:
+            code = random.choice(codes)
+            start = time.perf_counter()
+            async with session_factory() as db:
+                result = await db.execute(select(Coupon).where(Coupon.matches_code(code)))
+                result.scalar_one_or_none()
+                if commit:
+                    await db.commit()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+async def main(args) -> dict:
+    with open(args.manifest) as f:
+        manifest = json.load(f)
+    codes = [code for book in manifest["books"] for code in book["assigned_codes"]]
+
+    # Warm the pool and the statement caches
+    await run_mode("read_write", codes, args.concurrency, 1)
+
+    modes = {}
+    for mode in MODES:
+        modes[mode] = await run_mode(mode, codes, args.concurrency, args.duration)
+    await engine.dispose()
+
+    baseline = modes["read_write"]
+    for mode, result in modes.items():
+        result["p50_delta_ms"] = round(result["p50_ms"] - baseline["p50_ms"], 3)
+        result["p50_delta_pct"] = round((result["p50_ms"] / baseline["p50_ms"] - 1) * 100, 1)
+        print(
+            f"{mode:<11} p50={result['p50_ms']:>8}ms p99={result['p99_ms']:>8}ms "
+            f"rps={result['rps']:>9} p50 delta={result['p50_delta_ms']:+}ms ({result['p50_delta_pct']:+}%)",
+            flush=True
+        )
+    return {"concurrency": args.concurrency, "duration_s": args.duration, "modes": modes}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Read-only vs read-write transaction latency")
+    parser.add_argument("--manifest", required=True, help="Manifest written by benchmarks.seed")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds per mode")
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = asyncio.run(main(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(json.dumps(report, indent=2))
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Fast bulk loader for benchmark datasets
+
+Seeds users, books and coupons with PostgreSQL COPY (asyncpg
+copy_records_to_table) and writes a manifest with the generated ids and
+codes for the load test. Run `python init_db.py` first so the schema exists.
+
+Usage:
+    python -m benchmarks.seed --books 5 --coupons-per-book 100000 --users 1000
+"""
+import argparse
+import asyncio
+import json
+import random
+import string
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import asyncpg
+
+from app.config import get_settings
+from app.utils.auth import get_password_hash
+
+CHARSET = string.ascii_uppercase + string.digits
+
+
+def asyncpg_dsn(database_url: str) -> str:
+    """Convert the SQLAlchemy URL from settings into a plain asyncpg DSN"""
+    return database_url.replace("postgresql+asyncpg://", "postgresql://")
+
+
+async def copy_rows(conn: asyncpg.Connection, table: str, columns: list[str], rows: list[tuple]) -> float:
+    """COPY rows into a table and return the elapsed seconds"""
+    start = time.perf_counter()
+    await conn.copy_records_to_table(table, records=rows, columns=columns)
+    return time.perf_counter() - start
+
+
+async def seed(
+    books: int,
+    coupons_per_book: int,
+    users: int,
+    assigned_ratio: float,
+    max_redemptions: int,
+    manifest_path: str,
+    sample_size: int
+) -> dict:
+    """
+    Seed a benchmark dataset and write its manifest
+
+    Args:
+        books: Number of books to create
+        coupons_per_book: Coupons per book
+        users: Number of users to create
+        assigned_ratio: Fraction of each book's coupons pre-assigned to users
+        max_redemptions: max_redemptions for every coupon
+        manifest_path: Where to write the manifest JSON
+        sample_size: Max ASSIGNED codes per book to include in the manifest
+
+    Returns:
+        The manifest dictionary
+    """
+    settings = get_settings()
+    conn = await asyncpg.connect(asyncpg_dsn(settings.DATABASE_URL))
+    run_id = uuid.uuid4().hex[:8].upper()
+    # Users only ever log in with this password; hash it once, not per row
+    hashed_password = get_password_hash("benchmark123")
+    now = datetime.now(timezone.utc)
+    timings = {}
+
+    try:
+        user_ids = [str(uuid.uuid4()) for _ in range(users)]
+        timings["users"] = await copy_rows(
+            conn,
+            "users",
+            ["user_id", "name", "email", "hashed_password", "role", "is_active"],
+            [
+                (user_id, f"Bench User {i}", f"bench-{run_id.lower()}-{i}@example.com", hashed_password, "user", True)
+                for i, user_id in enumerate(user_ids)
+            ]
+        )
+
+        book_ids = [str(uuid.uuid4()) for _ in range(books)]
+        timings["books"] = await copy_rows(
+            conn,
+            "books",
+            [
+                "book_id", "name", "description", "owner_id", "expiration_date",
+                "allow_multi_redemption", "max_redemptions_per_user", "max_assignments_per_user",
+                "code_pattern", "total_code_count", "is_active"
+            ],
+            [
+                (
+                    book_id, f"Benchmark {run_id} #{i}", "Benchmark dataset", user_ids[0],
+                    now + timedelta(days=365), max_redemptions > 1, max_redemptions, None,
+                    f"B{run_id}{i}-{{}}", coupons_per_book, True
+                )
+                for i, book_id in enumerate(book_ids)
+            ]
+        )
+
+        # Each book gets its own coupons partition, as created by the API
+        await conn.execute("SELECT create_coupon_partition(b) FROM unnest($1::uuid[]) AS b", book_ids)
+
+        manifest_books = []
+        coupon_seconds = 0.0
+        for i, book_id in enumerate(book_ids):
+            assigned_count = int(coupons_per_book * assigned_ratio)
+            rows = []
+            assigned_codes = []
+            for n in range(coupons_per_book):
+                # Sequence number keeps codes unique without a collision check
+                code = f"B{run_id}{i}-{n:08d}{''.join(random.choices(CHARSET, k=4))}"
+                if n < assigned_count:
+                    rows.append((code, book_id, random.choice(user_ids), "ASSIGNED", 0, max_redemptions, False))
+                    if len(assigned_codes) < sample_size:
+                        assigned_codes.append(code)
+                else:
+                    rows.append((code, book_id, None, "UNASSIGNED", 0, max_redemptions, False))
+
+            coupon_seconds += await copy_rows(
+                conn,
+                "coupons",
+                ["code", "book_id", "assigned_user_id", "state", "redemption_count", "max_redemptions", "is_locked"],
+                rows
+            )
+            manifest_books.append({"book_id": book_id, "assigned_codes": assigned_codes})
+        timings["coupons"] = coupon_seconds
+
+        await conn.execute("ANALYZE users; ANALYZE books; ANALYZE coupons")
+    finally:
+        await conn.close()
+
+    total_rows = users + books + books * coupons_per_book
+    total_seconds = sum(timings.values())
+    manifest = {
+        "run_id": run_id,
+        "created_at": now.isoformat(),
+        "user_ids": user_ids,
+        "books": manifest_books,
+        "rows": total_rows,
+        "seconds": round(total_seconds, 3),
+        "rows_per_second": round(total_rows / total_seconds) if total_seconds else None,
+    }
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f)
+
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed a benchmark dataset with COPY")
+    parser.add_argument("--books", type=int, default=2, help="Number of books")
+    parser.add_argument("--coupons-per-book", type=int, default=10000, help="Coupons per book")
+    parser.add_argument("--users", type=int, default=500, help="Number of users")
+    parser.add_argument("--assigned-ratio", type=float, default=0.5, help="Fraction of coupons pre-assigned")
+    parser.add_argument("--max-redemptions", type=int, default=1, help="max_redemptions per coupon")
+    parser.add_argument("--sample-size", type=int, default=20000, help="ASSIGNED codes per book in the manifest")
+    parser.add_argument("--manifest", default="bench_manifest.json", help="Manifest output path")
+    args = parser.parse_args()
+
+    manifest = asyncio.run(seed(
+        books=args.books,
+        coupons_per_book=args.coupons_per_book,
+        users=args.users,
+        assigned_ratio=args.assigned_ratio,
+        max_redemptions=args.max_redemptions,
+        manifest_path=args.manifest,
+        sample_size=args.sample_size
+    ))
+    print(
+        f"Seeded {manifest['rows']} rows in {manifest['seconds']}s "
+        f"({manifest['rows_per_second']} rows/s), manifest: {args.manifest}"
+    )
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Cost of serializing list responses, per --rows rows
+
+Builds synthetic coupons and redemption history in memory (no database)
+and times each way of turning them into a response body:
+
+- model_validate: ORM objects -> model_validate() per row -> FastAPI's
+  response_model validation, jsonable_encoder and json.dumps (the old path)
+- response_model: rows returned as is, FastAPI validates and encodes them
+- type_adapter: JSONSerializer, one validation pass and dump_json()
+
+Rows stand in for SQLAlchemy Core Rows as named tuples, which expose
+their columns the same way. Every path must produce the same bytes.
+
+Usage:
+    python -m benchmarks.serialization --rows 10000 --repeat 20 --output serialization.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+import uuid
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.models import Coupon, RedemptionHistory
+from app.schemas import CouponResponse, RedemptionHistoryResponse
+from app.utils.serialization import JSONSerializer
+
+COUPON_FIELDS = list(CouponResponse.model_fields)
+HISTORY_FIELDS = list(RedemptionHistoryResponse.model_fields)
+CouponRow = namedtuple("CouponRow", COUPON_FIELDS + ["lock_expired"])
+HistoryRow = namedtuple("HistoryRow", HISTORY_FIELDS)
+
+
+def make_coupons(count: int) -> list[dict]:
+    book_id = str(uuid.uuid4())
+    now = datetime.now(timezone.utc)
+    coupons = []
+    for i in range(count):
+        max_redemptions = random.choice([1, 1, 5])
+        redemption_count = random.randint(0, max_redemptions)
+        locked = random.random() < 0.1
+        coupons.append({
+            "code": f"BENCH-{i:08d}",
+            "book_id": book_id,
+            "assigned_user_id": str(uuid.uuid4()) if random.random() < 0.5 else None,
+            "state": "LOCKED" if locked else random.choice(["UNASSIGNED", "ASSIGNED", "REDEEMED"]),
+            "redemption_count": redemption_count,
+            "max_redemptions": max_redemptions,
+            "is_locked": locked,
+            "locked_until": now + timedelta(minutes=5) if locked else None,
+            "locked_by": str(uuid.uuid4()) if locked else None,
+            "created_at": now - timedelta(seconds=i),
+            "updated_at": now,
+        })
+    return coupons
+
+
+def make_history(count: int) -> list[dict]:
+    book_id = str(uuid.uuid4())
+    now = datetime.now(timezone.utc)
+    return [
+        {
+            "history_id": str(uuid.uuid4()),
+            "code": f"BENCH-{i:08d}",
+            "user_id": str(uuid.uuid4()),
+            "book_id": book_id,
+            "redeemed_at": now - timedelta(seconds=i),
+            "redemption_metadata": {"order_id": f"ORD-{i}", "discount_amount": 10.5},
+        }
+        for i in range(count)
+    ]
+
+
+def coupon_row(values: dict) -> CouponRow:
+    """What select(*Coupon.response_columns()) returns"""
+    return CouponRow(
+        **values,
+        has_redemptions_remaining=values["redemption_count"] < values["max_redemptions"],
+        remaining_redemptions=max(0, values["max_redemptions"] - values["redemption_count"]),
+        lock_expired=False,
+    )
+
+
+async def fastapi_body(field, content) -> bytes:
+    """What a route returning content with this response_model sends"""
+    return JSONResponse(await serialize_response(field=field, response_content=content)).body
+
+
+async def time_path(render, repeat: int) -> list[float]:
+    # Timed inside one running loop, as in a route: starting the loop per
+    # call costs ~20us, which would swamp the paths at small --rows
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await render()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def run_dataset(name, schema, orm_rows, core_rows, repeat: int) -> dict:
+    field = create_response_field(name=f"Response_{name}", type_=List[schema])
+    serializer = JSONSerializer(List[schema])
+
+    async def type_adapter_body() -> bytes:
+        return serializer.dump(core_rows)
+
+    paths = {
+        "model_validate": lambda: fastapi_body(field, [schema.model_validate(row) for row in orm_rows]),
+        "response_model": lambda: fastapi_body(field, core_rows),
+        "type_adapter": type_adapter_body,
+    }
+
+    bodies = {path: await render() for path, render in paths.items()}
+    identical = len(set(bodies.values())) == 1
+
+    results = {}
+    for path, render in paths.items():
+        samples = await time_path(render, repeat)
+        results[path] = {
+            "median_ms": round(statistics.median(samples) * 1000, 3),
+            "min_ms": round(min(samples) * 1000, 3),
+            "us_per_row": round(statistics.median(samples) / len(core_rows) * 1e6, 3),
+        }
+
+    baseline = results["model_validate"]["median_ms"]
+    for path, result in results.items():
+        result["speedup"] = round(baseline / result["median_ms"], 2)
+        print(
+            f"{name:<8} {path:<15} median={result['median_ms']:>8}ms "
+            f"per_row={result['us_per_row']:>7}us speedup={result['speedup']}x",
+            flush=True
+        )
+    return {"bytes": len(bodies["type_adapter"]), "identical_output": identical, "paths": results}
+
+
+async def main(args) -> dict:
+    random.seed(args.seed)
+    coupons = make_coupons(args.rows)
+    history = make_history(args.rows)
+
+    datasets = {
+        "coupons": await run_dataset(
+            "coupons", CouponResponse,
+            [Coupon(**values) for values in coupons],
+            [coupon_row(values) for values in coupons],
+            args.repeat
+        ),
+        "history": await run_dataset(
+            "history", RedemptionHistoryResponse,
+            [RedemptionHistory(**values) for values in history],
+            [HistoryRow(**values) for values in history],
+            args.repeat
+        ),
+    }
+    return {
+        "rows": args.rows,
+        "repeat": args.repeat,
+        "datasets": datasets,
+        "ok": all(dataset["identical_output"] for dataset in datasets.values()),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="List response serialization benchmark")
+    parser.add_argument("--rows", type=int, default=10_000, help="Rows per response (at least 1)")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed runs per path")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for the synthetic rows")
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = asyncio.run(main(args))
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+    raise SystemExit(0 if report["ok"] else 1)
@@ -0,0 +1,5 @@
+#!/bin/sh
+# Allow streaming replication connections for the optional read replica
+# (docker-compose --profile replica). Runs once, when the data volume is created.
+set -e
+echo "host replication all all scram-sha-256" >> "$PGDATA/pg_hba.conf"
@@ -4,11 +4,28 @@ Creates all tables and optionally creates an admin user
 """
 import asyncio
 import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
 from app.database import engine, Base
-from app.models import User, Book, Coupon, UserPool
+from app.models import User, Book, Coupon, UserPool, RedemptionHistory
 from app.models.user import UserRole
+from app.models.user_pool import pool_users
 from app.utils.auth import get_password_hash
+from app.utils.ids import uuid7
 from sqlalchemy import text
+from sqlalchemy.schema import CreateIndex, DropIndex
+
+# Rows generated per COPY call when seeding at scale
+SEED_CHUNK_SIZE = 100_000
+
+# Dataset size for --scale 1; every count is multiplied by the scale
+SCALE_UNIT = {
+    "users": 10_000,
+    "books": 100,
+    "coupons": 1_000_000,
+    "pools": 50,
+}
 
 
 async def drop_all_tables():
@@ -16,9 +33,14 @@ async def drop_all_tables():
     print("🗑️  Dropping all tables...")
     async with engine.begin() as conn:
         # Drop tables in correct order (respect foreign keys)
+        await conn.execute(text("DROP TABLE IF EXISTS redemption_history CASCADE"))
+        await conn.execute(text("DROP TABLE IF EXISTS redemption_daily_rollups CASCADE"))
+        await conn.execute(text("DROP TABLE IF EXISTS lock_leases CASCADE"))
+        await conn.execute(text("DROP TABLE IF EXISTS idempotency_keys CASCADE"))
         await conn.execute(text("DROP TABLE IF EXISTS pool_users CASCADE"))
         await conn.execute(text("DROP TABLE IF EXISTS user_pools CASCADE"))
         await conn.execute(text("DROP TABLE IF EXISTS coupons CASCADE"))
+        await conn.execute(text("DROP TABLE IF EXISTS coupon_codes CASCADE"))
         await conn.execute(text("DROP TABLE IF EXISTS books CASCADE"))
         await conn.execute(text("DROP TABLE IF EXISTS users CASCADE"))
         await conn.execute(text("DROP TYPE IF EXISTS couponstate CASCADE"))
@@ -165,6 +187,13 @@ async def create_mock_books(admin_user):
             session.add(book)
             created_books.append(book)
         
+        await session.flush()
+        for book in created_books:
+            await session.execute(
+                text("SELECT create_coupon_partition(CAST(:book_id AS uuid))"),
+                {"book_id": book.book_id}
+            )
+        
         await session.commit()
         for book in created_books:
             await session.refresh(book)
@@ -314,7 +343,155 @@ async def assign_some_coupons(books, mock_users):
     return assigned_count, redeemed_count
 
 
-async def init_database(drop_existing: bool = False, create_admin: bool = True, with_mock_data: bool = False):
+async def _copy_chunks(pg, table: str, columns: list[str], rows) -> int:
+    """COPY rows from a generator in SEED_CHUNK_SIZE batches; return the row count"""
+    count = 0
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= SEED_CHUNK_SIZE:
+            await pg.copy_records_to_table(table, records=chunk, columns=columns)
+            count += len(chunk)
+            chunk = []
+    if chunk:
+        await pg.copy_records_to_table(table, records=chunk, columns=columns)
+        count += len(chunk)
+    return count
+
+
+async def seed_at_scale(admin_user, scale: float):
+    """
+    Bulk-load a performance dataset with COPY
+    
+    Generates users, books, coupons, pools and redemption history sized by
+    SCALE_UNIT * scale (--scale 10 gives 10M coupons). Secondary indexes of
+    the bulk tables are dropped for the load and rebuilt afterwards, and all
+    users share one pre-computed bcrypt hash (password: demo123).
+    
+    Args:
+        admin_user: Owner of the generated books and pools
+        scale: Dataset multiplier
+    
+    Returns:
+        Dict of table name -> rows loaded
+    """
+    print(f"\n🏗️  Seeding at scale {scale}...")
+    user_count = max(int(SCALE_UNIT["users"] * scale), 10)
+    book_count = max(int(SCALE_UNIT["books"] * scale), 1)
+    coupons_per_book = max(int(SCALE_UNIT["coupons"] * scale) // book_count, 1)
+    pool_count = max(int(SCALE_UNIT["pools"] * scale), 1)
+    
+    run_id = uuid.uuid4().hex[:6].upper()
+    hashed_password = get_password_hash("demo123")
+    now = datetime.now(timezone.utc)
+    user_ids = [str(uuid.uuid4()) for _ in range(user_count)]
+    book_ids = [str(uuid.uuid4()) for _ in range(book_count)]
+    pool_ids = [str(uuid.uuid4()) for _ in range(pool_count)]
+    redeemed = []  # (code, user_id, book_id) for the history table
+    
+    def users():
+        for i, user_id in enumerate(user_ids):
+            yield (user_id, f"Perf User {i}", f"perf-{run_id.lower()}-{i}@example.com",
+                   hashed_password, UserRole.USER.value, True)
+    
+    def books():
+        for i, book_id in enumerate(book_ids):
+            yield (book_id, f"Perf Book {run_id} #{i}", "Generated by init_db.py --scale",
+                   admin_user.user_id, now + timedelta(days=365), False, 1, None,
+                   f"P{run_id}{i}-{{}}", coupons_per_book, True)
+    
+    def coupons():
+        # 60% unassigned, 30% assigned, 10% redeemed
+        for b, book_id in enumerate(book_ids):
+            for n in range(coupons_per_book):
+                code = f"P{run_id}{b}-{n:08d}"
+                bucket = n % 10
+                if bucket < 6:
+                    yield (code, book_id, None, "UNASSIGNED", 0, 1, False)
+                else:
+                    user_id = user_ids[(b * coupons_per_book + n) % user_count]
+                    if bucket < 9:
+                        yield (code, book_id, user_id, "ASSIGNED", 0, 1, False)
+                    else:
+                        redeemed.append((code, user_id, book_id))
+                        yield (code, book_id, user_id, "REDEEMED", 1, 1, False)
+    
+    def history():
+        for code, user_id, book_id in redeemed:
+            yield (uuid7(), code, user_id, book_id, now)
+    
+    def pools():
+        for i, pool_id in enumerate(pool_ids):
+            yield (pool_id, f"Perf Pool {run_id} #{i}", "Generated by init_db.py --scale",
+                   admin_user.user_id, True)
+    
+    def pool_members():
+        # Each pool gets a contiguous slice of up to 100 users
+        for i, pool_id in enumerate(pool_ids):
+            start = (i * 100) % user_count
+            for user_id in dict.fromkeys(user_ids[start:start + 100]):
+                yield (pool_id, user_id)
+    
+    loads = [
+        (User.__table__, ["user_id", "name", "email", "hashed_password", "role", "is_active"], users),
+        (Book.__table__, [
+            "book_id", "name", "description", "owner_id", "expiration_date",
+            "allow_multi_redemption", "max_redemptions_per_user", "max_assignments_per_user",
+            "code_pattern", "total_code_count", "is_active"
+        ], books),
+        (Coupon.__table__, [
+            "code", "book_id", "assigned_user_id", "state", "redemption_count", "max_redemptions", "is_locked"
+        ], coupons),
+        (RedemptionHistory.__table__, ["history_id", "code", "user_id", "book_id", "redeemed_at"], history),
+        (UserPool.__table__, ["pool_id", "name", "description", "created_by", "is_active"], pools),
+        (pool_users, ["pool_id", "user_id"], pool_members),
+    ]
+    bulk_tables = [Coupon.__table__, RedemptionHistory.__table__]
+    
+    # Maintaining indexes row by row is far slower than building them once
+    print("   Dropping secondary indexes on coupons and redemption_history...")
+    async with engine.begin() as conn:
+        for table in bulk_tables:
+            for index in table.indexes:
+                await conn.execute(DropIndex(index, if_exists=True))
+    
+    counts = {}
+    total_start = time.perf_counter()
+    async with engine.connect() as conn:
+        raw = await conn.get_raw_connection()
+        pg = raw.driver_connection
+        for table, columns, rows in loads:
+            if table is Coupon.__table__:
+                # One partition per book before loading its coupons
+                await pg.execute("SELECT create_coupon_partition(b) FROM unnest($1::uuid[]) AS b", book_ids)
+            start = time.perf_counter()
+            counts[table.name] = await _copy_chunks(pg, table.name, columns, rows())
+            elapsed = time.perf_counter() - start
+            print(f"   {table.name:<20} {counts[table.name]:>12,} rows in {elapsed:7.2f}s "
+                  f"({counts[table.name] / elapsed:,.0f} rows/s)")
+    
+    print("   Building indexes...")
+    start = time.perf_counter()
+    async with engine.begin() as conn:
+        for table in bulk_tables:
+            for index in table.indexes:
+                await conn.execute(CreateIndex(index, if_not_exists=True))
+        for table, _, _ in loads:
+            await conn.execute(text(f"ANALYZE {table.name}"))
+    print(f"   Indexes built and tables analyzed in {time.perf_counter() - start:.2f}s")
+    
+    total_rows = sum(counts.values())
+    total_elapsed = time.perf_counter() - total_start
+    print(f"✅ Seeded {total_rows:,} rows in {total_elapsed:.2f}s ({total_rows / total_elapsed:,.0f} rows/s)")
+    return counts
+
+
+async def init_database(
+    drop_existing: bool = False,
+    create_admin: bool = True,
+    with_mock_data: bool = False,
+    scale: float = 0
+):
     """Initialize the database"""
     print("\n" + "="*60)
     print("🚀 Database Initialization")
@@ -367,6 +544,9 @@ async def init_database(drop_existing: bool = False, create_admin: bool = True,
             print("✅ Mock data created successfully!")
             print("="*60)
         
+        if scale and admin_user:
+            await seed_at_scale(admin_user, scale)
+        
         print("\n" + "="*60)
         print("✅ Database initialization complete!")
         print("="*60 + "\n")
@@ -397,11 +577,20 @@ if __name__ == "__main__":
         action="store_true",
         help="Create mock data for showcase (users, books, coupons, pools)"
     )
+    parser.add_argument(
+        "--scale",
+        type=float,
+        default=0,
+        help="Bulk-load a performance dataset with COPY (1 = 10k users, 100 books, 1M coupons)"
+    )
     
     args = parser.parse_args()
+    if args.scale and args.no_admin:
+        parser.error("--scale needs the admin user as owner of the generated books")
     
     asyncio.run(init_database(
         drop_existing=args.drop,
         create_admin=not args.no_admin,
-        with_mock_data=args.with_mock_data
+        with_mock_data=args.with_mock_data,
+        scale=args.scale
     ))
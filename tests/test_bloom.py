@@ -0,0 +1,39 @@
+from app.utils.bloom import BloomFilter
+
+
+def test_added_items_are_always_found():
+    bloom = BloomFilter(10_000, 0.01)
+    codes = [f"CODE-{i:06d}" for i in range(10_000)]
+    bloom.update(codes)
+    assert all(code in bloom for code in codes)
+    assert bloom.count == 10_000
+
+
+def test_false_positive_rate_stays_near_target():
+    bloom = BloomFilter(10_000, 0.01)
+    bloom.update(f"CODE-{i:06d}" for i in range(10_000))
+    false_positives = sum(f"GUESS-{i:06d}" in bloom for i in range(20_000))
+    assert false_positives / 20_000 < 0.02
+
+
+def test_empty_filter_contains_nothing():
+    bloom = BloomFilter(1_000)
+    assert "ANY" not in bloom
+    assert bloom.count == 0
+
+
+def test_size_follows_capacity_and_error_rate():
+    small = BloomFilter(1_000, 0.01)
+    large = BloomFilter(100_000, 0.01)
+    strict = BloomFilter(1_000, 0.0001)
+    assert large.nbytes > small.nbytes * 50
+    assert strict.nbytes > small.nbytes
+    # ~9.6 bits per item at 1%
+    assert 1_100 <= small.nbytes <= 1_300
+
+
+def test_tiny_capacity_is_clamped():
+    bloom = BloomFilter(0)
+    bloom.add("A")
+    assert "A" in bloom
+    assert bloom.capacity == 1
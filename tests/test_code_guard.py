@@ -0,0 +1,150 @@
+import httpx
+import pytest
+from starlette.responses import JSONResponse
+from app.services.code_filter import CodeFilter
+from app.utils.bloom import BloomFilter
+from app.utils.code_guard import CodeGuardMiddleware
+from app.utils.exceptions import coupon_not_found_detail
+from app.utils.sliding_window import SlidingWindowCounter
+
+
+class KnownCodes:
+    """Stands in for CodeFilter: only the given codes can exist"""
+
+    def __init__(self, codes):
+        self.codes = set(codes)
+
+    async def confirm_absent(self, code):
+        return code not in self.codes
+
+
+class Route:
+    """Stands in for the API: 200 for codes in the database, the route's 404 otherwise"""
+
+    def __init__(self, codes):
+        self.codes = set(codes)
+        self.calls = []
+
+    async def __call__(self, scope, receive, send):
+        code = scope["path"].rsplit("/", 1)[-1]
+        self.calls.append(scope["path"])
+        if code in self.codes:
+            response = JSONResponse({"code": code})
+        else:
+            response = JSONResponse({"detail": coupon_not_found_detail(code)}, status_code=404)
+        await response(scope, receive, send)
+
+
+def client(app, address="10.0.0.1") -> httpx.AsyncClient:
+    transport = httpx.ASGITransport(app=app, client=(address, 1234))
+    return httpx.AsyncClient(transport=transport, base_url="http://test")
+
+
+@pytest.fixture
+def route():
+    return Route({"KNOWN"})
+
+
+@pytest.fixture
+def guard(route):
+    # FALSEPOS gets past the filter but is not in the database
+    return CodeGuardMiddleware(
+        route,
+        code_filter=KnownCodes({"KNOWN", "FALSEPOS"}),
+        misses=SlidingWindowCounter(limit=3, window_seconds=60, max_keys=100)
+    )
+
+
+@pytest.mark.asyncio
+async def test_unknown_code_gets_the_routes_404_without_reaching_it(guard, route):
+    async with client(guard) as c:
+        response = await c.get("/api/v1/coupons/NOPE")
+    assert response.status_code == 404
+    assert response.json() == {"detail": coupon_not_found_detail("NOPE")}
+    assert route.calls == []
+
+
+@pytest.mark.asyncio
+async def test_known_code_reaches_the_route(guard, route):
+    async with client(guard) as c:
+        response = await c.post("/api/v1/coupons/redeem/KNOWN")
+    assert response.status_code == 200
+    assert route.calls == ["/api/v1/coupons/redeem/KNOWN"]
+
+
+@pytest.mark.asyncio
+async def test_misses_past_the_limit_get_429(guard, route):
+    async with client(guard) as c:
+        for code in ("NOPE1", "NOPE2", "FALSEPOS"):
+            assert (await c.get(f"/api/v1/coupons/{code}")).status_code == 404
+        response = await c.get("/api/v1/coupons/KNOWN")
+    assert response.status_code == 429
+    assert int(response.headers["retry-after"]) >= 1
+    # The route's own 404 counted as a miss; nothing reached it after the limit
+    assert route.calls == ["/api/v1/coupons/FALSEPOS"]
+
+
+@pytest.mark.asyncio
+async def test_clients_are_throttled_separately(guard):
+    async with client(guard, "10.0.0.1") as c:
+        for i in range(3):
+            await c.get(f"/api/v1/coupons/NOPE{i}")
+        assert (await c.get("/api/v1/coupons/KNOWN")).status_code == 429
+    async with client(guard, "10.0.0.2") as c:
+        assert (await c.get("/api/v1/coupons/KNOWN")).status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_unguarded_paths_pass_through_and_do_not_count(guard, route):
+    async with client(guard) as c:
+        for _ in range(5):
+            assert (await c.get("/api/v1/books/NOPE")).status_code == 404
+        assert (await c.get("/api/v1/coupons/KNOWN")).status_code == 200
+    assert len(route.calls) == 6
+
+
+class Bus:
+    """Stands in for InvalidationBus; sync() delivers the notifications in flight"""
+
+    def __init__(self):
+        self.listening = True
+        self.in_flight = []
+        self.subscriber = None
+
+    def subscribe(self, namespace, subscriber):
+        self.subscriber = subscriber
+
+    async def sync(self, timeout):
+        if not self.listening:
+            return False
+        self.subscriber.evict(self.in_flight)
+        self.in_flight = []
+        return True
+
+
+@pytest.fixture
+def bus():
+    return Bus()
+
+
+@pytest.fixture
+def code_filter(bus):
+    code_filter = CodeFilter(bus=bus, session_factory=None)
+    code_filter.filter = BloomFilter(1_000, error_rate=1e-9)  # No false positives in these tests
+    code_filter.filter.add("KNOWN")
+    return code_filter
+
+
+@pytest.mark.asyncio
+async def test_code_filter_waits_for_notifications_in_flight(code_filter, bus):
+    bus.in_flight = ["JUST%2DMADE"]
+    assert not code_filter.might_exist("JUST-MADE")
+    assert not await code_filter.confirm_absent("JUST-MADE")
+    assert await code_filter.confirm_absent("NOPE")
+
+
+@pytest.mark.asyncio
+async def test_code_filter_refuses_nothing_without_a_listener(code_filter, bus):
+    bus.listening = False
+    assert code_filter.might_exist("NOPE")
+    assert not await code_filter.confirm_absent("NOPE")
@@ -0,0 +1,98 @@
+import gzip
+import httpx
+import pytest
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from app.utils import compression
+from app.utils.compression import CompressionMiddleware
+
+ROWS = [{"code": f"CODE-{i:05d}", "state": "UNASSIGNED"} for i in range(200)]
+
+
+async def json_app(scope, receive, send):
+    await JSONResponse(ROWS)(scope, receive, send)
+
+
+async def small_app(scope, receive, send):
+    await JSONResponse({"ok": True})(scope, receive, send)
+
+
+async def image_app(scope, receive, send):
+    await Response(b"\x89PNG" + b"\0" * 4096, media_type="image/png")(scope, receive, send)
+
+
+async def encoded_app(scope, receive, send):
+    body = gzip.compress(b"x" * 4096)
+    await Response(body, media_type="text/plain", headers={"Content-Encoding": "gzip"})(scope, receive, send)
+
+
+async def streaming_app(scope, receive, send):
+    async def chunks():
+        for i in range(50):
+            yield f"line {i:04d} ".encode() * 20 + b"\n"
+    await StreamingResponse(chunks(), media_type="text/plain")(scope, receive, send)
+
+
+async def get(app, accept_encoding="gzip") -> httpx.Response:
+    transport = httpx.ASGITransport(app=CompressionMiddleware(app, minimum_size=1024))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.get("/", headers={"Accept-Encoding": accept_encoding})
+
+
+@pytest.mark.asyncio
+async def test_large_json_is_gzipped():
+    response = await get(json_app)
+    assert response.headers["content-encoding"] == "gzip"
+    assert "accept-encoding" in response.headers["vary"].lower()
+    assert int(response.headers["content-length"]) < len(response.content) / 4
+    assert response.json() == ROWS
+
+
+@pytest.mark.asyncio
+async def test_no_accepted_coding_sends_identity():
+    for accept_encoding in ("identity", "gzip;q=0", ""):
+        response = await get(json_app, accept_encoding)
+        assert "content-encoding" not in response.headers
+        assert response.json() == ROWS
+
+
+@pytest.mark.asyncio
+async def test_small_bodies_are_sent_as_is():
+    response = await get(small_app)
+    assert "content-encoding" not in response.headers
+    assert response.json() == {"ok": True}
+
+
+@pytest.mark.asyncio
+async def test_incompressible_types_are_sent_as_is():
+    response = await get(image_app)
+    assert "content-encoding" not in response.headers
+    assert response.content.startswith(b"\x89PNG")
+
+
+@pytest.mark.asyncio
+async def test_encoded_bodies_are_not_compressed_twice():
+    response = await get(encoded_app)
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.content == b"x" * 4096
+
+
+@pytest.mark.asyncio
+async def test_streaming_bodies_are_compressed_chunk_by_chunk():
+    response = await get(streaming_app)
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert response.text.count("\n") == 50
+
+
+@pytest.mark.asyncio
+async def test_br_falls_back_to_gzip_without_brotli(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    response = await get(json_app, "br, gzip")
+    assert response.headers["content-encoding"] == "gzip"
+
+
+@pytest.mark.asyncio
+async def test_br_is_preferred_when_installed():
+    pytest.importorskip("brotli")
+    response = await get(json_app, "gzip, br")
+    assert response.headers["content-encoding"] == "br"
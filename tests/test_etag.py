@@ -0,0 +1,50 @@
+from datetime import datetime, timezone
+from fastapi import Request, Response
+from app.utils.etag import etag_matches, make_etag, not_modified
+
+UPDATED_AT = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def request(if_none_match=None) -> Request:
+    headers = [] if if_none_match is None else [(b"if-none-match", if_none_match.encode())]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+def test_etag_is_weak_and_stable():
+    etag = make_etag("CODE1", UPDATED_AT)
+    assert etag.startswith('W/"') and etag.endswith('"')
+    assert etag == make_etag("CODE1", UPDATED_AT)
+
+
+def test_etag_changes_with_any_validator():
+    etag = make_etag("CODE1", UPDATED_AT, False)
+    assert etag != make_etag("CODE2", UPDATED_AT, False)
+    assert etag != make_etag("CODE1", UPDATED_AT.replace(second=1), False)
+    assert etag != make_etag("CODE1", UPDATED_AT, True)
+
+
+def test_match_uses_weak_comparison():
+    etag = make_etag("CODE1")
+    strong = etag.removeprefix("W/")
+    assert etag_matches(request(etag), etag)
+    assert etag_matches(request(strong), etag)
+    assert etag_matches(request(f'"other", {etag}'), etag)
+    assert etag_matches(request("*"), etag)
+    assert not etag_matches(request('"other"'), etag)
+    assert not etag_matches(request(), etag)
+
+
+def test_not_modified_tags_the_response():
+    response = Response()
+    assert not_modified(request(), response, "CODE1", UPDATED_AT) is None
+    assert response.headers["etag"] == make_etag("CODE1", UPDATED_AT)
+    assert response.headers["cache-control"] == "no-cache"
+
+
+def test_not_modified_answers_304_with_the_etag():
+    etag = make_etag("CODE1", UPDATED_AT)
+    cached = not_modified(request(etag), Response(), "CODE1", UPDATED_AT)
+    assert cached is not None
+    assert cached.status_code == 304
+    assert cached.headers["etag"] == etag
+    assert cached.body == b""
@@ -0,0 +1,72 @@
+import asyncio
+import pytest
+from app.utils.keyed_lock import KeyedLock, KeyedLockQueueFull, KeyedLockTimeout
+
+
+async def hold(locks, key, events, name, seconds=0.01, timeout=None):
+    async with locks.hold(key, timeout=timeout):
+        events.append(f"{name} in")
+        await asyncio.sleep(seconds)
+        events.append(f"{name} out")
+
+
+@pytest.mark.asyncio
+async def test_same_key_is_serialized_in_arrival_order():
+    locks = KeyedLock()
+    events = []
+    tasks = []
+    for name in "abc":
+        tasks.append(asyncio.create_task(hold(locks, "code", events, name)))
+        await asyncio.sleep(0)
+    await asyncio.gather(*tasks)
+    assert events == ["a in", "a out", "b in", "b out", "c in", "c out"]
+
+
+@pytest.mark.asyncio
+async def test_different_keys_do_not_wait_for_each_other():
+    locks = KeyedLock()
+    events = []
+    await asyncio.gather(
+        hold(locks, "one", events, "a"),
+        hold(locks, "two", events, "b"),
+    )
+    assert events[:2] == ["a in", "b in"]
+
+
+@pytest.mark.asyncio
+async def test_timeout_raises_and_leaves_the_holder_alone():
+    locks = KeyedLock()
+    events = []
+    holder = asyncio.create_task(hold(locks, "code", events, "a", seconds=0.1))
+    await asyncio.sleep(0)
+    with pytest.raises(KeyedLockTimeout):
+        await hold(locks, "code", events, "b", timeout=0.01)
+    await holder
+    assert events == ["a in", "a out"]
+
+
+@pytest.mark.asyncio
+async def test_full_queue_is_refused():
+    locks = KeyedLock(max_waiters=1)
+    events = []
+    tasks = [asyncio.create_task(hold(locks, "code", events, name, seconds=0.05)) for name in "ab"]
+    await asyncio.sleep(0)
+    assert locks.waiters("code") == 2
+    with pytest.raises(KeyedLockQueueFull):
+        await hold(locks, "code", events, "c")
+    await asyncio.gather(*tasks)
+
+
+@pytest.mark.asyncio
+async def test_entries_are_dropped_when_unused():
+    locks = KeyedLock()
+    events = []
+    await asyncio.gather(*(hold(locks, "code", events, name) for name in "ab"))
+    holder = asyncio.create_task(hold(locks, "other", events, "c", seconds=0.05))
+    await asyncio.sleep(0)
+    with pytest.raises(KeyedLockTimeout):
+        await hold(locks, "other", events, "d", timeout=0.01)
+    await holder
+    assert locks.waiters("code") == 0
+    assert locks.waiters("other") == 0
+    assert locks._locks == {}
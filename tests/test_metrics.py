@@ -0,0 +1,67 @@
+from app.utils.metrics import Counter, Gauge, Histogram, MetricsRegistry, PhaseTimer
+
+
+def test_counter_renders_help_type_and_labelled_samples():
+    counter = Counter("lock_attempts_total", "Lock attempts")
+    counter.inc(backend="advisory", result="acquired")
+    counter.inc(2, result="acquired", backend="advisory")
+    counter.inc(result="contended", backend="advisory")
+    assert counter.render().splitlines() == [
+        "# HELP lock_attempts_total Lock attempts",
+        "# TYPE lock_attempts_total counter",
+        'lock_attempts_total{backend="advisory",result="acquired"} 3',
+        'lock_attempts_total{backend="advisory",result="contended"} 1',
+    ]
+
+
+def test_label_values_are_escaped():
+    counter = Counter("errors_total", "Errors")
+    counter.inc(message='say "hi"\\\n')
+    assert counter.collect() == ['errors_total{message="say \\"hi\\"\\\\\\n"} 1']
+
+
+def test_gauge_set_and_callback():
+    gauge = Gauge("pool_size", "Pool size")
+    gauge.set(5, pool="primary")
+    assert gauge.collect() == ['pool_size{pool="primary"} 5']
+    assert Gauge("checked_out", "Checked out", callback=lambda: 3).collect() == ["checked_out 3"]
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("duration_seconds", "Duration", buckets=(0.1, 0.5, 1.0))
+    for value in (0.05, 0.2, 0.7, 2.0):
+        histogram.observe(value, route="/x")
+    assert histogram.render().splitlines() == [
+        "# HELP duration_seconds Duration",
+        "# TYPE duration_seconds histogram",
+        'duration_seconds_bucket{route="/x",le="0.1"} 1',
+        'duration_seconds_bucket{route="/x",le="0.5"} 2',
+        'duration_seconds_bucket{route="/x",le="1.0"} 3',
+        'duration_seconds_bucket{route="/x",le="+Inf"} 4',
+        'duration_seconds_sum{route="/x"} 2.95',
+        'duration_seconds_count{route="/x"} 4',
+    ]
+
+
+def test_phase_timer_observes_each_phase():
+    histogram = Histogram("phase_seconds", "Phases")
+    timer = PhaseTimer(histogram, operation="redeem")
+    timer.mark("lock")
+    timer.mark("update")
+    text = histogram.render()
+    assert 'phase_seconds_count{operation="redeem",phase="lock"} 1' in text
+    assert 'phase_seconds_count{operation="redeem",phase="update"} 1' in text
+
+
+def test_registry_renders_every_metric():
+    registry = MetricsRegistry()
+    registry.counter("a_total", "A").inc()
+    registry.gauge("b", "B").set(1)
+    registry.histogram("c_seconds", "C")
+    text = registry.render()
+    assert text.endswith("\n")
+    assert [line for line in text.splitlines() if line.startswith("# TYPE")] == [
+        "# TYPE a_total counter",
+        "# TYPE b gauge",
+        "# TYPE c_seconds histogram",
+    ]
@@ -0,0 +1,112 @@
+"""
+SQL statements per request on the hot read routes
+
+Runs the real routers behind QueryStatsMiddleware against DATABASE_URL,
+and skips when that database cannot be reached.
+"""
+import uuid
+import httpx
+import pytest
+import pytest_asyncio
+from fastapi import FastAPI
+from sqlalchemy import delete, text
+from app.api.v1 import books, coupons
+from app.database import AsyncSessionLocal, engine, read_engine
+from app.models import Book, Coupon, CouponCode, User
+from app.utils.query_stats import QueryStatsMiddleware, assert_max_queries
+
+COUPONS = 30
+
+
+def create_app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(QueryStatsMiddleware)
+    app.include_router(coupons.router)
+    app.include_router(books.router)
+    return app
+
+
+@pytest_asyncio.fixture
+async def book():
+    """A book with COUPONS unassigned coupons, removed afterwards"""
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1 FROM coupon_codes LIMIT 1"))
+    except Exception as e:
+        await engine.dispose()
+        pytest.skip(f"Database not available: {e}")
+
+    async with AsyncSessionLocal() as db:
+        user = User(name="Query budget", email=f"budget-{uuid.uuid4()}@example.com", hashed_password="x")
+        db.add(user)
+        await db.flush()
+        book = Book(name="Query budget", owner_id=user.user_id)
+        db.add(book)
+        await db.flush()
+        codes = [f"BUDGET-{uuid.uuid4().hex[:12].upper()}" for _ in range(COUPONS)]
+        db.add_all(Coupon(code=code, book_id=book.book_id) for code in codes)
+        await db.commit()
+        book_id, user_id = book.book_id, user.user_id
+
+    yield {"book_id": book_id, "codes": codes}
+
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(Coupon).where(Coupon.book_id == book_id))
+        await db.execute(delete(CouponCode).where(CouponCode.book_id == book_id))
+        await db.execute(delete(Book).where(Book.book_id == book_id))
+        await db.execute(delete(User).where(User.user_id == user_id))
+        await db.commit()
+    # Pooled connections belong to this test's event loop
+    await engine.dispose()
+    await read_engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def client():
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=create_app()), base_url="http://test") as client:
+        yield client
+
+
+@pytest.mark.asyncio
+async def test_get_coupon_is_one_query(book, client):
+    response = await client.get(f"/api/v1/coupons/{book['codes'][0]}")
+    assert response.status_code == 200
+    assert_max_queries(response, 1)
+
+
+@pytest.mark.asyncio
+async def test_get_coupon_not_modified_is_one_query(book, client):
+    etag = (await client.get(f"/api/v1/coupons/{book['codes'][0]}")).headers["etag"]
+    response = await client.get(f"/api/v1/coupons/{book['codes'][0]}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert_max_queries(response, 1)
+
+
+@pytest.mark.asyncio
+async def test_unknown_coupon_is_one_query(book, client):
+    response = await client.get("/api/v1/coupons/BUDGET-UNKNOWN")
+    assert response.status_code == 404
+    assert_max_queries(response, 1)
+
+
+@pytest.mark.asyncio
+async def test_lookup_does_not_grow_with_codes(book, client):
+    response = await client.post("/api/v1/coupons:lookup", json={"codes": book["codes"]})
+    assert response.status_code == 200
+    assert response.json()["found_count"] == COUPONS
+    assert_max_queries(response, 1)
+
+
+@pytest.mark.asyncio
+async def test_book_coupons_does_not_grow_with_rows(book, client):
+    response = await client.get(f"/api/v1/books/{book['book_id']}/coupons")
+    assert response.status_code == 200
+    assert len(response.json()) == COUPONS
+    assert_max_queries(response, 2)
+
+
+@pytest.mark.asyncio
+async def test_book_inventory_is_two_queries(book, client):
+    response = await client.get(f"/api/v1/books/{book['book_id']}/inventory")
+    assert response.status_code == 200
+    assert_max_queries(response, 2)
@@ -0,0 +1,70 @@
+import pytest
+from app.utils.sliding_window import SlidingWindowCounter
+
+
+def test_counts_events_in_the_current_window():
+    counter = SlidingWindowCounter(limit=3, window_seconds=60, max_keys=100)
+    assert counter.add("a", now=10) == 1
+    counter.add("a", now=11)
+    assert not counter.exceeded("a", now=12)
+    counter.add("a", now=12)
+    assert counter.count("a", now=12) == 3
+    assert counter.exceeded("a", now=12)
+
+
+def test_previous_window_is_weighted_by_overlap():
+    counter = SlidingWindowCounter(limit=3, window_seconds=60, max_keys=100)
+    for _ in range(4):
+        counter.add("a", now=10)
+    # Half of the previous window is still inside the sliding window
+    assert counter.count("a", now=90) == pytest.approx(2.0)
+    assert not counter.exceeded("a", now=90)
+
+
+def test_events_older_than_two_windows_are_forgotten():
+    counter = SlidingWindowCounter(limit=3, window_seconds=60, max_keys=100)
+    for _ in range(3):
+        counter.add("a", now=10)
+    assert counter.count("a", now=130) == 0
+
+
+def test_keys_are_counted_separately():
+    counter = SlidingWindowCounter(limit=2, window_seconds=60, max_keys=100)
+    counter.add("a", now=1)
+    counter.add("a", now=1)
+    assert counter.exceeded("a", now=1)
+    assert not counter.exceeded("b", now=1)
+
+
+def test_least_recently_used_keys_are_dropped():
+    counter = SlidingWindowCounter(limit=1, window_seconds=60, max_keys=2)
+    counter.add("a", now=1)
+    counter.add("b", now=1)
+    counter.add("c", now=1)
+    assert counter.count("a", now=1) == 0
+    assert counter.count("c", now=1) == 1
+
+
+def test_retry_after_when_current_window_is_full():
+    counter = SlidingWindowCounter(limit=3, window_seconds=60, max_keys=100)
+    for _ in range(3):
+        counter.add("a", now=10)
+    retry_after = counter.retry_after("a", now=10)
+    assert retry_after == 51
+    assert not counter.exceeded("a", now=10 + retry_after)
+
+
+def test_retry_after_when_previous_window_carries_over():
+    counter = SlidingWindowCounter(limit=3, window_seconds=60, max_keys=100)
+    for _ in range(4):
+        counter.add("a", now=10)
+    assert counter.exceeded("a", now=70)
+    retry_after = counter.retry_after("a", now=70)
+    assert retry_after == 6
+    assert counter.exceeded("a", now=70 + retry_after - 2)
+    assert not counter.exceeded("a", now=70 + retry_after)
+
+
+def test_retry_after_unknown_key():
+    counter = SlidingWindowCounter(limit=3, window_seconds=60, max_keys=100)
+    assert counter.retry_after("a", now=10) == 0